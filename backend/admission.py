@@ -0,0 +1,239 @@
+"""
+Request coalescing and admission control for the hot /search and /run-groq paths.
+
+SingleFlight collapses concurrent calls with the same key into one
+execution: the first caller (the leader) runs the function, callers that
+arrive while it is in flight wait on its Future and share the result (or
+the exception). Nothing is kept once the call finishes; repeat requests are
+the caches' job.
+
+AdmissionController bounds how many leaders run at once (max_active) and
+how many may wait for a slot (max_queue, at most queue_timeout_ms each).
+When the queue is full or the wait times out, slot() raises Overloaded and
+the route answers with its fallback or a 503 + Retry-After instead of
+piling more work onto Atlas and Groq.
+
+Both are per process; with several gunicorn workers each has its own.
+AsyncSingleFlight and AdmissionController.aslot() are the event-loop
+flavours used by asgi_server.py for its searches and Groq calls.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, contextmanager
+
+
+class Overloaded(Exception):
+    """Raised by AdmissionController.slot() when a request is shed."""
+
+    def __init__(self, name, retry_after=1):
+        super().__init__(f"{name} admission queue is full")
+        self.name = name
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class SingleFlight:
+    """Concurrent do(key, fn) calls with the same key share one fn() call."""
+
+    def __init__(self, name, enabled=True):
+        self.name = name
+        self.enabled = enabled
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key, fn):
+        if not self.enabled:
+            return fn()
+        future, leader = self._join(key, Future)
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._done(key)
+
+    def _join(self, key, make_future):
+        """(future, is_leader) for key, registering a new in-flight call if there is none."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is None:
+                future = self._calls[key] = make_future()
+                self.leaders += 1
+                return future, True
+            self.followers += 1
+            return future, False
+
+    def _done(self, key):
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def stats(self):
+        total = self.leaders + self.followers
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            # Share of requests that rode on another request's computation
+            "coalescing_ratio": round(self.followers / total, 4) if total else None,
+        }
+
+
+class AsyncSingleFlight(SingleFlight):
+    """SingleFlight for coroutines on one event loop: await do(key, coroutine_fn)."""
+
+    async def do(self, key, fn):
+        if not self.enabled:
+            return await fn()
+        future, leader = self._join(key, asyncio.get_running_loop().create_future)
+        if not leader:
+            # shield: a cancelled follower must not cancel the leader's shared result
+            return await asyncio.shield(future)
+
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieve it so a leader-only failure doesn't log "exception was never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._done(key)
+
+
+class AdmissionController:
+    """At most max_active concurrent holders, max_queue waiters; everyone else is shed."""
+
+    def __init__(self, name, max_active=16, max_queue=64, queue_timeout_ms=2000, retry_after=1):
+        self.name = name
+        self.max_active = max(1, int(max_active))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout = max(0.0, float(queue_timeout_ms)) / 1000.0
+        self.retry_after = retry_after
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.admitted = 0
+        self.shed = 0
+        self.timeouts = 0
+        self._wait_total = 0.0
+
+    def _enter_queue(self):
+        """Under the lock: True if a slot was free, False if shed, None if now queued."""
+        if self.active < self.max_active:
+            self.active += 1
+            self.admitted += 1
+            return True
+        if self.waiting >= self.max_queue:
+            self.shed += 1
+            return False
+        self.waiting += 1
+        self.peak_waiting = max(self.peak_waiting, self.waiting)
+        return None
+
+    def acquire(self):
+        """Take a slot, waiting in the queue if needed; False if the request should be shed."""
+        with self._cond:
+            entered = self._enter_queue()
+            if entered is not None:
+                return entered
+
+            started = time.perf_counter()
+            deadline = started + self.queue_timeout
+            try:
+                while self.active >= self.max_active:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        self.shed += 1
+                        self.timeouts += 1
+                        return False
+                    self._cond.wait(remaining)
+                self.active += 1
+                self.admitted += 1
+                self._wait_total += time.perf_counter() - started
+                return True
+            finally:
+                self.waiting -= 1
+
+    async def acquire_async(self, poll_s=0.005):
+        """acquire() for the event loop: a queued caller polls instead of blocking the loop's thread."""
+        with self._cond:
+            entered = self._enter_queue()
+        if entered is not None:
+            return entered
+
+        started = time.perf_counter()
+        deadline = started + self.queue_timeout
+        try:
+            while True:
+                await asyncio.sleep(poll_s)
+                with self._cond:
+                    if self.active < self.max_active:
+                        self.active += 1
+                        self.admitted += 1
+                        self._wait_total += time.perf_counter() - started
+                        return True
+                    if time.perf_counter() >= deadline:
+                        self.shed += 1
+                        self.timeouts += 1
+                        return False
+        finally:
+            with self._cond:
+                self.waiting -= 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        """Hold a slot for the body; raises Overloaded when the request is shed."""
+        if not self.acquire():
+            raise Overloaded(self.name, self.retry_after)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        """slot() for coroutines."""
+        if not await self.acquire_async():
+            raise Overloaded(self.name, self.retry_after)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "peak_queue_depth": self.peak_waiting,
+            "max_active": self.max_active,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "queue_timeouts": self.timeouts,
+            "mean_wait_ms": round(self._wait_total / self.admitted * 1000, 2) if self.admitted else None,
+        }
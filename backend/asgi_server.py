@@ -0,0 +1,415 @@
+"""
+Async (ASGI) entry point for the search and query-generation routes of
+flask_server.py.
+
+Mongo goes through Motor and Groq through httpx (AsyncGroqClient), so a
+single process holds many in-flight /search, /similar and /run-groq calls
+on one event loop instead of a thread per request. Only CPU-bound work
+(local embedding and in-process index scoring / BM25) runs on a small
+thread pool (EMBED_EXECUTOR_WORKERS). Identical in-flight searches and
+Groq calls are coalesced and wait for admission on the event loop.
+
+Request parsing and validation (search_spec, batch_specs), the pipeline
+builders, caches, admission controllers, embedding batcher and local
+indexes are the ones flask_server.py uses. /chat, /chat/stream and
+/debug/profile are only served by flask_server.py.
+
+Run with:
+    uvicorn asgi_server:app --app-dir backend --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import flask_server as shared
+from admission import AsyncSingleFlight, Overloaded
+from llm_client import AsyncGroqClient
+from mongo_connection import client_options
+from query_cache import normalize_query
+from vector_index import rerank_results
+
+EMBED_EXECUTOR_WORKERS = int(os.getenv("EMBED_EXECUTOR_WORKERS", "4"))  # threads for encode / index scoring
+
+embed_executor = ThreadPoolExecutor(max_workers=EMBED_EXECUTOR_WORKERS, thread_name_prefix="embed")
+# Coalescing happens on the event loop; replacing the module's instances keeps /stats and /metrics on them
+shared.search_flight = AsyncSingleFlight("search", enabled=shared.SINGLE_FLIGHT)
+shared.groq_flight = AsyncSingleFlight("groq", enabled=shared.SINGLE_FLIGHT)
+state = {}
+
+
+# ------------------------
+# Startup / shutdown
+# ------------------------
+async def startup():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    # Created inside the worker's event loop, so nothing is inherited across a fork
+    state["mongo"] = AsyncIOMotorClient(shared.MONGO_URI, **client_options(shared.MONGO_URI))
+    state["coll"] = state["mongo"][shared.DB_NAME][shared.COLLECTION_NAME]
+    state["groq"] = AsyncGroqClient(
+        shared.GROQ_API_KEY,
+        url=shared.GROQ_API_URL,
+        model=shared.GROQ_MODEL,
+        timeout=shared.GROQ_TIMEOUT,
+        max_concurrency=shared.GROQ_MAX_CONCURRENCY,
+        acquire_timeout_ms=shared.GROQ_ACQUIRE_TIMEOUT_MS,
+        max_attempts=shared.GROQ_MAX_ATTEMPTS,
+        hedge_delay_ms=shared.GROQ_HEDGE_DELAY_MS,
+        latency_budget_ms=shared.GROQ_LATENCY_BUDGET_MS,
+        failure_threshold=shared.GROQ_BREAKER_FAILURES,
+        reset_timeout=shared.GROQ_BREAKER_RESET_S,
+    )
+    print("✅ Motor client and async Groq client ready")
+
+
+async def shutdown():
+    await state["groq"].aclose()
+    state["mongo"].close()
+    embed_executor.shutdown(wait=False)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await startup()
+    try:
+        yield
+    finally:
+        await shutdown()
+
+
+async def in_executor(fn, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(embed_executor, partial(fn, *args, **kwargs))
+
+
+async def aggregate(pipeline):
+    return await state["coll"].aggregate(pipeline).to_list(length=None)
+
+
+def respond(result):
+    body, status, headers = result
+    return JSONResponse(body, status_code=status, headers=headers)
+
+
+async def json_body(request):
+    try:
+        return await request.json()
+    except Exception:
+        return None
+
+
+# ------------------------
+# Search (flask_server's search path with awaited aggregates)
+# ------------------------
+async def run_vector_search(index, query_vector, negative_vector, negative_weight, filters, limit):
+    if index is not None:
+        return await in_executor(
+            index.search, query_vector, limit=limit, num_candidates=shared.VECTOR_NUM_CANDIDATES,
+            filters=filters, negative_vector=negative_vector, negative_weight=negative_weight,
+        )
+    with_embedding = negative_vector is not None
+    try:
+        results = await aggregate(shared.build_vector_pipeline(query_vector, filters, limit, with_embedding))
+    except Exception as pe:
+        if not shared.prefilter_rejected(pe):
+            raise
+        results = await aggregate(shared.build_vector_pipeline(query_vector, filters, limit, with_embedding))
+    if negative_vector is not None:
+        results = rerank_results(results, query_vector, negative_vector, negative_weight, limit=limit)
+    return results
+
+
+async def timed_vector_search(*args):
+    started = time.perf_counter()
+    try:
+        results = await run_vector_search(*args)
+    except Exception as ve:
+        print(f"⚠️ Vector search failed, falling back to lexical search: {ve}")
+        shared.vector_search_failures.inc()
+        results = []
+    return results, (time.perf_counter() - started) * 1000
+
+
+async def run_lexical_search(query, filters, limit):
+    hits = await in_executor(shared.lexical_hits, query, limit)
+    pipeline = shared.build_lexical_pipeline(query, filters, limit, hits)
+    if pipeline is None:
+        return []
+    try:
+        results = await aggregate(pipeline)
+    except Exception as te:
+        if not shared.text_search_rejected(te):
+            raise
+        pipeline = shared.build_lexical_pipeline(query, filters, limit)
+        results = await aggregate(pipeline) if pipeline else []
+    return shared.order_lexical_results(results, hits, limit)
+
+
+async def finish_search(query, filters, limit, mode, results):
+    if mode == "vector" and results:
+        return results
+    if mode == "vector":
+        shared.search_fallbacks.inc()
+    try:
+        with shared.timers.stage("lexical"):
+            lexical = await run_lexical_search(query, filters, shared.search_depth(limit, mode))
+    except Exception as fe:
+        print(f"❌ Lexical search failed: {fe}")
+        lexical = []
+    return shared.fuse_results(results, lexical, limit) if mode == "hybrid" else lexical
+
+
+async def search_results(query, negative_query, negative_weight, filters, limit, mode):
+    filters = filters or {}
+    cache_key = shared.search_cache_key(query, negative_query, negative_weight, filters, limit, mode)
+    cached = shared.search_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    results = []
+    if mode != "lexical":
+        with shared.timers.stage("embed"):
+            if negative_query:
+                query_vector, negative_vector = await in_executor(shared.embed_texts, [query, negative_query])
+            else:
+                query_vector, negative_vector = await in_executor(shared.embed_text, query), None
+        with shared.timers.stage("vector_search"):
+            results, _ = await timed_vector_search(await in_executor(shared.get_local_index), query_vector,
+                                                   negative_vector, negative_weight, filters,
+                                                   shared.search_depth(limit, mode))
+
+    results = await finish_search(query, filters, limit, mode, results)
+    shared.search_cache.set(cache_key, results)
+    return results
+
+
+async def admitted_search(*spec):
+    """flask_server.admitted_search on the event loop: one admitted computation per in-flight spec."""
+    cache_key = shared.search_cache_key(*spec)
+    cached = shared.search_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    async def run():
+        async with shared.search_admission.aslot():
+            return await search_results(*spec)
+
+    return await shared.search_flight.do(cache_key, run)
+
+
+async def search_batch(specs):
+    """flask_server.search_batch: one embed batch; Atlas aggregates run concurrently on the loop."""
+    out = [None] * len(specs)
+    pending = []
+    for i, spec in enumerate(specs):
+        cached = shared.search_cache.get(shared.search_cache_key(*spec))
+        if cached is not None:
+            out[i] = {"results": cached, "took_ms": 0.0, "cached": True}
+        else:
+            pending.append(i)
+
+    vector = [i for i in pending if specs[i][5] != "lexical" and specs[i][0]]
+    found = {}
+    if vector:
+        negatives = [i for i in vector if specs[i][1]]
+        with shared.timers.stage("embed"):
+            vecs = await in_executor(shared.embed_texts,
+                                     [specs[i][0] for i in vector] + [specs[i][1] for i in negatives])
+        query_vectors = dict(zip(vector, vecs))
+        negative_vectors = dict(zip(negatives, vecs[len(vector):]))
+        depths = {i: shared.search_depth(specs[i][4], specs[i][5]) for i in vector}
+
+        index = await in_executor(shared.get_local_index)
+        with shared.timers.stage("vector_search"):
+            if index is not None:
+                try:
+                    batched = await in_executor(
+                        index.search_many, [query_vectors[i] for i in vector], [depths[i] for i in vector],
+                        shared.VECTOR_NUM_CANDIDATES, [specs[i][3] for i in vector],
+                        [negative_vectors.get(i) for i in vector], [specs[i][2] for i in vector],
+                    )
+                    found = dict(zip(vector, batched))
+                except Exception as ve:
+                    print(f"⚠️ Batched vector search failed, falling back to lexical search: {ve}")
+                    shared.vector_search_failures.inc()
+            else:
+                timed = await asyncio.gather(*(
+                    timed_vector_search(None, query_vectors[i], negative_vectors.get(i), specs[i][2], specs[i][3],
+                                        depths[i])
+                    for i in vector
+                ))
+                found = dict(zip(vector, timed))
+
+    async def finish(i):
+        query, negative_query, negative_weight, filters, limit, mode = specs[i]
+        results, took_ms = found.get(i, ([], 0.0))
+        started = time.perf_counter()
+        if query:
+            results = await finish_search(query, filters or {}, limit, mode, results)
+            shared.search_cache.set(shared.search_cache_key(*specs[i]), results)
+        took_ms += (time.perf_counter() - started) * 1000
+        out[i] = {"results": results, "took_ms": round(took_ms, 2), "cached": False}
+
+    await asyncio.gather(*(finish(i) for i in pending))
+    return out
+
+
+# ------------------------
+# Routes
+# ------------------------
+async def generate_query_json(cache_key, user_input):
+    """Async flask_server.generate_query_json: one admitted Groq call per in-flight key."""
+    async with shared.groq_admission.aslot():
+        with shared.timers.stage("groq"):
+            text = await state["groq"].chat(shared.groq_messages(user_input), temperature=0.2)
+    if text:
+        shared.groq_cache.set(cache_key, text)
+    return text
+
+
+async def run_groq(request: Request):
+    try:
+        user_input = shared.extract_user_input(await json_body(request) or {})
+
+        if not shared.GROQ_API_KEY:
+            shared.groq_fallbacks.inc(reason="no_key")
+            return JSONResponse({"response": shared.fallback_query_json(user_input)})
+
+        cache_key = normalize_query(user_input)
+        cached = shared.groq_cache.get(cache_key)
+        if cached is not None:
+            return JSONResponse({"response": cached})
+
+        try:
+            text = await shared.groq_flight.do(cache_key, lambda: generate_query_json(cache_key, user_input))
+        except Overloaded:
+            shared.groq_fallbacks.inc(reason="shed")
+            return JSONResponse({"response": shared.fallback_query_json(user_input)})
+        if not text:
+            shared.groq_fallbacks.inc(reason="upstream")
+            return JSONResponse({"response": shared.fallback_query_json(user_input)})
+        return JSONResponse({"response": text})
+    except Exception as e:
+        print(f"❌ run_groq error: {e}")
+        shared.groq_fallbacks.inc(reason="error")
+        # Never 500 the client here; always provide a fallback response
+        return JSONResponse({"response": shared.fallback_query_json("")})
+
+
+async def search_movies(request: Request):
+    try:
+        spec = shared.search_spec(await json_body(request))
+        if not spec[0]:
+            return JSONResponse({"results": []})
+        try:
+            results = await admitted_search(*spec)
+        except Overloaded as e:
+            return respond(shared.overloaded_response(e))
+        return JSONResponse({"results": results})
+    except Exception as e:
+        print(f"❌ /search error: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def search_movies_batch(request: Request):
+    try:
+        specs, error = shared.batch_specs(await json_body(request))
+        if error:
+            return respond(error)
+        started = time.perf_counter()
+        responses = await search_batch(specs)
+        return JSONResponse({"responses": responses, "took_ms": round((time.perf_counter() - started) * 1000, 2)})
+    except Exception as e:
+        print(f"❌ /search/batch error: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def similar_movies(request: Request):
+    try:
+        movie_id = request.path_params["movie_id"]
+        limit = int(request.query_params.get("limit", 10))
+        table = await in_executor(shared.get_neighbor_table)
+        hits = table.lookup(movie_id, limit) if table is not None else None
+        if hits is None:
+            hits = shared.stored_neighbors(
+                await state["coll"].find_one({"id": movie_id}, shared.NEIGHBORS_PROJECTION), limit)
+        if hits is None:
+            return respond(shared.no_neighbors_response(movie_id))
+        with shared.timers.stage("fetch"):
+            cursor = state["coll"].find({"id": {"$in": [n for n, _ in hits]}}, shared.SEARCH_PROJECTION)
+            docs = await cursor.to_list(length=None)
+        return JSONResponse({"id": movie_id, "results": shared.order_lexical_results(docs, hits, limit)})
+    except Exception as e:
+        print(f"❌ /similar error: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def stats(request: Request):
+    return JSONResponse(shared.stats_payload(groq=state["groq"]))
+
+
+async def health(request: Request):
+    """Readiness probe: pings Mongo through Motor (which reconnects on its own)."""
+    started = time.perf_counter()
+    try:
+        await state["mongo"].admin.command("ping")
+    except Exception as e:
+        print(f"⚠️ Mongo ping failed: {e}")
+        return JSONResponse({"status": "degraded", "mongo": {"driver": "motor", "error": str(e)}}, status_code=503)
+    ping_ms = round((time.perf_counter() - started) * 1000.0, 1)
+    return JSONResponse({"status": "ok", "mongo": {"driver": "motor", "ping_ms": ping_ms}})
+
+
+async def prometheus_metrics(request: Request):
+    return PlainTextResponse(shared.metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+async def home(request: Request):
+    return JSONResponse({"status": "Server running"})
+
+
+routes = []
+for prefix in ("", "/api"):
+    routes += [
+        Route(f"{prefix}/run-groq", run_groq, methods=["POST"]),
+        Route(f"{prefix}/search", search_movies, methods=["POST"]),
+        Route(f"{prefix}/search/batch", search_movies_batch, methods=["POST"]),
+        Route(f"{prefix}/similar/{{movie_id}}", similar_movies, methods=["GET"]),
+        Route(f"{prefix}/stats", stats, methods=["GET"]),
+        Route(f"{prefix}/health", health, methods=["GET"]),
+        Route(f"{prefix}/metrics", prometheus_metrics, methods=["GET"]),
+        Route(prefix or "/", home, methods=["GET"]),
+    ]
+
+app = Starlette(
+    routes=routes,
+    middleware=[
+        Middleware(
+            CORSMiddleware,
+            allow_origins=shared.allowed_origins,
+            allow_credentials=True,
+            allow_methods=["GET", "POST", "OPTIONS", "PUT", "PATCH", "DELETE"],
+            allow_headers=["Content-Type", "Authorization", "X-Requested-With"],
+        )
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", "5000")))
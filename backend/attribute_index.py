@@ -0,0 +1,211 @@
+"""
+Attribute indexes for pre-filtered vector search.
+
+AttributeIndex keeps, over the row order of a LocalVectorIndex, one packed
+bitset per genre / language value and a sorted value array per numeric
+field (year, rating, duration). mask(filters) evaluates the Mongo filter
+built by buildMongoFilters / filters_from_row_checker into an allowed-row
+mask *before* any vector is scored, so selective filters still fill
+`limit`. Filters it cannot evaluate return None and callers fall back to
+post-filtering with matches_filter.
+
+split_prefilter() does the same job for Atlas: clauses over FILTER_FIELDS
+go into $vectorSearch.filter (the fields must be declared as "filter" in
+movie_vector_index), anything else stays in a trailing $match.
+"""
+
+import numbers
+
+import numpy as np
+
+BITSET_FIELDS = ("genres", "languages")
+RANGE_FIELDS = ("year", "rating", "duration")
+FILTER_FIELDS = RANGE_FIELDS + BITSET_FIELDS
+_OPERATORS = ("$eq", "$ne", "$in", "$nin", "$gt", "$gte", "$lt", "$lte")
+
+
+def _range_clause(field, low, high):
+    cond = {}
+    if low is not None:
+        cond["$gte"] = low
+    if high is not None:
+        cond["$lte"] = high
+    return {field: cond} if cond else None
+
+
+def filters_from_row_checker(row_checker):
+    """Mongo filter for a row_checker dict (mirrors buildMongoFilters in mongo_query_script.jsx)."""
+    row_checker = row_checker or {}
+    clauses = [
+        _range_clause("year", row_checker.get("min_year"), row_checker.get("max_year")),
+        _range_clause("rating", row_checker.get("min_rating"), row_checker.get("max_rating")),
+        _range_clause("duration", row_checker.get("min_duration"), row_checker.get("max_duration")),
+    ]
+    for field in BITSET_FIELDS:
+        if row_checker.get(f"required_{field}"):
+            clauses.append({field: {"$in": list(row_checker[f"required_{field}"])}})
+        if row_checker.get(f"excluded_{field}"):
+            clauses.append({field: {"$nin": list(row_checker[f"excluded_{field}"])}})
+    clauses = [c for c in clauses if c]
+    return {"$and": clauses} if clauses else {}
+
+
+def _indexable(flt):
+    """True if every clause of flt only uses FILTER_FIELDS and the operators AttributeIndex evaluates."""
+    if not isinstance(flt, dict):
+        return False
+    for key, cond in flt.items():
+        if key in ("$and", "$or"):
+            if not isinstance(cond, list) or not all(_indexable(c) for c in cond):
+                return False
+        elif key not in FILTER_FIELDS:
+            return False
+        elif isinstance(cond, dict):
+            if not cond or not all(op in _OPERATORS for op in cond):
+                return False
+            if any(isinstance(v, dict) or (isinstance(v, list) != (op in ("$in", "$nin")))
+                   for op, v in cond.items()):
+                return False
+        elif isinstance(cond, (list, dict)):
+            return False
+    return True
+
+
+def split_prefilter(filters):
+    """Split filters into (prefilter, postfilter); either may be None."""
+    if not filters:
+        return None, None
+    if _indexable(filters):
+        return filters, None
+    if set(filters) == {"$and"} and isinstance(filters["$and"], list):
+        pre = [c for c in filters["$and"] if _indexable(c)]
+        post = [c for c in filters["$and"] if not _indexable(c)]
+        return ({"$and": pre} if pre else None), ({"$and": post} if post else None)
+    return None, filters
+
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, numbers.Real):
+        return None
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+class AttributeIndex:
+    """Bitsets and sorted arrays over a fixed list of docs (row i = docs[i])."""
+
+    def __init__(self, docs):
+        self.size = len(docs)
+        self.bitsets = {}
+        self.sorted_values = {}
+        self.sorted_rows = {}
+
+        for field in BITSET_FIELDS:
+            rows_by_value = {}
+            for row, doc in enumerate(docs):
+                values = doc.get(field)
+                for value in (values if isinstance(values, list) else [values]):
+                    if value is not None and not isinstance(value, (list, dict)):
+                        rows_by_value.setdefault(value, []).append(row)
+            self.bitsets[field] = {value: self._pack(rows) for value, rows in rows_by_value.items()}
+
+        for field in RANGE_FIELDS:
+            values = np.array([_number(d.get(field)) for d in docs], dtype=np.float64)
+            rows = np.flatnonzero(~np.isnan(values))
+            order = rows[np.argsort(values[rows], kind="stable")]
+            self.sorted_values[field] = values[order]
+            self.sorted_rows[field] = order
+
+    # ------------------------
+    def _pack(self, rows):
+        mask = np.zeros(self.size, dtype=bool)
+        mask[rows] = True
+        return np.packbits(mask)
+
+    def _all(self):
+        return self._pack(slice(None))
+
+    def _none(self):
+        return np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def _not(self, bits):
+        # Padding bits past `size` are ignored by unpackbits(count=size)
+        return np.bitwise_not(bits)
+
+    def _union(self, parts):
+        out = self._none()
+        for part in parts:
+            out |= part
+        return out
+
+    def _range(self, field, op, operand):
+        values, rows = self.sorted_values[field], self.sorted_rows[field]
+        if op == "$gt":
+            selected = rows[np.searchsorted(values, operand, side="right"):]
+        elif op == "$gte":
+            selected = rows[np.searchsorted(values, operand, side="left"):]
+        elif op == "$lt":
+            selected = rows[:np.searchsorted(values, operand, side="left")]
+        elif op == "$lte":
+            selected = rows[:np.searchsorted(values, operand, side="right")]
+        else:
+            lo, hi = np.searchsorted(values, operand, side="left"), np.searchsorted(values, operand, side="right")
+            selected = rows[lo:hi]
+        return self._pack(selected)
+
+    def _equals(self, field, operand):
+        if field in self.bitsets:
+            return self.bitsets[field].get(operand, self._none())
+        number = _number(operand)
+        return self._none() if number is None else self._range(field, "$eq", number)
+
+    def _condition(self, field, op, operand):
+        if op in ("$in", "$nin"):
+            bits = self._union(self._equals(field, v) for v in operand)
+            return self._not(bits) if op == "$nin" else bits
+        if op in ("$eq", "$ne"):
+            bits = self._equals(field, operand)
+            return self._not(bits) if op == "$ne" else bits
+        number = _number(operand)
+        if field in self.bitsets or number is None:
+            return None  # range over a string field or a non-numeric bound
+        return self._range(field, op, number)
+
+    def mask_bits(self, flt):
+        """Packed allowed-row bitset for a Mongo filter, or None if it can't be evaluated here."""
+        if not _indexable(flt):
+            return None
+        out = self._all()
+        for key, cond in flt.items():
+            if key in ("$and", "$or"):
+                parts = [self.mask_bits(c) for c in cond]
+                if any(p is None for p in parts):
+                    return None
+                if key == "$or":
+                    out &= self._union(parts)
+                else:
+                    for part in parts:
+                        out &= part
+                continue
+            conditions = cond.items() if isinstance(cond, dict) else [("$eq", cond)]
+            for op, operand in conditions:
+                bits = self._condition(key, op, operand)
+                if bits is None:
+                    return None
+                out &= bits
+        return out
+
+    def mask(self, flt):
+        """Boolean allowed-row mask of length size, or None (see mask_bits)."""
+        bits = self.mask_bits(flt)
+        if bits is None:
+            return None
+        return np.unpackbits(bits, count=self.size).astype(bool)
+
+    def stats(self):
+        return {
+            "rows": self.size,
+            "bitsets": {f: len(v) for f, v in self.bitsets.items()},
+            "bitset_bytes": int(sum(b.nbytes for v in self.bitsets.values() for b in v.values())),
+            "ranges": {f: int(len(v)) for f, v in self.sorted_values.items()},
+        }
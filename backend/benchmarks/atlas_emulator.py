@@ -0,0 +1,76 @@
+"""
+$vectorSearch emulation for collections that are not on Atlas.
+
+A plain mongod or mongomock rejects the $vectorSearch stage, so
+EmulatedVectorSearch wraps the collection and answers pipelines that start
+with it from an in-process LocalVectorIndex (honouring $vectorSearch.filter
+as a pre-filter, like Atlas), then applies the remaining $match / $project /
+$limit stages in Python. Every other call is forwarded
+to the real collection, so the regex fallback still runs in Mongo.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_index import LocalVectorIndex, matches_filter
+
+
+def _project(doc, spec, score, embedding):
+    out = {}
+    for key, value in spec.items():
+        if key == "_id":
+            continue
+        if isinstance(value, dict) and value.get("$meta") == "vectorSearchScore":
+            out[key] = score
+        elif value:
+            if key == "embedding":
+                out[key] = embedding
+            elif key in doc:
+                out[key] = doc[key]
+    return out
+
+
+class EmulatedVectorSearch:
+    def __init__(self, coll, index=None):
+        self._coll = coll
+        self.index = index if index is not None else LocalVectorIndex.from_collection(coll)
+
+    def __getattr__(self, name):
+        return getattr(self._coll, name)
+
+    def aggregate(self, pipeline, **kwargs):
+        if not pipeline or "$vectorSearch" not in pipeline[0]:
+            return self._coll.aggregate(pipeline, **kwargs)
+
+        spec = pipeline[0]["$vectorSearch"]
+        limit = int(spec["limit"])
+        rows, sims, pre_filter = self.index.filtered_top_k(
+            spec["queryVector"], max(int(spec.get("numCandidates", limit)), limit), spec.get("filter")
+        )
+        hits = []
+        for row, sim in zip(rows, sims):
+            doc = self.index.docs[row]
+            if pre_filter and not matches_filter(doc, pre_filter):
+                continue
+            hits.append((doc, (1.0 + float(sim)) / 2.0, row))
+            if len(hits) >= limit:
+                break
+
+        projection = None
+        results = [(dict(doc), score, row) for doc, score, row in hits]
+        for stage in pipeline[1:]:
+            (op, arg), = stage.items()
+            if op == "$match":
+                results = [r for r in results if matches_filter(r[0], arg)]
+            elif op == "$project":
+                projection = arg
+            elif op == "$limit":
+                results = results[:int(arg)]
+            else:
+                raise ValueError(f"Unsupported stage after $vectorSearch: {op}")
+
+        if projection is None:
+            return [doc for doc, _, _ in results]
+        return [_project(doc, projection, score, self.index.row_vectors([row])[0].tolist()) for doc, score, row in results]
@@ -0,0 +1,123 @@
+"""
+Seeded synthetic movie corpus and a deterministic stand-in encoder.
+
+HashEncoder maps every token to a fixed pseudo-random unit vector and
+averages them, so texts that share words land close together (enough for
+filters, negative queries and re-ranking to behave realistically) without
+downloading a model.
+"""
+
+import csv
+import hashlib
+
+import numpy as np
+
+GENRES = ["Action", "Adventure", "Animation", "Comedy", "Crime", "Drama", "Fantasy",
+          "Horror", "Mystery", "Romance", "Sci-Fi", "Thriller", "War", "Western"]
+LANGUAGES = ["English", "French", "Spanish", "Korean", "Japanese", "Hindi", "German", "Italian"]
+WORDS = [
+    "heist", "detective", "space", "robot", "love", "revenge", "family", "war", "ghost", "island",
+    "journey", "murder", "dragon", "school", "city", "secret", "storm", "king", "prison", "train",
+    "alien", "wedding", "desert", "ocean", "spy", "music", "time", "forest", "empire", "dream",
+]
+
+
+class HashEncoder:
+    """SentenceTransformer-compatible encode() backed by hashed token vectors."""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+        self._token_vectors = {}
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def _token(self, token):
+        vec = self._token_vectors.get(token)
+        if vec is None:
+            seed = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            vec = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+            vec /= np.linalg.norm(vec)
+            self._token_vectors[token] = vec
+        return vec
+
+    def _one(self, text):
+        tokens = str(text or "").lower().split()
+        if not tokens:
+            return np.zeros(self.dim, dtype=np.float32)
+        vec = np.mean([self._token(t) for t in tokens], axis=0)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        if isinstance(sentences, str):
+            return self._one(sentences)
+        if not len(sentences):
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self._one(s) for s in sentences])
+
+
+def make_movies(n, seed=0, encoder=None):
+    """Return n movie docs shaped like the ingested collection (embedding included if encoder)."""
+    rng = np.random.default_rng(seed)
+    docs = []
+    for i in range(n):
+        words = rng.choice(WORDS, size=8)
+        genres = sorted(set(rng.choice(GENRES, size=rng.integers(1, 4))))
+        languages = sorted(set(rng.choice(LANGUAGES, size=rng.integers(1, 3))))
+        description = f"A {' '.join(words[:4])} story about {' '.join(words[4:])}"
+        docs.append({
+            "_id": f"tt{i:07d}",
+            "id": f"tt{i:07d}",
+            "title": f"{words[0].title()} {words[1].title()} {i}",
+            "year": int(rng.integers(1960, 2025)),
+            "genres": genres,
+            "languages": languages,
+            "rating": round(float(rng.uniform(1, 10)), 1),
+            "duration": int(rng.integers(70, 200)),
+            "description": description,
+        })
+    if encoder is not None:
+        vectors = encoder.encode([d["description"] for d in docs])
+        for doc, vec in zip(docs, vectors):
+            doc["embedding"] = vec.tolist()
+    return docs
+
+
+def seed_collection(coll, n, seed=0, encoder=None, batch=1000):
+    """Replace coll's contents with n synthetic movies; returns the docs."""
+    encoder = encoder or HashEncoder()
+    docs = make_movies(n, seed=seed, encoder=encoder)
+    coll.delete_many({})
+    for start in range(0, len(docs), batch):
+        coll.insert_many([dict(d) for d in docs[start:start + batch]])
+    return docs
+
+
+def write_csv(path, n, seed=0):
+    """Write n synthetic movies as a cleaned CSV (list cells as Python reprs, like the notebook)."""
+    docs = make_movies(n, seed=seed)
+    fields = ["id", "title", "year", "genres", "languages", "rating", "duration", "description"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for doc in docs:
+            writer.writerow({k: (repr(doc[k]) if isinstance(doc[k], list) else doc[k]) for k in fields})
+    return path
+
+
+def make_queries(n, seed=1):
+    """Return n /search request bodies mixing plain, negative and filtered queries."""
+    rng = np.random.default_rng(seed)
+    bodies = []
+    for i in range(n):
+        body = {"query": " ".join(rng.choice(WORDS, size=3)), "limit": 10}
+        if i % 3 == 1:
+            body["negative_query"] = " ".join(rng.choice(WORDS, size=2))
+        if i % 4 == 2:
+            body["filters"] = {"$and": [
+                {"genres": {"$in": [str(rng.choice(GENRES))]}},
+                {"year": {"$gte": int(rng.integers(1960, 2000))}},
+            ]}
+        bodies.append(body)
+    return bodies
@@ -0,0 +1,102 @@
+"""
+Closed-loop load generator and latency summaries.
+
+run_load() keeps `concurrency` workers busy calling fn(payload) over the
+payload list (cycled until `requests` calls are done) and reports
+throughput plus p50/p95/p99. StageTimer accumulates per-stage timings
+recorded by the scenarios.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+
+
+def summarize(samples):
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    if not samples:
+        return {"count": 0, "mean": None, "p50": None, "p95": None, "p99": None, "max": None}
+    arr = np.asarray(samples, dtype=np.float64) * 1000.0
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {
+        "count": int(arr.size),
+        "mean": round(float(arr.mean()), 3),
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "max": round(float(arr.max()), 3),
+    }
+
+
+class StageTimer:
+    """Thread-safe collection of per-stage durations."""
+
+    def __init__(self):
+        self._samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self._samples[stage].append(seconds)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def as_dict(self):
+        with self._lock:
+            return {name: summarize(samples) for name, samples in self._samples.items()}
+
+
+def run_load(fn, payloads, requests=200, concurrency=8, warmup=0):
+    """Call fn(payload) `requests` times from `concurrency` threads; return a summary dict."""
+    for i in range(warmup):
+        fn(payloads[i % len(payloads)])
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            try:
+                fn(payloads[i % len(payloads)])
+                ok = True
+            except Exception as e:
+                ok = False
+                err = repr(e)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors.append(err)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(requests / wall, 2) if wall else None,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "latency_ms": summarize(latencies),
+    }
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Connection-count stress test for mongo_connection against a real mongod.
+
+The parent creates the shared client first (like a gunicorn --preload
+master), then forks --processes workers. Each worker runs --threads
+threads issuing find_one / aggregate through get_manager().collection()
+for --seconds. The parent samples serverStatus().connections every
+--sample-ms and reports current/min/max/mean plus connections created
+during the run.
+
+With the shared manager, connections plateau at about
+processes * (MONGO_MAX_POOL_SIZE + 2 monitor sockets) and stop being
+created once the pools are warm. --naive opens a MongoClient per
+operation for comparison (connection churn, totalCreated keeps growing).
+The exit status is non-zero if connections exceed the ceiling or any
+operation failed.
+
+Usage:
+    python backend/benchmarks/mongo_stress.py --uri mongodb://localhost:27017
+    python backend/benchmarks/mongo_stress.py --processes 4 --threads 64 --seconds 30
+    python backend/benchmarks/mongo_stress.py --naive --seconds 10
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import pymongo
+
+import mongo_connection
+from loadgen import summarize
+
+MONITOR_SOCKETS = 2  # pymongo's per-server monitor and RTT connections
+
+
+def connection_counts(admin):
+    status = admin.command("serverStatus")["connections"]
+    return status["current"], status["totalCreated"]
+
+
+def seed(coll, docs):
+    if coll.estimated_document_count() >= docs:
+        return
+    coll.drop()
+    coll.insert_many([{"id": f"tt{i}", "title": f"Movie {i}", "year": 1950 + i % 75, "rating": (i % 100) / 10}
+                      for i in range(docs)])
+    coll.create_index("id")
+
+
+def worker(args, stop_at, queue):
+    """One forked 'server process': threads hammering the shared client."""
+    manager = mongo_connection.get_manager(args.uri)
+    latencies, errors, lock = [], [0], threading.Lock()
+
+    def run(seed_value):
+        i = seed_value
+        while time.time() < stop_at:
+            started = time.perf_counter()
+            try:
+                if args.naive:
+                    client = pymongo.MongoClient(args.uri, **mongo_connection.client_options(args.uri))
+                    coll = client[args.db][args.collection]
+                else:
+                    coll = manager.collection(args.db, args.collection)
+                if i % 4:
+                    coll.find_one({"id": f"tt{i % args.docs}"}, {"_id": 0})
+                else:
+                    list(coll.aggregate([{"$match": {"year": {"$gte": 1950 + i % 75}}}, {"$limit": 20}]))
+                if args.naive:
+                    client.close()
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+            except Exception as e:
+                with lock:
+                    errors[0] += 1
+                if errors[0] == 1:
+                    print(f"❌ pid {os.getpid()}: {e}")
+            i += 7
+
+    threads = [threading.Thread(target=run, args=(t,)) for t in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    queue.put({"pid": os.getpid(), "ops": len(latencies), "errors": errors[0], "latency_ms": summarize(latencies),
+               "clients_created": manager.connects})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stress the shared Mongo client across processes and threads.")
+    parser.add_argument("--uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="cinebot_stress")
+    parser.add_argument("--collection", default="movies_stress")
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--sample-ms", type=float, default=250)
+    parser.add_argument("--naive", action="store_true", help="New MongoClient per operation (baseline)")
+    parser.add_argument("--output", default=os.path.join(BENCH_DIR, "results"))
+    args = parser.parse_args(argv)
+
+    # Shared client created before the fork, as a preloading master would
+    parent = mongo_connection.get_manager(args.uri)
+    seed(parent.collection(args.db, args.collection), args.docs)
+    admin = pymongo.MongoClient(args.uri, **dict(mongo_connection.client_options(args.uri), maxPoolSize=1)).admin
+    baseline, created_before = connection_counts(admin)
+
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    stop_at = time.time() + args.seconds
+    procs = [ctx.Process(target=worker, args=(args, stop_at, queue)) for _ in range(args.processes)]
+    for p in procs:
+        p.start()
+
+    samples = []
+    while time.time() < stop_at:
+        samples.append(connection_counts(admin)[0] - baseline)
+        time.sleep(args.sample_ms / 1000.0)
+    workers = [queue.get() for _ in procs]
+    for p in procs:
+        p.join()
+    created = connection_counts(admin)[1] - created_before
+
+    # Ignore the first quarter of samples while pools warm up
+    steady = samples[len(samples) // 4:] or samples
+    ceiling = args.processes * (mongo_connection.MONGO_MAX_POOL_SIZE + MONITOR_SOCKETS)
+    report = {
+        "meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "mode": "naive" if args.naive else "shared",
+                 "params": {k: v for k, v in vars(args).items() if k != "output"},
+                 "max_pool_size": mongo_connection.MONGO_MAX_POOL_SIZE},
+        "connections": {"baseline": baseline, "ceiling": ceiling, "max": max(samples, default=0),
+                        "min_steady": min(steady, default=0), "max_steady": max(steady, default=0),
+                        "mean_steady": round(sum(steady) / len(steady), 1) if steady else 0,
+                        "created_during_run": created},
+        "ops": sum(w["ops"] for w in workers),
+        "ops_per_s": round(sum(w["ops"] for w in workers) / args.seconds, 1),
+        "errors": sum(w["errors"] for w in workers),
+        "workers": workers,
+    }
+    os.makedirs(args.output, exist_ok=True)
+    out_path = os.path.join(args.output, f"mongo-stress-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps({k: v for k, v in report.items() if k != "workers"}, indent=2))
+    print(f"✅ Results saved to {out_path}")
+
+    if report["errors"]:
+        print(f"❌ {report['errors']} failed operations")
+        return 1
+    if not args.naive and report["connections"]["max"] > ceiling:
+        print(f"❌ {report['connections']['max']} connections exceed the expected ceiling of {ceiling}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
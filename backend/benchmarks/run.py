@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark and load test for the search backend.
+
+Seeds a synthetic corpus (384-dim HashEncoder embeddings) into mongomock or
+a local mongod, starts the stub Groq / HF server, imports flask_server
+against them and runs these scenarios:
+
+    search   per-stage timings of /search (embed, aggregate, fallback_regex,
+             lexical, serialize) plus a concurrent load test through the Flask app,
+             cold and with warm caches
+    groq     concurrent load test of /run-groq against the stub Groq API
+    similar  MongoNativePipeline.search_similar (embed, aggregate)
+    ingest   ingest.ingest() of a synthetic CSV (embed_batch, bulk_upsert)
+
+Results are written as JSON to backend/benchmarks/results/ and can be
+compared against a previous run with --compare; p95 regressions above
+--threshold are reported and make the exit status non-zero.
+
+When the target is not Atlas, $vectorSearch is answered by
+atlas_emulator.EmulatedVectorSearch, so `aggregate` measures the emulated
+search, not Atlas.
+
+The default --mongo mongomock needs the dev requirements:
+    pip install -r backend/requirements-dev.txt
+
+Usage:
+    python backend/benchmarks/run.py
+    python backend/benchmarks/run.py --mongo mongodb://localhost:27017 --docs 20000
+    python backend/benchmarks/run.py --compare backend/benchmarks/results/baseline.json
+"""
+
+import argparse
+import atexit
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from atlas_emulator import EmulatedVectorSearch
+from corpus import HashEncoder, make_queries, seed_collection, write_csv
+from lexical_index import BM25Index, doc_text
+from loadgen import StageTimer, run_load, summarize
+from stub_server import start_stub
+
+SCENARIOS = ("search", "groq", "similar", "ingest")
+
+
+def connect(mongo):
+    """Return a MongoClient for `mongo`; "mongomock" also makes pymongo.MongoClient hand it out."""
+    import pymongo
+
+    if mongo != "mongomock":
+        return pymongo.MongoClient(mongo)
+    import mongomock
+
+    client = mongomock.MongoClient()
+    # mongo_connection builds the shared client for flask_server and MongoNativePipeline on first use
+    pymongo.MongoClient = lambda *args, **kwargs: client
+    return client
+
+
+def timed(obj, name, timer, stage):
+    """Replace obj.name with a wrapper that records its duration under `stage`."""
+    original = getattr(obj, name)
+
+    def wrapper(*args, **kwargs):
+        with timer.stage(stage):
+            return original(*args, **kwargs)
+
+    setattr(obj, name, wrapper)
+    return original
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def clear_caches(fs):
+    for cache in (fs.embedding_cache, fs.search_cache, fs.groq_cache):
+        cache.clear()
+
+
+# ------------------------
+# Scenarios
+# ------------------------
+def bench_search(fs, args):
+    queries = make_queries(args.requests, seed=args.seed + 1)
+    timer = StageTimer()
+    clear_caches(fs)
+
+    # Stage breakdown, sequential, mirroring search_movies()
+    for body in queries:
+        query, negative_query, negative_weight, filters, limit = fs.parse_search_request(body)
+        with timer.stage("embed"):
+            if negative_query:
+                query_vector, negative_vector = fs.embed_texts([query, negative_query])
+            else:
+                query_vector, negative_vector = fs.embed_text(query), None
+        with timer.stage("aggregate"):
+            if fs.get_local_index() is not None:
+                results = fs.get_local_index().search(
+                    query_vector, limit=limit, num_candidates=fs.VECTOR_NUM_CANDIDATES, filters=filters,
+                    negative_vector=negative_vector, negative_weight=negative_weight,
+                )
+            else:
+                pipeline = fs.build_vector_pipeline(query_vector, filters, limit,
+                                                    with_embedding=negative_vector is not None)
+                results = list(fs.get_coll().aggregate(pipeline))
+                if negative_vector is not None:
+                    results = fs.rerank_results(results, query_vector, negative_vector, negative_weight, limit=limit)
+        # Measured on every query even though /search only runs it on empty results
+        with timer.stage("fallback_regex"):
+            list(fs.get_coll().aggregate(fs.build_fallback_pipeline(query, filters, limit)))
+        with timer.stage("lexical"):
+            fs.run_lexical_search(fs.get_coll(), query, filters, limit)
+        with timer.stage("serialize"):
+            with fs.app.app_context():
+                fs.jsonify({"results": results}).get_data()
+
+    client = fs.app.test_client()
+
+    def call(body):
+        resp = client.post("/search", json=body)
+        if resp.status_code != 200:
+            raise RuntimeError(f"HTTP {resp.status_code}")
+
+    clear_caches(fs)
+    cold = run_load(call, queries, requests=args.requests, concurrency=args.concurrency)
+    warm = run_load(call, queries, requests=args.requests, concurrency=args.concurrency)
+    return {"stages_ms": timer.as_dict(), "load": cold, "load_warm_cache": warm}
+
+
+def bench_groq(fs, args):
+    client = fs.app.test_client()
+    payloads = [{"user_input": f"movies like request {i}"} for i in range(args.requests)]
+
+    def call(body):
+        resp = client.post("/run-groq", json=body)
+        if resp.status_code != 200:
+            raise RuntimeError(f"HTTP {resp.status_code}")
+
+    clear_caches(fs)
+    load = run_load(call, payloads, requests=args.requests, concurrency=args.concurrency)
+    return {"load": load, "client": fs.groq_client.stats()}
+
+
+def make_pipeline(args, mongo_client, timer):
+    from mongo_pipeline import MongoNativePipeline
+
+    pipeline = MongoNativePipeline(args.mongo if args.mongo != "mongomock" else None,
+                                   db_name=args.db, collection_name=args.collection)
+    # Use the benchmark's own client (no forced TLS against a local mongod)
+    pipeline.client = mongo_client
+    pipeline.db = mongo_client[args.db]
+    pipeline.coll = pipeline.db[args.collection]
+    pipeline.model = HashEncoder()
+    pipeline.model_version = "bench/hash-encoder"
+    timed(pipeline.model, "encode", timer, "embed")
+    return pipeline
+
+
+def bench_similar(args, mongo_client, emulate):
+    timer = StageTimer()
+    pipeline = make_pipeline(args, mongo_client, timer)
+    if emulate:
+        pipeline.coll = EmulatedVectorSearch(pipeline.coll)
+    timed(pipeline.coll, "aggregate", timer, "aggregate")
+
+    queries = make_queries(args.requests, seed=args.seed + 2)
+    filters = {"min_year": 1980, "required_genres": ["Drama", "Comedy"]}
+    latencies = []
+    for i, body in enumerate(queries):
+        start = time.perf_counter()
+        pipeline.search_similar(body["query"], top_k=10, filters=filters if i % 2 else None,
+                                negative_query=body.get("negative_query"))
+        latencies.append(time.perf_counter() - start)
+    return {"stages_ms": timer.as_dict(), "latency_ms": summarize(latencies)}
+
+
+def bench_ingest(args, mongo_client):
+    import ingest as ingest_module
+
+    timer = StageTimer()
+    pipeline = make_pipeline(args, mongo_client, timer)
+    timed(pipeline, "embed_batch", timer, "embed_batch")
+    timed(pipeline, "bulk_upsert", timer, "bulk_upsert")
+    target = pipeline.db[f"{args.collection}_bench_ingest"]
+    target.drop()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = write_csv(os.path.join(tmp, "movies.csv"), args.ingest_rows, seed=args.seed + 3)
+        start = time.perf_counter()
+        written = ingest_module.ingest(pipeline, csv_path, coll=target, batch_size=64, write_batch=500)
+        elapsed = time.perf_counter() - start
+    target.drop()
+    return {
+        "rows": written,
+        "wall_s": round(elapsed, 3),
+        "rows_per_s": round(written / elapsed, 1) if elapsed else None,
+        "stages_ms": timer.as_dict(),
+    }
+
+
+# ------------------------
+# Comparison
+# ------------------------
+def iter_p95(node, path=()):
+    """Yield (path, p95) for every latency summary nested in a results dict."""
+    if isinstance(node, dict):
+        if "p95" in node and "count" in node:
+            yield path, node["p95"]
+            return
+        for key, value in node.items():
+            yield from iter_p95(value, path + (key,))
+
+
+def compare(current, baseline, threshold):
+    """Print p95 deltas against a baseline run; return the list of regressions."""
+    base = dict(iter_p95(baseline.get("scenarios", {})))
+    regressions = []
+    print(f"\n📊 p95 vs baseline {baseline.get('meta', {}).get('git_revision')}:")
+    for path, p95 in iter_p95(current["scenarios"]):
+        old = base.get(path)
+        if old is None or p95 is None or not old:
+            continue
+        change = (p95 - old) / old
+        flag = "  ⚠️ regression" if change > threshold else ""
+        print(f"   {'.'.join(path):45s} {old:9.2f} -> {p95:9.2f} ms ({change:+.0%}){flag}")
+        if flag:
+            regressions.append(".".join(path))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark /search, /run-groq, search_similar and ingestion.")
+    parser.add_argument("--mongo", default="mongomock", help='"mongomock" or a MongoDB URI')
+    parser.add_argument("--db", default="cinebot_bench")
+    parser.add_argument("--collection", default="movies_bench")
+    parser.add_argument("--docs", type=int, default=5000, help="Synthetic movies to seed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="Requests per load test")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--vector-backend", choices=("atlas", "local"), default="atlas",
+                        help="VECTOR_SEARCH_BACKEND for flask_server")
+    parser.add_argument("--encoder", choices=("stub", "local"), default="stub",
+                        help="stub: HF API served by the stub server; local: real SentenceTransformer")
+    parser.add_argument("--groq-latency-ms", type=float, default=200.0)
+    parser.add_argument("--hf-latency-ms", type=float, default=20.0)
+    parser.add_argument("--ingest-rows", type=int, default=2000)
+    parser.add_argument("--output", default=os.path.join(BENCH_DIR, "results"))
+    parser.add_argument("--compare", help="Baseline results JSON to compare p95 against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative p95 increase")
+    args = parser.parse_args(argv)
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    stub, stub_url = start_stub(groq_latency_ms=args.groq_latency_ms, hf_latency_ms=args.hf_latency_ms)
+    print(f"✅ Stub Groq/HF server on {stub_url}")
+
+    mongo_client = connect(args.mongo)
+    start = time.perf_counter()
+    seed_collection(mongo_client[args.db][args.collection], args.docs, seed=args.seed)
+    print(f"✅ Seeded {args.docs} movies in {time.perf_counter() - start:.1f}s")
+
+    # BM25 index over the seeded corpus for the lexical fallback / hybrid stages
+    lexical_dir = tempfile.mkdtemp(prefix="bench-bm25-")
+    atexit.register(shutil.rmtree, lexical_dir, ignore_errors=True)
+    seeded = list(mongo_client[args.db][args.collection].find({}, {"_id": 0, "embedding": 0}))
+    BM25Index().build([d["id"] for d in seeded], [doc_text(d) for d in seeded]).save(lexical_dir, source="bench")
+
+    os.environ.update({
+        "MONGO_URI": args.mongo if args.mongo != "mongomock" else "mongodb://localhost:27017",
+        "DB_NAME": args.db,
+        "COLLECTION_NAME": args.collection,
+        "EMBEDDING_PROVIDER": "huggingface" if args.encoder == "stub" else "local",
+        "HUGGINGFACE_API_URL": f"{stub_url}/models/stub",
+        "HUGGINGFACE_API_KEY": os.getenv("HUGGINGFACE_API_KEY") or "bench",
+        "GROQ_API_URL": f"{stub_url}/openai/v1/chat/completions",
+        "GROQ_API_KEY": "bench",
+        "VECTOR_SEARCH_BACKEND": args.vector_backend,
+        "CACHE_BACKEND": "memory",
+        "LEXICAL_BACKEND": "bm25",
+        "LEXICAL_INDEX_DIR": lexical_dir,
+    })
+    import flask_server as fs
+
+    emulate = not args.mongo.startswith("mongodb+srv://")
+    if emulate and fs.get_local_index() is None:
+        fs.coll = EmulatedVectorSearch(fs.get_coll())
+
+    results = {}
+    for name in scenarios:
+        print(f"🔄 Running {name} ...")
+        if name == "search":
+            results[name] = bench_search(fs, args)
+        elif name == "groq":
+            results[name] = bench_groq(fs, args)
+        elif name == "similar":
+            results[name] = bench_similar(args, mongo_client, emulate)
+        elif name == "ingest":
+            results[name] = bench_ingest(args, mongo_client)
+    stub.shutdown()
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_revision": git_revision(),
+            "mongo": "mongomock" if args.mongo == "mongomock" else "mongodb",
+            "vector_search": "emulated" if emulate else "atlas",
+            "params": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        },
+        "scenarios": results,
+    }
+    os.makedirs(args.output, exist_ok=True)
+    out_path = os.path.join(args.output, f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"✅ Results saved to {out_path}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} p95 regression(s) above {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Cold-start budget report for flask_server.
+
+Imports flask_server in a fresh interpreter per mode (LAZY_STARTUP=true /
+false) with `-X importtime`, and reports wall time to import, peak RSS,
+the startup phase timings the server records itself, and the slowest
+imported modules. Exits non-zero when a mode exceeds --budget-ms.
+
+Usage:
+    python backend/benchmarks/startup_report.py
+    python backend/benchmarks/startup_report.py --modes lazy --budget-ms 1500
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import flask_server
+elapsed = (time.perf_counter() - started) * 1000.0
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print("STARTUP_REPORT " + json.dumps({
+    "import_ms": round(elapsed, 1),
+    "peak_rss_mb": round(rss / (1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0), 1),
+    "timings_ms": flask_server.startup_timings,
+    "torch_imported": "torch" in sys.modules,
+}))
+"""
+
+
+def parse_importtime(stderr, top):
+    """Return the `top` modules by cumulative import time from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # header line
+        rows.append((int(parts[1]), int(parts[0]), parts[2].strip()))
+    rows.sort(reverse=True)
+    return [
+        {"module": name, "cumulative_ms": round(c / 1000.0, 1), "self_ms": round(s / 1000.0, 1)}
+        for c, s, name in rows[:top]
+    ]
+
+
+def measure(mode, top):
+    env = dict(os.environ, LAZY_STARTUP="true" if mode == "lazy" else "false", WARM_ON_START="false")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    report = None
+    for line in proc.stdout.splitlines():
+        if line.startswith("STARTUP_REPORT "):
+            report = json.loads(line[len("STARTUP_REPORT "):])
+    if report is None:
+        tail = "\n".join(proc.stderr.splitlines()[-10:])
+        raise RuntimeError(f"flask_server import failed in {mode} mode:\n{tail}")
+    report["slowest_imports"] = parse_importtime(proc.stderr, top)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure flask_server cold-start time and RSS.")
+    parser.add_argument("--modes", default="lazy,eager", help="Comma-separated: lazy, eager")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail if import exceeds this")
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list")
+    parser.add_argument("--json", action="store_true", help="Print the raw JSON report")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        results[mode] = measure(mode, args.top)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for mode, r in results.items():
+            print(f"\n⏱️  {mode}: import {r['import_ms']:.0f} ms, peak RSS {r['peak_rss_mb']:.0f} MB, "
+                  f"torch imported: {r['torch_imported']}")
+            print(f"   phases: {r['timings_ms']}")
+            for row in r["slowest_imports"]:
+                print(f"   {row['cumulative_ms']:9.1f} ms  {row['module']}")
+
+    over = [m for m, r in results.items() if args.budget_ms is not None and r["import_ms"] > args.budget_ms]
+    if over:
+        print(f"❌ Over the {args.budget_ms:.0f} ms budget: {', '.join(over)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
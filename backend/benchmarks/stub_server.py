@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Groq chat-completions and HF Inference APIs.
+
+POST /openai/v1/chat/completions  -> a fixed structured-query completion (SSE when "stream": true)
+POST /models/<name>               -> HashEncoder embeddings for "inputs"
+
+Latency is injected per request (fixed + uniform jitter) so the load
+generator sees realistic upstream wait times. Point the backend at it with
+GROQ_API_URL and HUGGINGFACE_API_URL.
+
+Usage:
+    python backend/benchmarks/stub_server.py --port 8099 --groq-latency-ms 300
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from corpus import HashEncoder
+
+COMPLETION = json.dumps({
+    "positive_query": "space heist",
+    "negative_query": "romance",
+    "row_checker": {"required_genres": ["Sci-Fi"]},
+})
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, text, chunk_words=4):
+        """OpenAI-style SSE completion: one delta per few words, then [DONE]."""
+        words = text.split(" ")
+        frames = [
+            {"choices": [{"delta": {"content": " ".join(words[i:i + chunk_words]) + " "}}]}
+            for i in range(0, len(words), chunk_words)
+        ]
+        data = "".join(f"data: {json.dumps(f)}\n\n" for f in frames) + "data: [DONE]\n\n"
+        body = data.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _sleep(self, base_ms):
+        jitter = self.server.jitter_ms
+        delay = base_ms + (random.uniform(0, jitter) if jitter else 0)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._reply(400, {"error": "invalid json"})
+
+        if self.path.endswith("/chat/completions"):
+            self._sleep(self.server.groq_latency_ms)
+            if payload.get("stream"):
+                return self._stream(COMPLETION)
+            return self._reply(200, {"choices": [{"message": {"role": "assistant", "content": COMPLETION}}]})
+
+        if self.path.startswith("/models/"):
+            self._sleep(self.server.hf_latency_ms)
+            inputs = payload.get("inputs", "")
+            vectors = self.server.encoder.encode(inputs)
+            return self._reply(200, vectors.tolist())
+
+        self._reply(404, {"error": f"unknown path {self.path}"})
+
+
+def start_stub(host="127.0.0.1", port=0, groq_latency_ms=0.0, hf_latency_ms=0.0, jitter_ms=0.0, dim=384):
+    """Start the stub in a daemon thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.groq_latency_ms = groq_latency_ms
+    server.hf_latency_ms = hf_latency_ms
+    server.jitter_ms = jitter_ms
+    server.encoder = HashEncoder(dim)
+    threading.Thread(target=server.serve_forever, name="stub-server", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stub Groq / Hugging Face server for benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--groq-latency-ms", type=float, default=300.0)
+    parser.add_argument("--hf-latency-ms", type=float, default=40.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    server, url = start_stub(args.host, args.port, args.groq_latency_ms, args.hf_latency_ms, args.jitter_ms)
+    print(f"✅ Stub server on {url}")
+    print(f"   GROQ_API_URL={url}/openai/v1/chat/completions")
+    print(f"   HUGGINGFACE_API_URL={url}/models/stub")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Prompts and parsing for the server-side /chat orchestration.
+
+These used to run in the browser (src/ChatPage/index.jsx): the structured
+query prompt, the ```json extraction, the refine prompt and the local
+top-picks fallback. Keeping them here lets /chat and /chat/stream run the
+whole recommendation in one request.
+"""
+
+import json
+import re
+from datetime import date
+
+REPHRASE_REPLY = "Sorry, I couldn't understand your request. Can you rephrase it as a movie recommendation?"
+NO_RESULTS_REPLY = "I could not find matching movies. Try adjusting your filters or rephrasing your request."
+
+PARAMS_PROMPT = (
+    "Today's date is {today}.\n"
+    "If the user asks something other than movies promptly ask the user to rephrase the question and ask for "
+    "movie recommendations.\n"
+    "You are an assistant that takes a movie-related user prompt and extracts:\n"
+    "1. A positive_query: A string with words related what the user wants actors, places, themes plots etc. "
+    "( do not mention any actual movie and do not leave empty).\n"
+    "2. A negative_query: A string describing actors or themes the user wants to avoid.\n"
+    "3. A row_checker object that may include any of the following optional filters (do not put too many "
+    "restrictions, only what user asked for):\n"
+    "   - min_year (integer)\n"
+    "   - max_year (integer)\n"
+    "   - min_rating (float)\n"
+    "   - max_rating (float)\n"
+    "   - min_duration (integer, in minutes)\n"
+    "   - max_duration (integer, in minutes)\n"
+    "   - required_genres (list of strings)\n"
+    "   - excluded_genres (list of strings)\n"
+    "   - required_languages (list of strings)\n"
+    "   - excluded_languages (list of strings)\n"
+    "If the prompt is asking for movie recommendation return ONLY a valid JSON object with keys: "
+    "positive_query, negative_query, row_checker.\n"
+)
+
+REFINE_PROMPT = (
+    "You are a movie assistant. Based on the user's original prompt, evaluate the following list of movie "
+    "candidates and suggest the most suitable ones ranked by relevance.\n"
+    "Respond with a list of up to {picks} recommended titles, with short justification for each, generate the "
+    "response utilzaing markdown, insert links for imdb from meta data."
+)
+
+CANDIDATE_FIELDS = ("id", "title", "year", "genres", "languages", "rating", "duration", "description")
+
+
+def latest_user_message(dialog):
+    return next((m.get("content", "") for m in reversed(dialog or []) if m.get("role") == "user"), "")
+
+
+def params_messages(dialog, today=None):
+    """History, then the extraction instructions, then the latest user message."""
+    today = today or date.today().strftime("%A, %B %d, %Y").replace(" 0", " ")
+    history = list(dialog or [])
+    last = next((i for i in range(len(history) - 1, -1, -1) if history[i].get("role") == "user"), None)
+    before, user = (history[:last], [history[last]]) if last is not None else (history, [])
+    return before + [{"role": "system", "content": PARAMS_PROMPT.format(today=today)}] + user
+
+
+def refine_messages(dialog, candidates, picks=3):
+    trimmed = [{k: c.get(k) for k in CANDIDATE_FIELDS if k in c} for c in candidates]
+    return (
+        [{"role": "system", "content": REFINE_PROMPT.format(picks=picks)}]
+        + list(dialog or [])
+        + [{
+            "role": "system",
+            "content": f"Here are the candidate movies: {json.dumps(trimmed)} suggest {picks} movies from the list, "
+                       "with detailed information to the end user based on above query.",
+        }]
+    )
+
+
+def extract_json(text):
+    """Body of a ```json fence (trailing commas removed), else the text itself."""
+    if not isinstance(text, str):
+        return text
+    match = re.search(r"```json\s*([\s\S]*?)\s*```", text, re.IGNORECASE)
+    if not match:
+        return text.strip()
+    return re.sub(r",\s*([}\]])", r"\1", match.group(1)).strip()
+
+
+def parse_query_params(text):
+    """{positive_query, negative_query, row_checker} from a Groq reply, or None if it isn't one."""
+    try:
+        params = json.loads(extract_json(text))
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(params, dict) or not str(params.get("positive_query") or "").strip():
+        return None
+    row_checker = params.get("row_checker")
+    return {
+        "positive_query": str(params["positive_query"]).strip(),
+        "negative_query": str(params.get("negative_query") or "").strip(),
+        "row_checker": row_checker if isinstance(row_checker, dict) else {},
+    }
+
+
+def _words(text, max_words=40):
+    words = str(text or "").split()
+    return " ".join(words[:max_words]) + ("…" if len(words) > max_words else "")
+
+
+def _joined(value):
+    return ", ".join(value) if isinstance(value, list) else str(value or "")
+
+
+def local_recommendations(candidates, picks=3):
+    """Markdown top picks by score, then rating, then title (used when Groq is unavailable)."""
+    if not candidates:
+        return NO_RESULTS_REPLY
+
+    def number(value):
+        return value if isinstance(value, (int, float)) else float("-inf")
+
+    top = sorted(candidates, key=lambda m: (-number(m.get("score")), -number(m.get("rating")),
+                                            str(m.get("title") or "")))[:picks]
+    lines = []
+    for i, m in enumerate(top, start=1):
+        year = f" ({m['year']})" if m.get("year") else ""
+        imdb = f" [IMDb](https://www.imdb.com/title/{m['id']}/)" if m.get("id") else ""
+        rating = f" | Rating: {m['rating']}" if m.get("rating") is not None else ""
+        meta = " • ".join(p for p in (_joined(m.get("genres")), _joined(m.get("languages"))) if p)
+        meta = f" ({meta})" if meta else ""
+        lines.append(f"- {i}. **{m.get('title') or 'Untitled'}{year}**{imdb}{rating}{meta}\n"
+                     f"  {_words(m.get('description'))}")
+    return f"Here are my top {len(top)} picks based on your request:\n\n" + "\n".join(lines)
+
+
+def sse(event, data):
+    """One server-sent event frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
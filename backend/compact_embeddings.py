@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Compact embedding storage: int8 scalar-quantized and 1-bit sign vectors.
+
+Documents can carry, next to (or instead of) the float `embedding` list:
+
+    embedding_int8   BSON Binary subtype 9, dtype INT8: one signed byte per dim
+    embedding_bits   BSON Binary subtype 9, dtype PACKED_BIT: one bit per dim
+
+Both use the BSON vector layout Atlas understands (dtype byte, padding
+byte, payload). Quantization is symmetric per vector (x * 127 / max|x|);
+the scale is not stored because every consumer scores by cosine, which is
+scale-invariant.
+
+CompactVectorIndex keeps only the compact codes in memory:
+
+    int8     dequantized int8 dot products            (~4x smaller than float32)
+    binary   Hamming candidates, rescored as float query . sign(x)   (32x)
+    hybrid   Hamming candidates, rescored with int8    (both codes)
+
+Recall report against the exact float index:
+    python backend/compact_embeddings.py --synthetic 20000
+    python backend/compact_embeddings.py --k 10 --queries 200   # uses MONGO_URI
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+from bson.binary import Binary
+
+from attribute_index import AttributeIndex
+from vector_index import PROJECTED_FIELDS, LocalVectorIndex
+
+BSON_VECTOR_SUBTYPE = 9
+DTYPE_INT8 = 0x03
+DTYPE_PACKED_BIT = 0x10
+MODES = ("int8", "binary", "hybrid")
+
+if hasattr(np, "bitwise_count"):
+    _popcount = np.bitwise_count
+else:
+    _POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(a):
+        return _POPCOUNT_TABLE[a]
+
+
+# ------------------------
+def quantize_int8(vectors):
+    """Symmetric per-row int8 codes for a (n, dim) or (dim,) float array."""
+    m = np.asarray(vectors, dtype=np.float32)
+    single = m.ndim == 1
+    m = m.reshape(1, -1) if single else m
+    peak = np.abs(m).max(axis=1, keepdims=True)
+    peak[peak == 0] = 1.0
+    codes = np.clip(np.rint(m * (127.0 / peak)), -127, 127).astype(np.int8)
+    return codes[0] if single else codes
+
+
+def pack_sign_bits(vectors):
+    """Pack the sign of each component (1 for > 0) into uint8 rows of ceil(dim / 8) bytes."""
+    m = np.asarray(vectors)
+    return np.packbits(m > 0, axis=-1)
+
+
+def encode_int8(vector):
+    """BSON vector (INT8) for one float vector or int8 code row."""
+    v = np.asarray(vector)
+    codes = v if v.dtype == np.int8 else quantize_int8(v)
+    return Binary(bytes([DTYPE_INT8, 0]) + codes.tobytes(), BSON_VECTOR_SUBTYPE)
+
+
+def encode_bits(vector):
+    """BSON vector (PACKED_BIT) holding the sign bits of one float vector."""
+    v = np.asarray(vector).reshape(-1)
+    padding = (-len(v)) % 8
+    return Binary(bytes([DTYPE_PACKED_BIT, padding]) + pack_sign_bits(v).tobytes(), BSON_VECTOR_SUBTYPE)
+
+
+def decode_int8(value):
+    """int8 codes from a BSON INT8 vector (or a plain list of ints)."""
+    if isinstance(value, (bytes, bytearray)):
+        if value[0] != DTYPE_INT8:
+            raise ValueError(f"Not an int8 BSON vector (dtype 0x{value[0]:02x})")
+        return np.frombuffer(bytes(value), dtype=np.int8, offset=2)
+    return np.asarray(value, dtype=np.int8)
+
+
+def decode_bits(value, dim=None):
+    """(packed uint8 row, dim) from a BSON PACKED_BIT vector."""
+    if value[0] != DTYPE_PACKED_BIT:
+        raise ValueError(f"Not a packed-bit BSON vector (dtype 0x{value[0]:02x})")
+    packed = np.frombuffer(bytes(value), dtype=np.uint8, offset=2)
+    return packed, dim or packed.size * 8 - value[1]
+
+
+def compact_fields(vector, compact="int8"):
+    """Document fields for `compact` in {"int8", "binary", "both"}."""
+    fields = {}
+    if compact in ("int8", "both"):
+        fields["embedding_int8"] = encode_int8(vector)
+    if compact in ("binary", "both"):
+        fields["embedding_bits"] = encode_bits(vector)
+    return fields
+
+
+def attach_float_embedding(doc):
+    """Set doc["embedding"] from embedding_int8 when the float list is missing (for rerank_results)."""
+    codes = doc.pop("embedding_int8", None)
+    if not doc.get("embedding") and codes is not None:
+        doc["embedding"] = decode_int8(codes).astype(np.float32).tolist()
+    return doc
+
+
+# ------------------------
+class CompactVectorIndex(LocalVectorIndex):
+    """LocalVectorIndex over int8 and/or packed sign-bit codes instead of float32.
+
+    Binary modes take rescore_factor * k Hamming candidates and re-score
+    only those, so the float work per query is bounded by k, not by n.
+    """
+
+    def __init__(self, mode="hybrid", rescore_factor=10, chunk_rows=16384):
+        if mode not in MODES:
+            raise ValueError(f"Unknown compact index mode: {mode}")
+        self.mode = mode
+        self.rescore_factor = max(1, int(rescore_factor))
+        self.chunk_rows = chunk_rows
+        self.ids = []
+        self.docs = []
+        self.codes = None
+        self.inv_norms = None
+        self.bits = None
+        self._dim = 0
+        self.centroids = None
+        self.attributes = None
+
+    @property
+    def dim(self):
+        return self._dim
+
+    @property
+    def nbytes(self):
+        """Bytes held for vectors (codes, norms and bits), excluding metadata docs."""
+        return sum(a.nbytes for a in (self.codes, self.inv_norms, self.bits) if a is not None)
+
+    # ------------------------
+    @classmethod
+    def from_collection(cls, coll, batch_size=2000, **kwargs):
+        """Load compact codes from a collection, quantizing float `embedding` where they are missing."""
+        index = cls(**kwargs)
+        need_int8 = index.mode in ("int8", "hybrid")
+        need_bits = index.mode in ("binary", "hybrid")
+        projection = {"_id": 0, "embedding": 1, "embedding_int8": 1, "embedding_bits": 1}
+        projection.update({f: 1 for f in PROJECTED_FIELDS})
+        query = {"$or": [{"embedding": {"$exists": True}}, {"embedding_int8": {"$exists": True}},
+                         {"embedding_bits": {"$exists": True}}]}
+
+        docs, codes, bits, dim = [], [], [], 0
+        for doc in coll.find(query, projection, batch_size=batch_size):
+            vec = doc.pop("embedding", None)
+            stored_codes = doc.pop("embedding_int8", None)
+            stored_bits = doc.pop("embedding_bits", None)
+            row_codes = decode_int8(stored_codes) if stored_codes is not None else None
+            if row_codes is None and vec:
+                row_codes = quantize_int8(vec)
+            row_bits = None
+            if need_bits:
+                if stored_bits is not None:
+                    row_bits, dim = decode_bits(stored_bits)
+                elif row_codes is not None:
+                    row_bits = pack_sign_bits(row_codes)
+            if (need_int8 and row_codes is None) or (need_bits and row_bits is None):
+                continue
+            if row_codes is not None:
+                dim = len(row_codes)
+            docs.append(doc)
+            codes.append(row_codes)
+            bits.append(row_bits)
+
+        return index.build_codes(
+            np.stack(codes) if need_int8 and docs else None,
+            np.stack(bits) if need_bits and docs else None,
+            docs, dim=dim,
+        )
+
+    def build(self, vectors, docs, normalized=False):
+        """Quantize float vectors and build the index (codes are scale-free, so `normalized` is unused)."""
+        if len(vectors) != len(docs):
+            raise ValueError("vectors and docs must have the same length")
+        m = np.asarray(vectors, dtype=np.float32).reshape(len(docs), -1)
+        codes = quantize_int8(m) if self.mode in ("int8", "hybrid") else None
+        bits = pack_sign_bits(m) if self.mode in ("binary", "hybrid") else None
+        return self.build_codes(codes, bits, docs, dim=m.shape[1])
+
+    def build_codes(self, codes, bits, docs, dim=None):
+        """Build from precomputed int8 codes (n, dim) and/or packed bits (n, ceil(dim / 8))."""
+        self.docs = list(docs)
+        self.ids = [d.get("id") for d in self.docs]
+        self.attributes = AttributeIndex(self.docs)
+        if codes is not None:
+            self.codes = np.ascontiguousarray(codes, dtype=np.int8)
+            norms = np.linalg.norm(self.codes.astype(np.float32), axis=1)
+            norms[norms == 0] = 1.0
+            self.inv_norms = (1.0 / norms).astype(np.float32)
+        if bits is not None:
+            self.bits = np.ascontiguousarray(bits, dtype=np.uint8)
+        self._dim = int(dim or (self.codes.shape[1] if self.codes is not None else 0))
+        return self
+
+    # ------------------------
+    def _int8_scores(self, q, rows=None):
+        """Cosine of q with the dequantized int8 rows (all rows when rows is None)."""
+        if rows is not None:
+            return (self.codes[rows].astype(np.float32) @ q) * self.inv_norms[rows]
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), self.chunk_rows):
+            block = self.codes[start:start + self.chunk_rows].astype(np.float32)
+            scores[start:start + len(block)] = block @ q
+        return scores * self.inv_norms
+
+    def _sign_vectors(self, rows):
+        signs = np.unpackbits(self.bits[rows], axis=1, count=self._dim).astype(np.float32)
+        return (2.0 * signs - 1.0) / np.sqrt(self._dim)
+
+    def _hamming_candidates(self, q, count):
+        q_bits = pack_sign_bits(q)
+        dist = np.empty(len(self.bits), dtype=np.int32)
+        for start in range(0, len(self.bits), self.chunk_rows):
+            block = self.bits[start:start + self.chunk_rows]
+            dist[start:start + len(block)] = _popcount(block ^ q_bits).sum(axis=1, dtype=np.int32)
+        if count >= len(dist):
+            return np.arange(len(dist))
+        return np.argpartition(dist, count - 1)[:count]
+
+    def row_vectors(self, rows):
+        if self.codes is not None:
+            return self.codes[rows].astype(np.float32) * self.inv_norms[rows][:, None]
+        return self._sign_vectors(rows)
+
+    def top_k(self, query_vector, k):
+        """Return (row_indices, approximate cosine similarities) of the k nearest rows, best first."""
+        if not len(self.docs) or k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        q = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(q)
+        if norm:
+            q = q / norm
+
+        if self.mode == "int8":
+            rows = np.arange(len(self.docs))
+            scores = self._int8_scores(q)
+        else:
+            rows = self._hamming_candidates(q, k * self.rescore_factor)
+            if self.mode == "hybrid":
+                scores = self._int8_scores(q, rows)
+            else:
+                scores = self._sign_vectors(rows) @ q
+
+        k = min(k, len(scores))
+        part = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        part = part[np.argsort(-scores[part], kind="stable")]
+        return rows[part], scores[part]
+
+
+# ------------------------
+def _synthetic_vectors(n, dim, clusters=64, seed=0):
+    """Clustered unit vectors, closer to real embedding geometry than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    m = centers[rng.integers(0, clusters, size=n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return m / np.linalg.norm(m, axis=1, keepdims=True)
+
+
+def _collection_vectors(limit=None):
+    from mongo_connection import COLLECTION_NAME, DB_NAME, get_client
+
+    coll = get_client()[DB_NAME][COLLECTION_NAME]
+    cursor = coll.find({"embedding": {"$exists": True}}, {"_id": 0, "embedding": 1})
+    if limit:
+        cursor = cursor.limit(limit)
+    return np.asarray([d["embedding"] for d in cursor if d.get("embedding")], dtype=np.float32)
+
+
+def stored_bytes(vector):
+    """BSON bytes of each representation of one vector as a document field."""
+    import bson
+
+    v = np.asarray(vector, dtype=np.float64)
+    return {
+        "float_list": len(bson.encode({"embedding": v.tolist()})),
+        "int8": len(bson.encode({"embedding_int8": encode_int8(v)})),
+        "binary": len(bson.encode({"embedding_bits": encode_bits(v)})),
+    }
+
+
+def recall_report(vectors, k=10, queries=200, rescore_factor=10, noise=0.05, seed=1):
+    """recall@k, memory per vector and query latency of each compact mode vs the exact float index."""
+    n, dim = vectors.shape
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(n, size=min(queries, n), replace=False)
+    query_vectors = vectors[picks] + noise * rng.standard_normal((len(picks), dim)).astype(np.float32)
+    docs = [{"id": str(i)} for i in range(n)]
+
+    exact = LocalVectorIndex().build(vectors, docs)
+    truth = [set(exact.top_k(q, k)[0].tolist()) for q in query_vectors]
+
+    start = time.perf_counter()
+    for q in query_vectors:
+        exact.top_k(q, k)
+    report = {
+        "vectors": n,
+        "dim": dim,
+        "k": k,
+        "queries": len(picks),
+        "stored_bytes_per_vector": stored_bytes(vectors[0]),
+        "modes": {
+            "float32": {
+                "recall_at_k": 1.0,
+                "bytes_per_vector": exact.matrix.nbytes / n,
+                "ms_per_query": round((time.perf_counter() - start) * 1000.0 / len(picks), 3),
+            }
+        },
+    }
+
+    for mode in MODES:
+        index = CompactVectorIndex(mode=mode, rescore_factor=rescore_factor).build(vectors, docs)
+        hits = 0
+        start = time.perf_counter()
+        for q, expected in zip(query_vectors, truth):
+            hits += len(expected & set(index.top_k(q, k)[0].tolist()))
+        elapsed = time.perf_counter() - start
+        report["modes"][mode] = {
+            "recall_at_k": round(hits / (k * len(picks)), 4),
+            "bytes_per_vector": index.nbytes / n,
+            "compression": round(exact.matrix.nbytes / index.nbytes, 1),
+            "ms_per_query": round(elapsed * 1000.0 / len(picks), 3),
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="recall@k of compact embeddings vs exact float search.")
+    parser.add_argument("--synthetic", type=int, default=None, help="Use N synthetic vectors instead of MONGO_URI")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--limit", type=int, default=None, help="Max documents to read from the collection")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--rescore-factor", type=int, default=10, help="Hamming candidates per result")
+    parser.add_argument("--min-recall", type=float, default=None, help="Fail if hybrid recall drops below this")
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        vectors = _synthetic_vectors(args.synthetic, args.dim)
+    else:
+        vectors = _collection_vectors(args.limit)
+    if not len(vectors):
+        print("❌ No embeddings found")
+        return 1
+
+    report = recall_report(vectors, k=args.k, queries=args.queries, rescore_factor=args.rescore_factor)
+    print(json.dumps(report, indent=2))
+    hybrid = report["modes"]["hybrid"]["recall_at_k"]
+    if args.min_recall is not None and hybrid < args.min_recall:
+        print(f"❌ hybrid recall@{args.k} {hybrid} < {args.min_recall}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class EmbeddingBatcher:
+    """Coalesce concurrent single-text encode calls into batched forward passes.
+
+    Request threads call encode(text); a background worker drains the queue,
+    waiting at most `max_wait_ms` after the first pending item (or until
+    `max_batch_size` items are queued), runs one `encode_fn(list_of_texts)`
+    call and hands each row back through a Future.
+
+    `timeout_s` bounds how long encode()/encode_many() wait when the caller
+    passes no timeout of its own; None or <= 0 waits forever.
+    """
+
+    def __init__(self, encode_fn, max_batch_size=16, max_wait_ms=5.0, stats_window=2048, timeout_s=30.0):
+        self.encode_fn = encode_fn
+        self.timeout = timeout_s if timeout_s and timeout_s > 0 else None  # used when a call passes timeout=None
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pid = None
+
+        # Stats
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._batch_sizes = Counter()
+        self._queue_latency = deque(maxlen=stats_window)
+        self._encode_latency = deque(maxlen=stats_window)
+
+    # ------------------------
+    def _ensure_worker(self):
+        # Threads do not survive fork(), so (re)start per process
+        if self._worker is not None and self._worker.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._worker.start()
+
+    def submit(self, text):
+        """Queue a text for encoding and return a Future resolving to its vector (list)."""
+        self._ensure_worker()
+        fut = Future()
+        self._queue.put((text, fut, time.perf_counter()))
+        return fut
+
+    def encode(self, text, timeout=None):
+        """Blocking helper: encode one text through the batcher (timeout=None uses timeout_s)."""
+        return self.submit(text).result(timeout=self.timeout if timeout is None else timeout)
+
+    def encode_many(self, texts, timeout=None):
+        """Submit several texts at once so they share a batch where possible (one shared deadline)."""
+        futures = [self.submit(t) for t in texts]
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        return [f.result(timeout=None if deadline is None else max(0.0, deadline - time.perf_counter()))
+                for f in futures]
+
+    # ------------------------
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            texts = [item[0] for item in batch]
+            failed = False
+            try:
+                vectors = self.encode_fn(texts)
+                vectors = np.asarray(vectors)
+                if len(vectors) != len(batch):
+                    # zip() would silently leave the surplus futures unresolved forever
+                    raise ValueError(f"encode_fn returned {len(vectors)} vectors for {len(batch)} texts")
+                for (_, fut, _), vec in zip(batch, vectors):
+                    fut.set_result(vec.tolist())
+            except Exception as e:
+                failed = True
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+            finished = time.perf_counter()
+
+            with self._lock:
+                self._batches += 1
+                self._errors += int(failed)
+                self._items += len(batch)
+                self._batch_sizes[len(batch)] += 1
+                self._encode_latency.append(finished - started)
+                for _, _, enqueued in batch:
+                    self._queue_latency.append(started - enqueued)
+
+    # ------------------------
+    @staticmethod
+    def _percentiles_ms(samples):
+        if not samples:
+            return {"p50": None, "p95": None, "p99": None}
+        arr = np.asarray(samples) * 1000.0
+        p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+        return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3)}
+
+    def stats(self):
+        """Return batch-size and queue-latency stats for tuning."""
+        with self._lock:
+            queue_latency = list(self._queue_latency)
+            encode_latency = list(self._encode_latency)
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "pending": self._queue.qsize(),
+                "batches": self._batches,
+                "items": self._items,
+                "errors": self._errors,
+                "avg_batch_size": round(self._items / self._batches, 3) if self._batches else None,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "queue_latency_ms": self._percentiles_ms(queue_latency),
+                "encode_latency_ms": self._percentiles_ms(encode_latency),
+            }
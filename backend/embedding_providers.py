@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Pluggable embedding backends shared by flask_server.py and MongoNativePipeline.
+
+Every provider exposes the SentenceTransformer surface the rest of the code
+already uses, so `model.encode(...)` and
+`get_sentence_embedding_dimension()` work unchanged:
+
+    local        SentenceTransformer, fp32 PyTorch (reference)
+    torch-int8   SentenceTransformer with Linear layers dynamically quantized to int8
+    onnx         ONNX Runtime on the graph from python-scripts/export_onnx.py
+    onnx-int8    ONNX Runtime on the int8 dynamically quantized graph
+    huggingface  Hugging Face Inference API (remote)
+
+The ONNX backends tokenize with the Rust `tokenizers` library from the
+tokenizer.json export_onnx.py writes and pool/normalize in NumPy, so
+neither torch nor transformers is imported at all.
+
+Parity check against the reference model:
+    python backend/embedding_providers.py --provider onnx-int8 --reference local
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_ONNX_DIR = "models/all-MiniLM-L6-v2-onnx"
+PROVIDERS = ("local", "torch-int8", "onnx", "onnx-int8", "huggingface")
+
+PARITY_TEXTS = [
+    "A heist crew plans one last job in Las Vegas.",
+    "Two strangers fall in love on a night train across Europe.",
+    "Korean revenge thriller with a shocking twist",
+    "animated family adventure with talking animals",
+    "space station crew fights an alien organism",
+    "a detective hunts a serial killer in a rainy city",
+    "documentary about jazz musicians in 1960s New York",
+    "feel-good sports comedy",
+]
+
+
+def is_remote(provider):
+    return (provider or "local").lower() == "huggingface"
+
+
+def model_tag(model_name, version=None, provider="local"):
+    """Value stored as `embedding_model` on each document.
+
+    fp32 backends (local, onnx, huggingface) produce the same vectors up to
+    float noise and share a tag; quantized backends get a +int8 suffix so a
+    switch is detected as a model change and triggers a re-embed.
+    """
+    tag = f"{model_name}@{version}" if version else model_name
+    if (provider or "local").lower().endswith("int8"):
+        tag += "+int8"
+    return tag
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class EmbeddingProvider:
+    """Base class: subclasses implement _encode_batch(list_of_texts) -> (n, dim) float32."""
+
+    name = "base"
+    dimension = None
+
+    def _encode_batch(self, texts):
+        raise NotImplementedError
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def encode(self, sentences, batch_size=32, show_progress_bar=False, **kwargs):
+        """SentenceTransformer-compatible: str -> (dim,), list -> (n, dim) float32."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
+        # Length-sorted batches keep padding (and wasted FLOPs) low
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        out = None
+        step = max(1, int(batch_size))
+        for start in range(0, len(texts), step):
+            idx = order[start:start + step]
+            vecs = np.asarray(self._encode_batch([texts[i] for i in idx]), dtype=np.float32)
+            if out is None:
+                out = np.empty((len(texts), vecs.shape[1]), dtype=np.float32)
+            out[idx] = vecs
+        return out[0] if single else out
+
+
+class SentenceTransformerProvider(EmbeddingProvider):
+    name = "local"
+
+    def __init__(self, model_name=DEFAULT_MODEL, quantize=False, threads=None):
+        from sentence_transformers import SentenceTransformer
+
+        if threads or quantize:
+            import torch
+
+        if threads:
+            torch.set_num_threads(int(threads))
+        self.model = SentenceTransformer(model_name, device="cpu" if quantize else None)
+        if quantize:
+            self.name = "torch-int8"
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, sentences, batch_size=32, show_progress_bar=False, **kwargs):
+        # SentenceTransformer already length-sorts internally
+        return self.model.encode(sentences, batch_size=batch_size, show_progress_bar=show_progress_bar, **kwargs)
+
+
+class OnnxProvider(EmbeddingProvider):
+    """ONNX Runtime encoder over an export_onnx.py output directory."""
+
+    def __init__(self, model_dir=DEFAULT_ONNX_DIR, quantized=False, threads=None):
+        import onnxruntime as ort
+
+        manifest_path = os.path.join(model_dir, "export_manifest.json")
+        if not os.path.exists(manifest_path):
+            raise RuntimeError(f"❌ {manifest_path} not found; run python-scripts/export_onnx.py first")
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+
+        kind = "int8" if quantized else "fp32"
+        if kind not in self.manifest["files"]:
+            raise RuntimeError(f"❌ No {kind} model in {model_dir}; re-run export_onnx.py with quantization")
+        self.name = "onnx-int8" if quantized else "onnx"
+        self.dimension = int(self.manifest["dimension"])
+        self.max_length = int(self.manifest.get("max_seq_length", 256))
+        self.input_names = self.manifest["inputs"]
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = int(threads)
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, self.manifest["files"][kind]), options, providers=["CPUExecutionProvider"]
+        )
+        self._load_tokenizer(model_dir)
+
+    def _load_tokenizer(self, model_dir):
+        from tokenizers import Tokenizer
+
+        tokenizer_json = os.path.join(model_dir, "tokenizer.json")
+        if not os.path.exists(tokenizer_json):
+            raise RuntimeError(f"❌ {tokenizer_json} not found; re-run python-scripts/export_onnx.py")
+        pad_token = self.manifest.get("pad_token", "[PAD]")
+        tok = Tokenizer.from_file(tokenizer_json)
+        tok.enable_truncation(self.max_length)
+        tok.enable_padding(pad_id=tok.token_to_id(pad_token) or 0, pad_token=pad_token)
+        self._tokenizer = tok
+
+    def _tokenize(self, texts):
+        encodings = self._tokenizer.encode_batch(texts)
+        feed = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        return {name: feed[name] for name in self.input_names}
+
+    def _encode_batch(self, texts):
+        feed = self._tokenize(texts)
+        token_embeddings = self.session.run(None, feed)[0]
+        mask = feed["attention_mask"][..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return _normalize(pooled) if self.manifest.get("normalize", True) else pooled
+
+
+class HuggingFaceAPIProvider(EmbeddingProvider):
+    name = "huggingface"
+
+    def __init__(self, model_name=DEFAULT_MODEL, api_key=None, url=None, timeout=60):
+        import requests
+
+        self.api_key = api_key or os.getenv("HUGGINGFACE_API_KEY")
+        if not self.api_key:
+            raise RuntimeError("HUGGINGFACE_API_KEY is required for remote embeddings")
+        self.url = url or os.getenv("HUGGINGFACE_API_URL") or f"https://api-inference.huggingface.co/models/{model_name}"
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"})
+        self.dimension = len(self._encode_batch(["dimension probe"])[0])
+
+    def _encode_batch(self, texts):
+        resp = self.session.post(self.url, json={"inputs": list(texts), "options": {"wait_for_model": True}},
+                                 timeout=self.timeout)
+        resp.raise_for_status()
+        return np.asarray(resp.json(), dtype=np.float32)
+
+
+def make_provider(provider="local", model_name=DEFAULT_MODEL, onnx_dir=None, threads=None):
+    """Build the embedding backend named by `provider` (see PROVIDERS)."""
+    provider = (provider or "local").lower()
+    threads = threads or os.getenv("EMBED_THREADS") or None
+    onnx_dir = onnx_dir or os.getenv("ONNX_MODEL_DIR", DEFAULT_ONNX_DIR)
+    if provider == "local":
+        return SentenceTransformerProvider(model_name, threads=threads)
+    if provider == "torch-int8":
+        return SentenceTransformerProvider(model_name, quantize=True, threads=threads)
+    if provider in ("onnx", "onnx-int8"):
+        return OnnxProvider(onnx_dir, quantized=provider == "onnx-int8", threads=threads)
+    if provider == "huggingface":
+        return HuggingFaceAPIProvider(model_name)
+    raise ValueError(f"Unknown embedding provider: {provider} (expected one of {', '.join(PROVIDERS)})")
+
+
+def parity_check(candidate, reference, texts=None, batch_size=32):
+    """Cosine drift of candidate vs reference embeddings over `texts`."""
+    texts = list(texts or PARITY_TEXTS)
+    a = _normalize(np.asarray(candidate.encode(texts, batch_size=batch_size), dtype=np.float32))
+    b = _normalize(np.asarray(reference.encode(texts, batch_size=batch_size), dtype=np.float32))
+    if a.shape != b.shape:
+        raise ValueError(f"Dimension mismatch: {a.shape} vs {b.shape}")
+    cos = (a * b).sum(axis=1)
+    # Does the candidate preserve the reference's nearest neighbour for each text?
+    sim_a, sim_b = a @ a.T, b @ b.T
+    np.fill_diagonal(sim_a, -np.inf)
+    np.fill_diagonal(sim_b, -np.inf)
+    return {
+        "texts": len(texts),
+        "mean_cosine": round(float(cos.mean()), 6),
+        "min_cosine": round(float(cos.min()), 6),
+        "max_drift": round(float(1.0 - cos.min()), 6),
+        "nn_agreement": round(float((sim_a.argmax(axis=1) == sim_b.argmax(axis=1)).mean()), 4),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare an embedding provider against the reference model.")
+    parser.add_argument("--provider", default="onnx-int8", choices=PROVIDERS)
+    parser.add_argument("--reference", default="local", choices=PROVIDERS)
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", DEFAULT_MODEL))
+    parser.add_argument("--onnx-dir", default=None)
+    parser.add_argument("--texts-file", help="One text per line (defaults to a built-in sample)")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="Fail below this per-text cosine")
+    args = parser.parse_args(argv)
+
+    texts = None
+    if args.texts_file:
+        with open(args.texts_file, "r", encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+
+    reference = make_provider(args.reference, args.model, args.onnx_dir)
+    candidate = make_provider(args.provider, args.model, args.onnx_dir)
+    report = parity_check(candidate, reference, texts)
+    print(json.dumps({"provider": args.provider, "reference": args.reference, **report}, indent=2))
+    if report["min_cosine"] < args.min_cosine:
+        print(f"❌ Cosine drift above budget (min {report['min_cosine']} < {args.min_cosine})")
+        return 1
+    print("✅ Parity OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,40 @@
 import os
+import re
+import sys
 import json
-from flask import Flask, request, jsonify
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+_import_started = time.perf_counter()
+
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-from pymongo import MongoClient
-from sentence_transformers import SentenceTransformer
-import certifi
 import requests
 
+# Allow sibling modules to be imported when run from the repo root or on Vercel
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from vector_index import load_local_index, rerank_results
+from admission import AdmissionController, Overloaded, SingleFlight
+from attribute_index import filters_from_row_checker, split_prefilter
+from chat_pipeline import (
+    REPHRASE_REPLY, latest_user_message, local_recommendations, params_messages, parse_query_params,
+    refine_messages, sse,
+)
+from lexical_index import RRF_K, load_bm25_index, reciprocal_rank_fusion, text_search_pipeline
+from mongo_connection import COLLECTION_NAME, DB_NAME, get_manager
+from neighbors import load_neighbor_table
+from embedding_batcher import EmbeddingBatcher
+from embedding_providers import is_remote, make_provider, model_tag
+from query_cache import make_cache, make_key, normalize_query
+from llm_client import GROQ_CHAT_URL, GroqClient
+from metrics import (Registry, SamplingProfiler, StageTimers, begin_request, end_request, server_timing_header,
+                     submit_in_context)
+
+# Startup phase durations (ms), reported on /stats
+startup_timings = {"imports": round((time.perf_counter() - _import_started) * 1000.0, 1)}
+
 app = Flask(__name__)
 
 # Configure CORS to work with Vite dev server and allow credentials properly
@@ -27,48 +55,395 @@ CORS(
 )
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-# Support both DB_NAME/COLLECTION_NAME and MONGO_DB_NAME/MONGO_COLLECTION
-DB_NAME = os.getenv("DB_NAME") or os.getenv("MONGO_DB_NAME", "cinebot")
-COLLECTION_NAME = os.getenv("COLLECTION_NAME") or os.getenv("MONGO_COLLECTION", "movies_notebook")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")  # optional
+GROQ_API_URL = os.getenv("GROQ_API_URL", GROQ_CHAT_URL)  # point at a stub server for testing
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama3-70b-8192")
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "20"))
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "8"))
+GROQ_ACQUIRE_TIMEOUT_MS = float(os.getenv("GROQ_ACQUIRE_TIMEOUT_MS", "2000"))
+GROQ_MAX_ATTEMPTS = int(os.getenv("GROQ_MAX_ATTEMPTS", "1"))  # >1 enables hedged retries
+GROQ_HEDGE_DELAY_MS = float(os.getenv("GROQ_HEDGE_DELAY_MS", "3000"))
+GROQ_LATENCY_BUDGET_MS = float(os.getenv("GROQ_LATENCY_BUDGET_MS", "8000"))
+GROQ_BREAKER_FAILURES = int(os.getenv("GROQ_BREAKER_FAILURES", "5"))
+GROQ_BREAKER_RESET_S = float(os.getenv("GROQ_BREAKER_RESET_S", "30"))
 
 # Embedding configuration
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
-# Default to remote embeddings on Vercel to avoid large model downloads
-EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER") or ("huggingface" if os.getenv("VERCEL") else "local")
+# Default to remote embeddings on Vercel to avoid large model downloads.
+# Local backends: local (PyTorch), torch-int8, onnx, onnx-int8 (see embedding_providers.py)
+EMBEDDING_PROVIDER = (os.getenv("EMBEDDING_PROVIDER") or ("huggingface" if os.getenv("VERCEL") else "local")).lower()
+EMBEDDING_MODEL_VERSION = os.getenv("EMBEDDING_MODEL_VERSION")
 HUGGINGFACE_API_KEY = os.getenv("HUGGINGFACE_API_KEY")
+# Override to point remote embeddings at a local stub server
+HUGGINGFACE_API_URL = os.getenv("HUGGINGFACE_API_URL") or f"https://api-inference.huggingface.co/models/{EMBEDDING_MODEL}"
 
-# Use TLS only for Atlas (mongodb+srv) or when explicitly requested
-tls_required = MONGO_URI.startswith("mongodb+srv://") or os.getenv("MONGO_TLS", "").lower() == "true"
-if tls_required:
-    client = MongoClient(MONGO_URI, tls=True, tlsCAFile=certifi.where())
-else:
-    client = MongoClient(MONGO_URI)
-db = client[DB_NAME]
-coll = db[COLLECTION_NAME]
+# Vector search backend: "atlas" ($vectorSearch) or "local" (in-process NumPy index)
+VECTOR_SEARCH_BACKEND = os.getenv("VECTOR_SEARCH_BACKEND", "atlas").lower()
+# "exact", "ivf", or a compact_embeddings mode: "int8", "binary", "hybrid"
+LOCAL_INDEX_MODE = os.getenv("LOCAL_INDEX_MODE", "exact").lower()
+LOCAL_INDEX_NLIST = int(os.getenv("LOCAL_INDEX_NLIST", "0")) or None
+LOCAL_INDEX_NPROBE = int(os.getenv("LOCAL_INDEX_NPROBE", "8"))
+# Snapshot directory from backend/snapshot.py export; the local index memory-maps it instead of reading Mongo
+LOCAL_INDEX_SNAPSHOT = os.getenv("LOCAL_INDEX_SNAPSHOT") or None
+VECTOR_NUM_CANDIDATES = int(os.getenv("VECTOR_NUM_CANDIDATES", "200"))
+# Push year/rating/duration/genres/languages filters into $vectorSearch.filter
+# (needs the filter fields in movie_vector_index; switched off on first rejection)
+ATLAS_PREFILTER = os.getenv("ATLAS_PREFILTER", "true").lower() == "true"
+
+# Lexical search (vector fallback, SEARCH_MODE=lexical/hybrid): "bm25" index in
+# LEXICAL_INDEX_DIR, "mongo_text" ($text index), "regex" (legacy scan), or "auto"
+# (bm25 if built, else mongo_text, else regex)
+LEXICAL_BACKEND = os.getenv("LEXICAL_BACKEND", "auto").lower()
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", "models/bm25-index")
+# "vector" (lexical only as fallback), "lexical", or "hybrid" (RRF of both); overridable per request
+SEARCH_MODE = os.getenv("SEARCH_MODE", "vector").lower()
+HYBRID_DEPTH = int(os.getenv("HYBRID_DEPTH", "50"))  # results taken from each ranking before fusion
+
+# Precomputed "more like this" table for /similar/<id> (backend/neighbors.py build)
+NEIGHBORS_DIR = os.getenv("NEIGHBORS_DIR", "models/neighbors")
+
+# /search/batch: most queries per request, and threads for concurrent Atlas aggregates
+SEARCH_BATCH_MAX = int(os.getenv("SEARCH_BATCH_MAX", "64"))
+SEARCH_BATCH_WORKERS = int(os.getenv("SEARCH_BATCH_WORKERS", "8"))
+
+# /chat orchestration: candidates searched per turn, picks in the answer, worker threads
+CHAT_LIMIT = int(os.getenv("CHAT_LIMIT", "10"))
+CHAT_PICKS = int(os.getenv("CHAT_PICKS", "3"))
+CHAT_WORKERS = int(os.getenv("CHAT_WORKERS", "8"))
+CHAT_PREVIEW = os.getenv("CHAT_PREVIEW", "true").lower() == "true"  # /chat/stream: search the raw message during Groq
+# Weight (lambda) of the negative_query similarity subtracted during re-ranking
+NEGATIVE_QUERY_WEIGHT = float(os.getenv("NEGATIVE_QUERY_WEIGHT", "0.5"))
+
+# Micro-batching of concurrent local encode calls
+EMBED_BATCHING = os.getenv("EMBED_BATCHING", "true").lower() == "true"
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "16"))
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))
+EMBED_BATCH_TIMEOUT_S = float(os.getenv("EMBED_BATCH_TIMEOUT_S", "30"))  # request gives up waiting for its vector
+
+# Hot identical queries: concurrent /search and /run-groq requests with the same normalized
+# key share one computation; at most *_ADMISSION_ACTIVE computations run at once and
+# *_ADMISSION_QUEUE wait (up to ADMISSION_QUEUE_TIMEOUT_MS) before requests are shed
+SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "true").lower() == "true"
+SEARCH_ADMISSION_ACTIVE = int(os.getenv("SEARCH_ADMISSION_ACTIVE", "16"))
+SEARCH_ADMISSION_QUEUE = int(os.getenv("SEARCH_ADMISSION_QUEUE", "64"))
+GROQ_ADMISSION_ACTIVE = int(os.getenv("GROQ_ADMISSION_ACTIVE") or GROQ_MAX_CONCURRENCY)
+GROQ_ADMISSION_QUEUE = int(os.getenv("GROQ_ADMISSION_QUEUE", "32"))
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "2000"))
+ADMISSION_RETRY_AFTER_S = float(os.getenv("ADMISSION_RETRY_AFTER_S", "1"))  # Retry-After on a shed /search
+
+# Query/result caches ("memory" per worker, or "sqlite" shared across workers)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", "cache/cinebot_cache.sqlite3")
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "4096"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "300"))
+GROQ_CACHE_SIZE = int(os.getenv("GROQ_CACHE_SIZE", "512"))
+GROQ_CACHE_TTL = float(os.getenv("GROQ_CACHE_TTL", "900"))
+
+# Instrumentation: Server-Timing on every response (or per request via X-Server-Timing: 1),
+# fraction of requests profiled with cProfile (changeable at runtime via /debug/profile)
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() == "true"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")  # required for /debug/profile
+
+# Lazy startup: defer the Mongo connection, local index, sentence_transformers/torch
+# import and model load until first use (default on Vercel). WARM_ON_START loads
+# them in a background thread right after import instead.
+LAZY_STARTUP = os.getenv("LAZY_STARTUP", "true" if os.getenv("VERCEL") else "false").lower() == "true"
+WARM_ON_START = os.getenv("WARM_ON_START", "false").lower() == "true"
 
-print("✅ Mongo connected")
+# One pooled client per worker process, shared with MongoNativePipeline (see mongo_connection.py)
+mongo = get_manager(MONGO_URI)
 
-# Only load local model when explicitly requested
+client = None
+db = None
+coll = None
+local_index = None
 model = None
-if EMBEDDING_PROVIDER.lower() == "local":
-    print(f"🔄 Loading local embedding model: {EMBEDDING_MODEL}")
-    model = SentenceTransformer(EMBEDDING_MODEL)
-    print("✅ Embedding model loaded")
+embedding_batcher = None
+lexical_index = None
+neighbor_table = None
+_local_index_tried = False
+_lexical_index_tried = False
+_neighbor_table_tried = False
+_startup_lock = threading.RLock()
+
+
+def _record_startup(phase, started):
+    startup_timings[phase] = round((time.perf_counter() - started) * 1000.0, 1)
+
+
+def get_coll():
+    """Movie collection on this process's shared client (connects on first use, again after a fork)."""
+    global client, db, coll
+    started = time.perf_counter()
+    current = mongo.client()
+    if current is not client:
+        with _startup_lock:
+            if current is not client:
+                client = current
+                db = client[DB_NAME]
+                coll = db[COLLECTION_NAME]
+                _record_startup("mongo_connect", started)
+                print("✅ Mongo connected")
+    return coll
+
+
+def get_local_index():
+    """In-process vector index when VECTOR_SEARCH_BACKEND=local (built once), else None."""
+    global local_index, _local_index_tried
+    if VECTOR_SEARCH_BACKEND != "local" or _local_index_tried:
+        return local_index
+    with _startup_lock:
+        if not _local_index_tried:
+            started = time.perf_counter()
+            # Memory-map a snapshot when configured, else load every stored embedding from Mongo
+            try:
+                local_index = load_local_index(
+                    None if LOCAL_INDEX_SNAPSHOT else get_coll(), mode=LOCAL_INDEX_MODE, nlist=LOCAL_INDEX_NLIST,
+                    nprobe=LOCAL_INDEX_NPROBE, snapshot=LOCAL_INDEX_SNAPSHOT,
+                )
+            except Exception as e:
+                print(f"⚠️ Could not build local vector index, using Atlas search: {e}")
+            _local_index_tried = True
+            _record_startup("local_index", started)
+    return local_index
+
+
+def get_lexical_index():
+    """BM25 index from LEXICAL_INDEX_DIR (memory-mapped, loaded once), else None."""
+    global lexical_index, _lexical_index_tried
+    if LEXICAL_BACKEND not in ("bm25", "auto") or _lexical_index_tried:
+        return lexical_index
+    with _startup_lock:
+        if not _lexical_index_tried:
+            started = time.perf_counter()
+            if os.path.exists(os.path.join(LEXICAL_INDEX_DIR, "manifest.json")):
+                try:
+                    lexical_index = load_bm25_index(LEXICAL_INDEX_DIR)
+                except Exception as e:
+                    print(f"⚠️ Could not load BM25 index: {e}")
+            elif LEXICAL_BACKEND == "bm25":
+                print(f"⚠️ No BM25 index in {LEXICAL_INDEX_DIR}; run backend/lexical_index.py build")
+            _lexical_index_tried = True
+            _record_startup("lexical_index", started)
+    return lexical_index
+
+
+def get_neighbor_table():
+    """NeighborTable from NEIGHBORS_DIR (memory-mapped, loaded once), else None."""
+    global neighbor_table, _neighbor_table_tried
+    if _neighbor_table_tried:
+        return neighbor_table
+    with _startup_lock:
+        if not _neighbor_table_tried:
+            started = time.perf_counter()
+            if os.path.exists(os.path.join(NEIGHBORS_DIR, "manifest.json")):
+                try:
+                    neighbor_table = load_neighbor_table(NEIGHBORS_DIR)
+                except Exception as e:
+                    print(f"⚠️ Could not load neighbor table: {e}")
+            _neighbor_table_tried = True
+            _record_startup("neighbor_table", started)
+    return neighbor_table
+
+
+def get_model():
+    """Local embedding provider (and its batcher), loaded on first use; None for remote embeddings."""
+    global model, embedding_batcher
+    if model is not None or is_remote(EMBEDDING_PROVIDER):
+        return model
+    with _startup_lock:
+        if model is None:
+            print(f"🔄 Loading local embedding model: {EMBEDDING_MODEL} ({EMBEDDING_PROVIDER})")
+            started = time.perf_counter()
+            loaded = make_provider(EMBEDDING_PROVIDER, EMBEDDING_MODEL)
+            if EMBED_BATCHING:
+                embedding_batcher = EmbeddingBatcher(
+                    lambda texts: loaded.encode(texts, batch_size=len(texts)),
+                    max_batch_size=EMBED_BATCH_MAX_SIZE,
+                    max_wait_ms=EMBED_BATCH_MAX_WAIT_MS,
+                    timeout_s=EMBED_BATCH_TIMEOUT_S,
+                )
+            model = loaded
+            _record_startup("model_load", started)
+            print("✅ Embedding model loaded")
+    return model
+
+
+def check_embedding_model():
+    """Warn when stored vectors were produced by a different model/provider than queries use."""
+    expected = model_tag(EMBEDDING_MODEL, EMBEDDING_MODEL_VERSION, EMBEDDING_PROVIDER)
+    try:
+        doc = get_coll().find_one({"embedding_model": {"$exists": True}}, {"embedding_model": 1})
+    except Exception as e:
+        print(f"⚠️ Could not check stored embedding model: {e}")
+        return
+    if doc and doc.get("embedding_model") != expected:
+        print(f"⚠️ Stored embeddings use {doc['embedding_model']} but queries use {expected}; "
+              "re-embed with backend/ingest.py --reembed or change EMBEDDING_PROVIDER")
+
+
+def warm_up():
+    """Load everything startup would have loaded eagerly; safe to call repeatedly."""
+    started = time.perf_counter()
+    try:
+        get_coll()
+        get_local_index()
+        get_lexical_index()
+        get_neighbor_table()
+        get_model()
+        check_embedding_model()
+    except Exception as e:
+        print(f"⚠️ Warm-up failed: {e}")
+    _record_startup("warm_up", started)
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return round(rss / (1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0), 1)
+
+
+embedding_cache = make_cache("embedding", EMBED_CACHE_SIZE, None, CACHE_BACKEND, CACHE_SQLITE_PATH)
+search_cache = make_cache("search", SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL, CACHE_BACKEND, CACHE_SQLITE_PATH)
+groq_cache = make_cache("groq", GROQ_CACHE_SIZE, GROQ_CACHE_TTL, CACHE_BACKEND, CACHE_SQLITE_PATH)
+
+groq_client = GroqClient(
+    GROQ_API_KEY,
+    url=GROQ_API_URL,
+    model=GROQ_MODEL,
+    timeout=GROQ_TIMEOUT,
+    max_concurrency=GROQ_MAX_CONCURRENCY,
+    acquire_timeout_ms=GROQ_ACQUIRE_TIMEOUT_MS,
+    max_attempts=GROQ_MAX_ATTEMPTS,
+    hedge_delay_ms=GROQ_HEDGE_DELAY_MS,
+    latency_budget_ms=GROQ_LATENCY_BUDGET_MS,
+    failure_threshold=GROQ_BREAKER_FAILURES,
+    reset_timeout=GROQ_BREAKER_RESET_S,
+)
+# Runs a /chat/stream turn's Groq call and preview search side by side
+chat_executor = ThreadPoolExecutor(max_workers=CHAT_WORKERS, thread_name_prefix="chat")
+# Runs the per-query $vectorSearch aggregates of a /search/batch request
+batch_executor = ThreadPoolExecutor(max_workers=SEARCH_BATCH_WORKERS, thread_name_prefix="search-batch")
+
+search_flight = SingleFlight("search", enabled=SINGLE_FLIGHT)
+groq_flight = SingleFlight("groq", enabled=SINGLE_FLIGHT)
+search_admission = AdmissionController("search", SEARCH_ADMISSION_ACTIVE, SEARCH_ADMISSION_QUEUE,
+                                       ADMISSION_QUEUE_TIMEOUT_MS, ADMISSION_RETRY_AFTER_S)
+groq_admission = AdmissionController("groq", GROQ_ADMISSION_ACTIVE, GROQ_ADMISSION_QUEUE,
+                                     ADMISSION_QUEUE_TIMEOUT_MS, ADMISSION_RETRY_AFTER_S)
+
+metrics = Registry()
+stage_seconds = metrics.histogram("cinebot_stage_seconds", "Time spent in each request stage", ("stage",))
+request_seconds = metrics.histogram("cinebot_request_seconds", "HTTP request latency", ("route",))
+requests_total = metrics.counter("cinebot_requests_total", "HTTP requests by route and status", ("route", "status"))
+vector_search_failures = metrics.counter("cinebot_vector_search_failures_total", "Vector searches that raised")
+search_fallbacks = metrics.counter("cinebot_search_fallbacks_total", "Lexical fallback searches run after an empty vector search")
+groq_fallbacks = metrics.counter(
+    "cinebot_groq_fallbacks_total", "/run-groq answers served from the fallback query", ("reason",)
+)
+metrics.callback(
+    "cinebot_cache_hits_total", "Cache hits",
+    lambda: [({"cache": c.name}, c.hits) for c in (embedding_cache, search_cache, groq_cache)], kind="counter",
+)
+metrics.callback(
+    "cinebot_cache_misses_total", "Cache misses",
+    lambda: [({"cache": c.name}, c.misses) for c in (embedding_cache, search_cache, groq_cache)], kind="counter",
+)
+metrics.callback(
+    "cinebot_groq_client_events_total", "Groq client call outcomes",
+    lambda: [({"event": k}, v) for k, v in sorted(groq_client.metrics.counters.items())], kind="counter",
+)
+metrics.callback(
+    "cinebot_groq_breaker_open", "1 while the Groq circuit breaker is not closed",
+    lambda: [({}, int(groq_client.breaker.state != "closed"))],
+)
+metrics.callback(
+    "cinebot_admission_queue_depth", "Requests waiting for an admission slot",
+    lambda: [({"pool": a.name}, a.waiting) for a in (search_admission, groq_admission)],
+)
+metrics.callback(
+    "cinebot_admission_shed_total", "Requests shed by admission control",
+    lambda: [({"pool": a.name}, a.shed) for a in (search_admission, groq_admission)], kind="counter",
+)
+metrics.callback(
+    "cinebot_coalesced_requests_total", "Requests that shared an in-flight identical computation",
+    lambda: [({"pool": f.name}, f.followers) for f in (search_flight, groq_flight)], kind="counter",
+)
+timers = StageTimers(stage_seconds)
+profiler = SamplingProfiler(PROFILE_SAMPLE_RATE)
+
+if not LAZY_STARTUP:
+    warm_up()
+elif WARM_ON_START:
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
 
 
 def embed_text(text: str):
+    """Return embedding vector for the given text, served from the embedding cache when possible."""
+    key = normalize_query(text)
+    vec = embedding_cache.get(key)
+    if vec is None:
+        vec = _embed_uncached(text)
+        embedding_cache.set(key, vec)
+    return vec
+
+
+def embed_texts(texts):
+    """Embed several texts, encoding all cache misses together in one batch."""
+    keys = [normalize_query(t) for t in texts]
+    vectors = [embedding_cache.get(k) for k in keys]
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if missing:
+        fresh = _embed_batch_uncached([texts[i] for i in missing])
+        for i, vec in zip(missing, fresh):
+            vectors[i] = vec
+            embedding_cache.set(keys[i], vec)
+    return vectors
+
+
+def _embed_batch_uncached(texts):
+    if len(texts) == 1:
+        return [_embed_uncached(texts[0])]
+    if not is_remote(EMBEDDING_PROVIDER):
+        encoder = get_model()
+        if not encoder:
+            raise RuntimeError("Embedding model not loaded. Set EMBEDDING_PROVIDER=huggingface on Vercel or load local model.")
+        if embedding_batcher is not None:
+            return embedding_batcher.encode_many(texts)
+        return [v.tolist() for v in encoder.encode(list(texts), batch_size=len(texts))]
+    if not HUGGINGFACE_API_KEY:
+        raise RuntimeError("HUGGINGFACE_API_KEY is required for remote embeddings")
+    url = HUGGINGFACE_API_URL
+    headers = {"Authorization": f"Bearer {HUGGINGFACE_API_KEY}", "Content-Type": "application/json"}
+    try:
+        resp = requests.post(url, headers=headers, json={"inputs": list(texts), "options": {"wait_for_model": True}}, timeout=20)
+        resp.raise_for_status()
+        return resp.json()
+    except Exception as e:
+        print(f"❌ Embedding API error: {e}")
+        raise
+
+
+def _embed_uncached(text: str):
     """Return embedding vector for the given text using configured provider."""
-    provider = (EMBEDDING_PROVIDER or "local").lower()
-    if provider == "local":
-        if not model:
+    if not is_remote(EMBEDDING_PROVIDER):
+        encoder = get_model()
+        if not encoder:
             raise RuntimeError("Embedding model not loaded. Set EMBEDDING_PROVIDER=huggingface on Vercel or load local model.")
-        vec = model.encode(text)
+        if embedding_batcher is not None:
+            return embedding_batcher.encode(text)
+        vec = encoder.encode(text)
         return vec.tolist() if hasattr(vec, "tolist") else vec
     # Remote via Hugging Face Inference API
     if not HUGGINGFACE_API_KEY:
         raise RuntimeError("HUGGINGFACE_API_KEY is required for remote embeddings")
-    url = f"https://api-inference.huggingface.co/models/{EMBEDDING_MODEL}"
+    url = HUGGINGFACE_API_URL
     headers = {"Authorization": f"Bearer {HUGGINGFACE_API_KEY}", "Content-Type": "application/json"}
     try:
         resp = requests.post(url, headers=headers, json={"inputs": text, "options": {"wait_for_model": True}}, timeout=20)
@@ -83,6 +458,32 @@ def embed_text(text: str):
         raise
 
 
+@app.before_request
+def start_instrumentation():
+    g.stage_timings = begin_request()
+    g.request_started = time.perf_counter()
+    g.profile = profiler.start()
+
+
+@app.after_request
+def record_request(resp):
+    elapsed = time.perf_counter() - g.get("request_started", time.perf_counter())
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    request_seconds.observe(elapsed, route=route)
+    requests_total.inc(route=route, status=str(resp.status_code))
+    if SERVER_TIMING or request.headers.get("X-Server-Timing"):
+        timings = list(g.get("stage_timings") or []) + [("total", elapsed)]
+        resp.headers["Server-Timing"] = server_timing_header(timings)
+    return resp
+
+
+@app.teardown_request
+def stop_instrumentation(exc):
+    # Runs even when the view raised, so a sampled profile always releases
+    profiler.stop(g.pop("profile", None))
+    end_request()
+
+
 @app.after_request
 def add_cors_headers(resp):
     """Ensure CORS headers are present for common methods and headers.
@@ -99,6 +500,55 @@ def add_cors_headers(resp):
     return resp
 
 
+def extract_user_input(data):
+    """Pull the latest user message text out of a /run-groq request body."""
+    user_input = data.get("user_input") or data.get("messages") or ""
+    if isinstance(user_input, list):
+        # Take the latest user message content
+        try:
+            user_input = next(
+                (m.get("content", "") for m in reversed(user_input) if m.get("role") == "user"),
+                user_input[-1].get("content", "") if user_input else "",
+            )
+        except Exception:
+            user_input = ""
+    return user_input
+
+
+def fallback_query_json(text):
+    """Structured query used whenever Groq is unavailable."""
+    return json.dumps({
+        "positive_query": text or "",
+        "negative_query": "",
+        "row_checker": {"required_genres": []},
+    })
+
+
+def groq_messages(user_input):
+    return [
+        {"role": "system", "content": "You are a JSON generator for movie search queries. Respond ONLY with JSON."},
+        {"role": "user", "content": f"User input: {user_input}"},
+    ]
+
+
+def generate_query_json(cache_key, user_input):
+    """One admitted Groq call for /run-groq (shared by identical in-flight requests); None on failure."""
+    with groq_admission.slot():
+        # Pooled client; returns None when the breaker is open, no slot is free
+        # or every (hedged) attempt failed, in which case we fall back.
+        with timers.stage("groq"):
+            text = groq_client.chat(groq_messages(user_input), temperature=0.2)
+    if text:
+        groq_cache.set(cache_key, text)
+    return text
+
+
+def overloaded_response(exc):
+    """(body, status, headers) for a shed request."""
+    return ({"error": "Server busy, please retry shortly", "retry_after": exc.retry_after}, 503,
+            {"Retry-After": str(exc.retry_after)})
+
+
 @app.route("/run-groq", methods=["POST"]) 
 @app.route("/api/run-groq", methods=["POST"]) 
 def run_groq():
@@ -108,188 +558,700 @@ def run_groq():
     """
     try:
         data = request.get_json(silent=True) or {}
-        user_input = data.get("user_input") or data.get("messages") or ""
-        if isinstance(user_input, list):
-            # Take the latest user message content
-            try:
-                user_input = next(
-                    (m.get("content", "") for m in reversed(user_input) if m.get("role") == "user"),
-                    user_input[-1].get("content", "") if user_input else "",
-                )
-            except Exception:
-                user_input = ""
+        user_input = extract_user_input(data)
 
         def make_fallback(text):
-            fb = {
-                "positive_query": text or "",
-                "negative_query": "",
-                "row_checker": {"required_genres": []},
-            }
-            return jsonify({"response": json.dumps(fb)})
+            return jsonify({"response": fallback_query_json(text)})
 
         # No key -> fallback
         if not GROQ_API_KEY:
+            groq_fallbacks.inc(reason="no_key")
             return make_fallback(user_input)
 
-        headers = {
-            "Authorization": f"Bearer {GROQ_API_KEY}",
-            "Content-Type": "application/json",
-        }
-
-        payload = {
-            "model": "llama3-70b-8192",
-            "messages": [
-                {"role": "system", "content": "You are a JSON generator for movie search queries. Respond ONLY with JSON."},
-                {"role": "user", "content": f"User input: {user_input}"},
-            ],
-            "temperature": 0.2,
-        }
+        cache_key = normalize_query(user_input)
+        cached = groq_cache.get(cache_key)
+        if cached is not None:
+            return jsonify({"response": cached})
 
         try:
-            res = requests.post(
-                "https://api.groq.com/openai/v1/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=20,
-            )
-        except Exception as net_err:
-            print(f"⚠️ GROQ request failed: {net_err}")
+            text = groq_flight.do(cache_key, lambda: generate_query_json(cache_key, user_input))
+        except Overloaded:
+            groq_fallbacks.inc(reason="shed")
             return make_fallback(user_input)
 
-        if res.status_code != 200:
-            print(f"⚠️ GROQ non-200: {res.status_code} {res.text[:200]}")
-            return make_fallback(user_input)
-
-        try:
-            data = res.json()
-            text = data.get("choices", [{}])[0].get("message", {}).get("content")
-        except Exception as parse_err:
-            print(f"⚠️ GROQ parse error: {parse_err}")
-            text = None
-
         if not text:
+            groq_fallbacks.inc(reason="upstream")
             return make_fallback(user_input)
         return jsonify({"response": text})
 
     except Exception as e:
         print(f"❌ run_groq error: {e}")
+        groq_fallbacks.inc(reason="error")
         # Never 500 the client here; always provide a fallback response
         try:
-            return jsonify({
-                "response": json.dumps({
-                    "positive_query": "",
-                    "negative_query": "",
-                    "row_checker": {"required_genres": []},
-                })
-            })
+            return jsonify({"response": fallback_query_json("")})
         except Exception:
             return jsonify({"response": "{\"positive_query\":\"\",\"negative_query\":\"\",\"row_checker\":{\"required_genres\":[]}}"})
 
 
-@app.route("/search", methods=["POST"]) 
-@app.route("/api/search", methods=["POST"]) 
-def search_movies():
-    try:
-        data = request.get_json()
-        query = data.get("query", "")
-        filters = data.get("filters", {})
-        limit = int(data.get("limit", 10))
-
-        if not query:
-            return jsonify({"results": []})
-
-        # get query embedding
-        query_vector = embed_text(query)
-
-        pipeline = [
-            {
-                "$vectorSearch": {
-                    "index": "movie_vector_index",
-                    "path": "embedding",
-                    "queryVector": query_vector,
-                    "numCandidates": 200,
-                    "limit": limit
-                }
-            },
-            {
-                "$project": {
-                    "_id": 0,
-                    "id": 1,
-                    "title": 1,
-                    "year": 1,
-                    "genres": 1,
-                    "languages": 1,
-                    "rating": 1,
-                    "duration": 1,
-                    "description": 1,
-                    "score": {"$meta": "vectorSearchScore"}
-                }
-            }
+SEARCH_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "title": 1,
+    "year": 1,
+    "genres": 1,
+    "languages": 1,
+    "rating": 1,
+    "duration": 1,
+    "description": 1,
+}
+
+
+def parse_search_request(data):
+    """Normalize a /search body into (query, negative_query, negative_weight, filters, limit)."""
+    query = data.get("query", "")
+    negative_query = (data.get("negative_query") or "").strip()
+    negative_weight = float(data.get("negative_weight", NEGATIVE_QUERY_WEIGHT))
+    filters = data.get("filters", {})
+    limit = int(data.get("limit", 10))
+    return query, negative_query, negative_weight, filters, limit
+
+
+def search_cache_key(query, negative_query, negative_weight, filters, limit, mode="vector"):
+    return make_key(normalize_query(query), normalize_query(negative_query), negative_weight, filters, limit, mode)
+
+
+def search_mode(data):
+    mode = (data.get("mode") or SEARCH_MODE).lower()
+    return mode if mode in ("vector", "lexical", "hybrid") else "vector"
+
+
+def build_vector_pipeline(query_vector, filters, limit, with_embedding=False):
+    """$vectorSearch pipeline; with_embedding pulls the full candidate set for re-ranking.
+
+    Indexed filter clauses go into $vectorSearch.filter so Atlas filters
+    before the candidate cut; the rest stays in a post-$match.
+    """
+    projection = dict(SEARCH_PROJECTION, score={"$meta": "vectorSearchScore"})
+    if with_embedding:
+        projection["embedding"] = 1
+    prefilter, postfilter = split_prefilter(filters) if ATLAS_PREFILTER else (None, filters)
+    vector_search = {
+        "index": "movie_vector_index",
+        "path": "embedding",
+        "queryVector": query_vector,
+        "numCandidates": VECTOR_NUM_CANDIDATES,
+        # Re-ranking and post-filtering need the whole candidate set; limit is applied afterwards
+        "limit": VECTOR_NUM_CANDIDATES if with_embedding or postfilter else limit
+    }
+    if prefilter:
+        vector_search["filter"] = prefilter
+    pipeline = [{"$vectorSearch": vector_search}]
+    if postfilter:
+        pipeline.append({"$match": postfilter})
+    pipeline.append({"$project": projection})
+    if postfilter and not with_embedding:
+        pipeline.append({"$limit": limit})
+    return pipeline
+
+
+def prefilter_rejected(exc):
+    """If Atlas refused $vectorSearch.filter (filter fields not in the index), stop sending it.
+
+    Returns True when the caller should retry with a post-$match pipeline.
+    """
+    global ATLAS_PREFILTER
+    if ATLAS_PREFILTER and "needs to be indexed" in str(exc):
+        print(f"⚠️ movie_vector_index has no filter fields, using post-filtering: {exc}")
+        ATLAS_PREFILTER = False
+        return True
+    return False
+
+
+def build_fallback_pipeline(query, filters, limit):
+    """Basic regex OR across the query words, or None if there are no words."""
+    words = [w for w in re.split(r"\s+", query) if w]
+    if not words:
+        return None
+    # Escape special characters in each word
+    regex = "|".join(re.escape(w) for w in words)
+    match_stage = {
+        "$or": [
+            {"title": {"$regex": regex, "$options": "i"}},
+            {"description": {"$regex": regex, "$options": "i"}},
+            {"genres": {"$in": words}},
+            {"languages": {"$in": words}},
         ]
+    }
+    pipeline = []
+    if filters:
+        pipeline.append({"$match": filters})
+    pipeline.append({"$match": match_stage})
+    pipeline.append({"$project": dict(SEARCH_PROJECTION)})
+    pipeline.append({"$limit": limit})
+    return pipeline
+
+
+def lexical_hits(query, limit):
+    """[(id, bm25_score)] from the BM25 index (over-fetched for filters), or None without one."""
+    index = get_lexical_index()
+    if index is None:
+        return None
+    return index.search(query, k=max(limit, HYBRID_DEPTH) * 4)
+
+
+def build_lexical_pipeline(query, filters, limit, hits=None):
+    """Pipeline for the lexical backend: BM25 hits by id, $text search, or the regex scan."""
+    if hits is not None:
+        match = {"id": {"$in": [movie_id for movie_id, _ in hits]}}
+        return [{"$match": {"$and": [match, filters]} if filters else match}, {"$project": dict(SEARCH_PROJECTION)}]
+    if LEXICAL_BACKEND in ("mongo_text", "auto"):
+        return text_search_pipeline(query, filters, limit, SEARCH_PROJECTION)
+    return build_fallback_pipeline(query, filters, limit)
+
 
-        if filters:
-            pipeline.insert(1, {"$match": filters})
+def order_lexical_results(results, hits, limit):
+    """Put Mongo docs fetched for ranked (id, score) hits (BM25, neighbours) back in rank order."""
+    if hits is None:
+        return results[:limit]
+    by_id = {r.get("id"): r for r in results}
+    ordered = []
+    for movie_id, score in hits:
+        doc = by_id.get(movie_id)
+        if doc is not None:
+            ordered.append(dict(doc, score=score))
+            if len(ordered) >= limit:
+                break
+    return ordered
+
+
+def text_search_rejected(exc):
+    """If $text failed for lack of a text index, fall back to regex. Returns True to retry."""
+    global LEXICAL_BACKEND
+    if LEXICAL_BACKEND in ("mongo_text", "auto") and "text index required" in str(exc):
+        print("⚠️ No text index on the collection (run backend/lexical_index.py text-index); using regex")
+        LEXICAL_BACKEND = "regex"
+        return True
+    return False
+
+
+def fuse_results(vector_results, lexical_results, limit):
+    """Reciprocal-rank fusion of two result lists keyed on movie id; score becomes the RRF score."""
+    docs = {}
+    for r in lexical_results + vector_results:
+        docs.setdefault(r.get("id") or r.get("title"), r)
+    fused = reciprocal_rank_fusion(
+        [[r.get("id") or r.get("title") for r in vector_results], [r.get("id") or r.get("title") for r in lexical_results]],
+        k=RRF_K,
+    )
+    return [dict(docs[key], score=score) for key, score in fused[:limit]]
+
+
+def run_vector_search(coll, index, query_vector, negative_vector, negative_weight, filters, limit):
+    """Local index or Atlas $vectorSearch, with the negative_query re-rank."""
+    if index is not None:
+        return index.search(
+            query_vector, limit=limit, num_candidates=VECTOR_NUM_CANDIDATES, filters=filters,
+            negative_vector=negative_vector, negative_weight=negative_weight,
+        )
+    with_embedding = negative_vector is not None
+    try:
+        results = list(coll.aggregate(build_vector_pipeline(query_vector, filters, limit, with_embedding)))
+    except Exception as pe:
+        if not prefilter_rejected(pe):
+            raise
+        results = list(coll.aggregate(build_vector_pipeline(query_vector, filters, limit, with_embedding)))
+    if negative_vector is not None:
+        results = rerank_results(results, query_vector, negative_vector, negative_weight, limit=limit)
+    return results
 
+
+def run_lexical_search(coll, query, filters, limit):
+    """BM25 / $text / regex search, whichever LEXICAL_BACKEND resolves to."""
+    hits = lexical_hits(query, limit)
+    pipeline = build_lexical_pipeline(query, filters, limit, hits)
+    if pipeline is None:
+        return []
+    try:
+        results = list(coll.aggregate(pipeline))
+    except Exception as te:
+        if not text_search_rejected(te):
+            raise
+        pipeline = build_lexical_pipeline(query, filters, limit)
+        results = list(coll.aggregate(pipeline)) if pipeline else []
+    return order_lexical_results(results, hits, limit)
+
+
+def search_results(query, negative_query="", negative_weight=NEGATIVE_QUERY_WEIGHT, filters=None, limit=10,
+                   mode="vector"):
+    """Cached /search pipeline: embed, vector search, lexical fallback or fusion."""
+    filters = filters or {}
+    cache_key = search_cache_key(query, negative_query, negative_weight, filters, limit, mode)
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    coll = get_coll()
+    depth = search_depth(limit, mode)
+    results = []
+    if mode != "lexical":
+        # get query embedding (positive and negative encoded in one batch)
+        with timers.stage("embed"):
+            if negative_query:
+                query_vector, negative_vector = embed_texts([query, negative_query])
+            else:
+                query_vector, negative_vector = embed_text(query), None
+
+        index = get_local_index()
         try:
-            results = list(coll.aggregate(pipeline))
+            with timers.stage("vector_search"):
+                results = run_vector_search(coll, index, query_vector, negative_vector, negative_weight,
+                                            filters, depth)
         except Exception as ve:
             # If $vectorSearch is unavailable (local Mongo) or index missing, fall back
-            print(f"⚠️ Vector search failed, falling back to regex search: {ve}")
+            print(f"⚠️ Vector search failed, falling back to lexical search: {ve}")
+            vector_search_failures.inc()
             results = []
 
-        # If vector search returned nothing, try a simple regex fallback
-        if not results:
-            # Build a basic regex OR across words (escape special characters)
-            import re
-            words = [w for w in re.split(r"\s+", query) if w]
-            if words:
-                escaped = [re.escape(w) for w in words]
-                regex = "|".join(escaped)
-                match_stage = {
-                    "$or": [
-                        {"title": {"$regex": regex, "$options": "i"}},
-                        {"description": {"$regex": regex, "$options": "i"}},
-                        {"genres": {"$in": words}},
-                        {"languages": {"$in": words}},
-                    ]
-                }
+    results = finish_search(coll, query, filters, limit, mode, results)
+    search_cache.set(cache_key, results)
+    return results
 
-                fallback_pipeline = []
-                if filters:
-                    fallback_pipeline.append({"$match": filters})
-                fallback_pipeline.append({"$match": match_stage})
-                fallback_pipeline.append({
-                    "$project": {
-                        "_id": 0,
-                        "id": 1,
-                        "title": 1,
-                        "year": 1,
-                        "genres": 1,
-                        "languages": 1,
-                        "rating": 1,
-                        "duration": 1,
-                        "description": 1,
-                    }
-                })
-                fallback_pipeline.append({"$limit": limit})
-                try:
-                    results = list(coll.aggregate(fallback_pipeline))
-                except Exception as fe:
-                    print(f"❌ Fallback search failed: {fe}")
-                    results = []
 
-        return jsonify({"results": results})
+def admitted_search(*spec):
+    """search_results() for one (query, negative_query, negative_weight, filters, limit, mode) spec.
+
+    Identical concurrent specs share one computation, and only that one
+    waits for a search admission slot; raises Overloaded when shed.
+    """
+    cache_key = search_cache_key(*spec)
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    def run():
+        with search_admission.slot():
+            return search_results(*spec)
+
+    return search_flight.do(cache_key, run)
+
+
+def search_depth(limit, mode):
+    return max(limit, HYBRID_DEPTH) if mode == "hybrid" else limit
+
+
+def finish_search(coll, query, filters, limit, mode, results):
+    """Lexical ranking for lexical/hybrid mode, or when vector search returned nothing."""
+    if mode == "vector" and results:
+        return results
+    if mode == "vector":
+        search_fallbacks.inc()
+    try:
+        with timers.stage("lexical"):
+            lexical = run_lexical_search(coll, query, filters, search_depth(limit, mode))
+    except Exception as fe:
+        print(f"❌ Lexical search failed: {fe}")
+        lexical = []
+    return fuse_results(results, lexical, limit) if mode == "hybrid" else lexical
+
+
+# Route bodies below return (body, status, headers); asgi_server.py shares their request parsing
+def search_spec(data):
+    """(query, negative_query, negative_weight, filters, limit, mode) for a /search body."""
+    return parse_search_request(data) + (search_mode(data),)
+
+
+def search_response(data):
+    """/search: one query through the cache, single-flight and admission control."""
+    spec = search_spec(data)
+    if not spec[0]:
+        return {"results": []}, 200, {}
+    try:
+        results = admitted_search(*spec)
+    except Overloaded as e:
+        return overloaded_response(e)
+    return {"results": results}, 200, {}
+
+
+@app.route("/search", methods=["POST"]) 
+@app.route("/api/search", methods=["POST"]) 
+def search_movies():
+    try:
+        body, status, headers = search_response(request.get_json())
+        with timers.stage("serialize"):
+            return jsonify(body), status, headers
 
     except Exception as e:
         print(f"❌ /search error: {e}")
         return jsonify({"error": str(e)}), 500
 
 
+def _timed_vector_search(*args):
+    started = time.perf_counter()
+    try:
+        results = run_vector_search(*args)
+    except Exception as ve:
+        print(f"⚠️ Vector search failed, falling back to lexical search: {ve}")
+        vector_search_failures.inc()
+        results = []
+    return results, (time.perf_counter() - started) * 1000
+
+
+def search_batch(specs):
+    """search_results() for many (query, negative_query, negative_weight, filters, limit, mode) specs.
+
+    Cache misses share one embed call. With a local index all vector
+    queries are scored in one matrix product; otherwise their aggregates
+    run concurrently on batch_executor. Returns [{"results", "took_ms",
+    "cached"}] in spec order.
+    """
+    out = [None] * len(specs)
+    pending = []
+    for i, spec in enumerate(specs):
+        cached = search_cache.get(search_cache_key(*spec))
+        if cached is not None:
+            out[i] = {"results": cached, "took_ms": 0.0, "cached": True}
+        else:
+            pending.append(i)
+
+    coll = get_coll()
+    vector = [i for i in pending if specs[i][5] != "lexical" and specs[i][0]]
+    found = {}
+    if vector:
+        # Positive and negative texts of every query in one batch
+        negatives = [i for i in vector if specs[i][1]]
+        with timers.stage("embed"):
+            vecs = embed_texts([specs[i][0] for i in vector] + [specs[i][1] for i in negatives])
+        query_vectors = dict(zip(vector, vecs))
+        negative_vectors = dict(zip(negatives, vecs[len(vector):]))
+
+        index = get_local_index()
+        with timers.stage("vector_search"):
+            if index is not None:
+                try:
+                    batched = index.search_many(
+                        [query_vectors[i] for i in vector],
+                        [search_depth(specs[i][4], specs[i][5]) for i in vector],
+                        VECTOR_NUM_CANDIDATES,
+                        [specs[i][3] for i in vector],
+                        [negative_vectors.get(i) for i in vector],
+                        [specs[i][2] for i in vector],
+                    )
+                    found = dict(zip(vector, batched))
+                except Exception as ve:
+                    print(f"⚠️ Batched vector search failed, falling back to lexical search: {ve}")
+                    vector_search_failures.inc()
+            else:
+                futures = {
+                    i: submit_in_context(batch_executor, _timed_vector_search, coll, None, query_vectors[i],
+                                         negative_vectors.get(i), specs[i][2], specs[i][3],
+                                         search_depth(specs[i][4], specs[i][5]))
+                    for i in vector
+                }
+                found = {i: f.result() for i, f in futures.items()}
+
+    for i in pending:
+        query, negative_query, negative_weight, filters, limit, mode = specs[i]
+        results, took_ms = found.get(i, ([], 0.0))
+        started = time.perf_counter()
+        if query:
+            results = finish_search(coll, query, filters, limit, mode, results)
+            search_cache.set(search_cache_key(*specs[i]), results)
+        took_ms += (time.perf_counter() - started) * 1000
+        out[i] = {"results": results, "took_ms": round(took_ms, 2), "cached": False}
+    return out
+
+
+def batch_specs(data):
+    """(specs, None) for a /search/batch body, or (None, error response) when it is invalid."""
+    data = data or {}
+    queries = data.get("queries") or []
+    if not isinstance(queries, list):
+        return None, ({"error": "queries must be a list"}, 400, {})
+    if len(queries) > SEARCH_BATCH_MAX:
+        return None, ({"error": f"At most {SEARCH_BATCH_MAX} queries per batch"}, 400, {})
+
+    defaults = {k: v for k, v in data.items() if k != "queries"}
+    specs = [search_spec(dict(defaults, **(q if isinstance(q, dict) else {"query": q}))) for q in queries]
+    return specs, None
+
+
+def search_batch_response(data):
+    """{"queries": [<search body>, ...], <shared defaults>} -> {"responses": [...], "took_ms"} in order."""
+    specs, error = batch_specs(data)
+    if error:
+        return error
+
+    started = time.perf_counter()
+    responses = search_batch(specs)
+    return {"responses": responses, "took_ms": round((time.perf_counter() - started) * 1000, 2)}, 200, {}
+
+
+@app.route("/search/batch", methods=["POST"])
+@app.route("/api/search/batch", methods=["POST"])
+def search_movies_batch():
+    try:
+        body, status, headers = search_batch_response(request.get_json())
+        with timers.stage("serialize"):
+            return jsonify(body), status, headers
+
+    except Exception as e:
+        print(f"❌ /search/batch error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+NEIGHBORS_PROJECTION = {"_id": 0, "neighbors": 1, "neighbor_scores": 1}
+
+
+def stored_neighbors(doc, limit):
+    """[(id, score)] from a document's own `neighbors` field, or None."""
+    doc = doc or {}
+    if not doc.get("neighbors"):
+        return None
+    return list(zip(doc["neighbors"], doc.get("neighbor_scores") or [None] * len(doc["neighbors"])))[:limit]
+
+
+def no_neighbors_response(movie_id):
+    return {"error": f"No neighbours for {movie_id}; run backend/neighbors.py build"}, 404, {}
+
+
+def similar_response(movie_id, limit=10):
+    """"More like this" from the precomputed neighbour table (or the document's `neighbors`); no embedding."""
+    table = get_neighbor_table()
+    hits = table.lookup(movie_id, limit) if table is not None else None
+    coll = get_coll()
+    if hits is None:
+        hits = stored_neighbors(coll.find_one({"id": movie_id}, NEIGHBORS_PROJECTION), limit)
+    if hits is None:
+        return no_neighbors_response(movie_id)
+
+    with timers.stage("fetch"):
+        docs = list(coll.find({"id": {"$in": [n for n, _ in hits]}}, SEARCH_PROJECTION))
+    return {"id": movie_id, "results": order_lexical_results(docs, hits, limit)}, 200, {}
+
+
+@app.route("/similar/<movie_id>", methods=["GET"])
+@app.route("/api/similar/<movie_id>", methods=["GET"])
+def similar_movies(movie_id):
+    try:
+        body, status, headers = similar_response(movie_id, int(request.args.get("limit", 10)))
+        with timers.stage("serialize"):
+            return jsonify(body), status, headers
+
+    except Exception as e:
+        print(f"❌ /similar error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+# ------------------------
+# /chat: the whole recommendation (params -> search -> refine) in one request
+# ------------------------
+def chat_params(dialog):
+    """(query params or None, Groq text). Without Groq the raw message is the query, like /run-groq."""
+    user_input = latest_user_message(dialog)
+    if not GROQ_API_KEY:
+        groq_fallbacks.inc(reason="no_key")
+        return parse_query_params(fallback_query_json(user_input)), None
+
+    cache_key = make_key("chat", dialog)
+    text = groq_cache.get(cache_key)
+    if text is None:
+        with timers.stage("groq"):
+            text = groq_client.chat(params_messages(dialog), temperature=0.2)
+        if not text:
+            groq_fallbacks.inc(reason="upstream")
+            return parse_query_params(fallback_query_json(user_input)), None
+        groq_cache.set(cache_key, text)
+    return parse_query_params(text), text
+
+
+def chat_events(dialog, limit=10, stream=False):
+    """Yield (event, data) for one chat turn: [preview], params, results, delta*, done.
+
+    Only a streamed turn with Groq speculates: a search on the raw message
+    runs next to param extraction and is sent as an early "preview" if it
+    finishes first. It is reused when the params come back as the raw
+    message without filters, and cancelled (if it has not started yet) when
+    Groq answers without retrieval or asks for a different search. Without
+    Groq the params are the raw message, so there is nothing to speculate.
+    """
+    user_input = latest_user_message(dialog)
+    if not user_input.strip():
+        yield "done", {"content": REPHRASE_REPLY}
+        return
+
+    preview = None
+    if stream and CHAT_PREVIEW and GROQ_API_KEY:
+        preview = submit_in_context(chat_executor, search_results, user_input, "", NEGATIVE_QUERY_WEIGHT, {}, limit,
+                                    SEARCH_MODE)
+        params_future = submit_in_context(chat_executor, chat_params, dialog)
+        done, _ = wait([preview, params_future], return_when=FIRST_COMPLETED)
+        if preview in done and not preview.exception():
+            yield "preview", {"results": preview.result()}
+        params, text = params_future.result()
+    else:
+        params, text = chat_params(dialog)
+    if params is None:
+        # Not a recommendation request: Groq's reply is the answer
+        if preview is not None:
+            preview.cancel()
+        yield "done", {"content": text or REPHRASE_REPLY}
+        return
+    yield "params", params
+
+    filters = filters_from_row_checker(params["row_checker"])
+    results = None
+    if preview is not None:
+        if params["positive_query"] == user_input and not params["negative_query"] and not filters:
+            try:
+                results = preview.result()
+            except Exception as e:
+                print(f"⚠️ Chat preview search failed: {e}")
+        else:
+            preview.cancel()
+    if results is None:
+        results = search_results(params["positive_query"], params["negative_query"], NEGATIVE_QUERY_WEIGHT,
+                                 filters, limit, SEARCH_MODE)
+    yield "results", {"results": results}
+
+    answer = ""
+    if GROQ_API_KEY and results:
+        messages = refine_messages(dialog, results, CHAT_PICKS)
+        with timers.stage("groq_refine"):
+            if stream:
+                for delta in groq_client.chat_stream(messages, temperature=0.2):
+                    answer += delta
+                    yield "delta", {"content": delta}
+            else:
+                answer = groq_client.chat(messages, temperature=0.2) or ""
+    if not answer.strip() or answer.strip().startswith("{"):
+        answer = local_recommendations(results, CHAT_PICKS)
+    yield "done", {"content": answer}
+
+
+def parse_chat_request(data):
+    dialog = data.get("messages") or data.get("dialog") or []
+    if isinstance(dialog, str):
+        dialog = [{"role": "user", "content": dialog}]
+    dialog = [m for m in dialog if isinstance(m, dict) and m.get("role") in ("user", "assistant")]
+    return dialog, int(data.get("limit", CHAT_LIMIT))
+
+
+@app.route("/chat", methods=["POST"])
+@app.route("/api/chat", methods=["POST"])
+def chat():
+    """One-shot chat turn: {"messages": [...], "limit": 10} -> {params, results, response}."""
+    try:
+        dialog, limit = parse_chat_request(request.get_json(silent=True) or {})
+        out = {"params": None, "results": []}
+        for event, data in chat_events(dialog, limit):
+            if event == "params":
+                out["params"] = data
+            elif event == "results":
+                out["results"] = data["results"]
+            elif event == "done":
+                out["response"] = data["content"]
+        return jsonify(out)
+    except Exception as e:
+        print(f"❌ /chat error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/chat/stream", methods=["POST"])
+@app.route("/api/chat/stream", methods=["POST"])
+def chat_stream():
+    """Server-sent events version of /chat (preview, params, results, delta..., done)."""
+    dialog, limit = parse_chat_request(request.get_json(silent=True) or {})
+
+    def generate():
+        try:
+            for event, data in chat_events(dialog, limit, stream=True):
+                yield sse(event, data)
+        except Exception as e:
+            print(f"❌ /chat/stream error: {e}")
+            yield sse("error", {"error": str(e)})
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route("/stats", methods=["GET"]) 
+@app.route("/api/stats", methods=["GET"]) 
+def stats():
+    """Runtime stats for tuning batching/caching behaviour."""
+    return jsonify(stats_payload())
+
+
+def stats_payload(groq=None):
+    """/stats body; asgi_server.py passes its async Groq client."""
+    groq = groq or groq_client
+    return {
+        "embedding_batcher": embedding_batcher.stats() if embedding_batcher else None,
+        "caches": {c.name: c.stats() for c in (embedding_cache, search_cache, groq_cache)},
+        "groq": groq.stats() if GROQ_API_KEY else None,
+        "search": {
+            "mode": SEARCH_MODE,
+            "lexical_backend": LEXICAL_BACKEND,
+            "bm25_documents": len(lexical_index) if lexical_index is not None else None,
+            "neighbor_table": {"movies": len(neighbor_table), "k": neighbor_table.k} if neighbor_table is not None else None,
+        },
+        "admission": {
+            "search": dict(search_admission.stats(), single_flight=search_flight.stats()),
+            "groq": dict(groq_admission.stats(), single_flight=groq_flight.stats()),
+        },
+        "mongo": mongo.stats(),
+        "startup": {
+            "lazy": LAZY_STARTUP,
+            "timings_ms": startup_timings,
+            "embedding_provider": EMBEDDING_PROVIDER,
+            "model_loaded": model is not None,
+            "mongo_connected": coll is not None,
+            "peak_rss_mb": _peak_rss_mb(),
+        },
+    }
+
+
+@app.route("/metrics", methods=["GET"])
+@app.route("/api/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Prometheus text exposition of stage histograms, counters and cache stats."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/debug/profile", methods=["GET", "POST"])
+def debug_profile():
+    """GET: aggregated cProfile report. POST {"rate": 0.05, "reset": true}: change sampling at runtime."""
+    if not ADMIN_TOKEN or request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        return jsonify({"error": "forbidden"}), 403
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        profiler.set_rate(data.get("rate", profiler.rate), reset=bool(data.get("reset")))
+        return jsonify({"rate": profiler.rate, "sampled": profiler.sampled})
+    limit = int(request.args.get("limit", 40))
+    return Response(profiler.report(limit=limit, sort=request.args.get("sort", "cumulative")), mimetype="text/plain")
+
+
 @app.route("/", methods=["GET"]) 
 @app.route("/api", methods=["GET"]) 
 def home():
     return jsonify({"status": "Server running"})
 
 
+@app.route("/health", methods=["GET"])
+@app.route("/api/health", methods=["GET"])
+def health():
+    """Readiness probe: pings Mongo (a run of failures makes the next request reconnect)."""
+    body, status, headers = health_response()
+    return jsonify(body), status, headers
+
+
+def health_response():
+    ok = mongo.health_check()
+    return {"status": "ok" if ok else "degraded", "mongo": mongo.stats()}, 200 if ok else 503, {}
+
+
+startup_timings["module_ready"] = round((time.perf_counter() - _import_started) * 1000.0, 1)
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Streaming, resumable bulk ingestion of the cleaned movie CSV into MongoDB.
+
+Reads the CSV (or the Parquet output of python-scripts/preprocessing.py) in chunks, batch-encodes the text column with the pipeline's
+SentenceTransformer and hands finished documents to a background writer
+thread, so encoding of the next batch overlaps with bulk_write of the
+previous one. Progress is checkpointed after every successful write; rerun
+with --resume to continue an interrupted run.
+
+With --incremental only rows whose description hash or embedding model
+differ from the stored document are re-embedded. If the configured model
+differs from the one stored in the collection, a full re-embed is staged in
+a shadow collection and swapped in atomically once complete (--reembed
+forces this path).
+
+Usage:
+    python backend/ingest.py --csv cleaned_database/cleaned_final_dataset3.csv
+    python backend/ingest.py --csv ... --resume
+    python backend/ingest.py --csv ... --incremental
+    python backend/ingest.py --csv ... --compact int8
+    python backend/ingest.py --csv ... --workers 8
+
+--workers N encodes on N processes, each with its own model and
+--threads-per-worker threads (default: cores // N); batches stream back to
+the writer in order. Pick N with backend/parallel_encoder.py's scaling report.
+
+--compact adds int8 and/or sign-bit BSON vectors (see compact_embeddings.py)
+next to the float `embedding`. --drop-float omits the float list; only use
+it when the server runs LOCAL_INDEX_MODE=int8/binary/hybrid, because the
+Atlas index and the exact/ivf local index read `embedding`.
+"""
+
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from embedding_providers import PROVIDERS, is_remote
+from mongo_connection import COLLECTION_NAME, DB_NAME
+from mongo_pipeline import MongoNativePipeline
+
+_STOP = object()
+
+
+def load_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, state):
+    """Write the checkpoint atomically so a crash never leaves a torn file."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def iter_record_chunks(path, chunk_size, skip=0):
+    """Yield lists of row dicts from a CSV or Parquet file, skipping the first `skip` rows.
+
+    Parquet files written by python-scripts/preprocessing.py already carry
+    real list columns, so no string re-parsing is needed for them.
+    """
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        to_skip = skip
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            if to_skip >= batch.num_rows:
+                to_skip -= batch.num_rows
+                continue
+            records = batch.to_pylist()[to_skip:]
+            to_skip = 0
+            yield records
+        return
+
+    reader = pd.read_csv(path, chunksize=chunk_size, skiprows=range(1, skip + 1) if skip else None)
+    for chunk in reader:
+        yield chunk.to_dict("records")
+
+
+class BulkWriter(threading.Thread):
+    """Background thread that drains (docs, rows_through) items into bulk_write."""
+
+    def __init__(self, pipeline, checkpoint_path, state, coll=None, max_pending=4):
+        super().__init__(name="bulk-writer", daemon=True)
+        self.pipeline = pipeline
+        self.coll = coll
+        self.checkpoint_path = checkpoint_path
+        self.state = state
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.error = None
+        self.written = 0
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+            docs, rows_through = item
+            try:
+                self.pipeline.bulk_upsert(docs, coll=self.coll)
+            except Exception as e:
+                self.error = e
+                return
+            self.written += len(docs)
+            self.state["rows_done"] = rows_through
+            self.state["updated_at"] = time.time()
+            if self.checkpoint_path:
+                save_checkpoint(self.checkpoint_path, self.state)
+
+    def put(self, docs, rows_through):
+        # Blocks when the writer falls behind, bounding memory use
+        while True:
+            if self.error:
+                raise self.error
+            try:
+                self.queue.put((docs, rows_through), timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def close(self):
+        # A dead writer no longer drains the queue, so don't block on it
+        while self.is_alive():
+            try:
+                self.queue.put(_STOP, timeout=1)
+                break
+            except queue.Full:
+                continue
+        self.join()
+        if self.error:
+            raise self.error
+
+
+def ingest(pipeline, csv_path, text_col="description", id_col="id", chunk_size=2048, batch_size=64,
+           write_batch=500, checkpoint_path=None, resume=False, limit=None, incremental=False, coll=None):
+    """Stream csv_path into coll (default pipeline.coll); returns number of rows written."""
+    target = coll if coll is not None else pipeline.coll
+    state = {
+        "csv": os.path.abspath(csv_path),
+        "collection": target.full_name,
+        "text_col": text_col,
+        "rows_done": 0,
+    }
+    if resume:
+        previous = load_checkpoint(checkpoint_path)
+        if previous:
+            if previous.get("csv") != state["csv"] or previous.get("collection") != state["collection"]:
+                raise RuntimeError(f"❌ Checkpoint {checkpoint_path} belongs to a different CSV/collection")
+            state.update(previous)
+            print(f"↩️  Resuming after {state['rows_done']} rows")
+
+    skip = state["rows_done"]
+    reader = iter_record_chunks(csv_path, chunk_size, skip)
+
+    writer = BulkWriter(pipeline, checkpoint_path, state, coll=target)
+    writer.start()
+
+    rows_seen = skip
+    unchanged = 0
+
+    def parts():
+        """(rows_through, part) keys with the texts to encode; empty parts still advance the checkpoint."""
+        nonlocal rows_seen, unchanged
+        for records in reader:
+            if limit is not None and rows_seen - skip >= limit:
+                return
+            if limit is not None:
+                records = records[: limit - (rows_seen - skip)]
+            for start in range(0, len(records), write_batch):
+                part = records[start:start + write_batch]
+                rows_seen += len(part)
+                if incremental:
+                    changed = pipeline.select_changed(part, text_col=text_col, id_col=id_col)
+                    unchanged += len(part) - len(changed)
+                    part = changed
+                texts = [str(r.get(text_col) if isinstance(r.get(text_col), str) else "") for r in part]
+                yield (rows_seen, part), texts
+
+    started = time.perf_counter()
+    reported = skip
+    try:
+        for (rows_through, part), vectors in pipeline.embed_stream(parts(), batch_size=batch_size):
+            docs = [
+                pipeline.build_doc(r, v.tolist(), text_col=text_col, id_col=id_col)
+                for r, v in zip(part, vectors)
+            ]
+            writer.put(docs, rows_through)
+
+            if rows_through - reported >= chunk_size:
+                reported = rows_through
+                elapsed = time.perf_counter() - started
+                rate = (rows_through - skip) / elapsed if elapsed else 0.0
+                print(f"📦 {rows_through} rows encoded ({rate:.1f} rows/s)")
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Ingested {writer.written} rows into {target.full_name} in {elapsed:.1f}s")
+    if incremental:
+        print(f"⏭️  Skipped {unchanged} unchanged rows")
+    return writer.written
+
+
+def reembed(pipeline, csv_path, checkpoint_path=None, resume=False, **kwargs):
+    """Full re-embed into the shadow collection, then atomically cut over."""
+    shadow = pipeline.shadow_collection()
+    if not resume:
+        shadow.drop()
+    print(f"🔁 Re-embedding into {shadow.full_name} with {pipeline.model_version}")
+    written = ingest(pipeline, csv_path, checkpoint_path=checkpoint_path, resume=resume, coll=shadow, **kwargs)
+    dim = pipeline.model.get_sentence_embedding_dimension()
+    pipeline.cutover_shadow(dim=dim)
+    return written
+
+
+def default_provider():
+    """Server's EMBEDDING_PROVIDER; the remote HF API is swapped for the identical local model."""
+    provider = os.getenv("EMBEDDING_PROVIDER", "local").lower()
+    return "local" if is_remote(provider) else provider
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream the cleaned movie CSV into MongoDB with embeddings.")
+    parser.add_argument("--csv", required=True, help="Path to the cleaned CSV or Parquet file")
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"))
+    parser.add_argument("--model-version", default=os.getenv("EMBEDDING_MODEL_VERSION"),
+                        help="Optional version tag stored with the model name on each document")
+    parser.add_argument("--provider", default=default_provider(), choices=PROVIDERS,
+                        help="Embedding backend; must match the server's EMBEDDING_PROVIDER")
+    parser.add_argument("--text-col", default="description")
+    parser.add_argument("--id-col", default="id")
+    parser.add_argument("--chunk-size", type=int, default=2048, help="CSV rows read per chunk")
+    parser.add_argument("--batch-size", type=int, default=64, help="Encoder batch size")
+    parser.add_argument("--write-batch", type=int, default=500, help="Documents per bulk_write")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("EMBED_WORKERS", "1")),
+                        help="Encoder processes (1 = encode in this process)")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="Torch/BLAS threads per encoder process (default: cores // workers)")
+    parser.add_argument("--checkpoint", default=".ingest_checkpoint.json")
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint")
+    parser.add_argument("--limit", type=int, default=None, help="Only ingest this many rows")
+    parser.add_argument("--incremental", action="store_true", help="Only re-embed new or changed rows")
+    parser.add_argument("--reembed", action="store_true", help="Force a full shadow re-embed and cutover")
+    parser.add_argument("--compact", default="none", choices=("none", "int8", "binary", "both"),
+                        help="Also store int8 / sign-bit BSON vectors")
+    parser.add_argument("--drop-float", action="store_true",
+                        help="Do not store the float embedding list (local compact index only)")
+    args = parser.parse_args(argv)
+    if args.drop_float and args.compact == "none":
+        parser.error("--drop-float requires --compact")
+    if args.workers > 1 and is_remote(args.provider):
+        parser.error("--workers needs a local --provider")
+
+    pipeline = MongoNativePipeline(args.mongo_uri, db_name=args.db, collection_name=args.collection)
+    pipeline.load_embedding_model(args.model, version=args.model_version, provider=args.provider)
+    pipeline.compact = None if args.compact == "none" else args.compact
+    pipeline.store_float = not args.drop_float
+    options = dict(
+        text_col=args.text_col,
+        id_col=args.id_col,
+        chunk_size=args.chunk_size,
+        batch_size=args.batch_size,
+        write_batch=args.write_batch,
+        checkpoint_path=args.checkpoint,
+        resume=args.resume,
+        limit=args.limit,
+    )
+
+    if args.workers > 1:
+        pipeline.enable_parallel_encode(args.workers, args.threads_per_worker)
+
+    try:
+        if args.reembed or (args.incremental and pipeline.needs_model_migration()):
+            if not args.reembed:
+                print(f"ℹ️ Stored embeddings use a different model than {pipeline.model_version}")
+            reembed(pipeline, args.csv, **options)
+        else:
+            ingest(pipeline, args.csv, incremental=args.incremental, **options)
+    finally:
+        pipeline.close_parallel_encode()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Lexical search for the /search fallback and hybrid mode.
+
+Two backends, both matching whole words (no "war" inside "software"):
+
+    bm25        Okapi BM25 over an inverted index built from the cleaned
+                `docs` column of python-scripts/preprocessing.py (or from the
+                collection). Postings are CSR NumPy arrays saved as .npy and
+                memory-mapped on load, so startup only reads the vocabulary.
+    mongo_text  MongoDB $text search on a text index (title, description,
+                genres, languages, directors, stars).
+
+reciprocal_rank_fusion() merges the lexical and vector rankings for
+SEARCH_MODE=hybrid.
+
+Usage:
+    python backend/lexical_index.py build --parquet cleaned_database/cleaned_final_dataset3.parquet
+    python backend/lexical_index.py build --from-mongo
+    python backend/lexical_index.py text-index
+    python backend/lexical_index.py search "korean revenge thriller"
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+DEFAULT_INDEX_DIR = "models/bm25-index"
+TEXT_INDEX_NAME = "movie_text_index"
+TEXT_INDEX_WEIGHTS = {"title": 10, "genres": 5, "directors": 3, "stars": 3, "languages": 2, "description": 1}
+RRF_K = 60
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+# NLTK's English list (preprocessing.py removes these from `docs`), inlined so serving needs no NLTK
+STOP_WORDS = frozenset("""
+a about above after again against ain all am an and any are aren aren't as at be because been before being
+below between both but by can couldn couldn't d did didn didn't do does doesn doesn't doing don don't down
+during each few for from further had hadn hadn't has hasn hasn't have haven haven't having he her here hers
+herself him himself his how i if in into is isn isn't it it's its itself just ll m ma me mightn mightn't more
+most mustn mustn't my myself needn needn't no nor not now o of off on once only or other our ours ourselves
+out over own re s same shan shan't she she's should should've shouldn shouldn't so some such t than that
+that'll the their theirs them themselves then there these they this those through to too under until up ve
+very was wasn wasn't we were weren weren't what when where which while who whom why will with won won't
+wouldn wouldn't y you you'd you'll you're you've your yours yourself yourselves
+""".split())
+
+
+def tokenize(text):
+    """Lowercase word tokens without stop words."""
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in STOP_WORDS]
+
+
+def query_terms(text):
+    """Query tokens plus adjacent pairs joined, since `docs` stores names as one word ("tomhanks")."""
+    tokens = tokenize(text)
+    return tokens + [a + b for a, b in zip(tokens, tokens[1:])]
+
+
+def _name_text(values):
+    values = values if isinstance(values, list) else [values]
+    return " ".join(re.sub(r"[^a-zA-Z]", "", str(v)).lower() for v in values if v)
+
+
+def doc_text(doc):
+    """Approximate preprocessing.py's `docs` for a Mongo movie document."""
+    return " ".join([
+        str(doc.get("title") or ""),
+        str(doc.get("description") or ""),
+        " ".join(doc.get("genres") or []),
+        _name_text(doc.get("languages") or []),
+        _name_text(doc.get("directors") or []),
+        _name_text(doc.get("stars") or []),
+    ])
+
+
+# ------------------------
+class BM25Index:
+    """Okapi BM25 over CSR postings (term -> rows, term frequencies)."""
+
+    ARRAYS = ("offsets", "postings", "tf", "doc_len", "idf")
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids = []
+        self.vocab = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.postings = np.zeros(0, dtype=np.int32)
+        self.tf = np.zeros(0, dtype=np.float32)
+        self.doc_len = np.zeros(0, dtype=np.float32)
+        self.idf = np.zeros(0, dtype=np.float32)
+        self.avgdl = 0.0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def build(self, ids, texts):
+        """Index texts (already-clean `docs` strings or raw text) under the given movie ids."""
+        self.ids = [str(i) for i in ids]
+        vocab, rows, terms, counts, lengths = {}, [], [], [], []
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            freq = {}
+            for tok in tokens:
+                term = vocab.setdefault(tok, len(vocab))
+                freq[term] = freq.get(term, 0) + 1
+            for term, count in freq.items():
+                rows.append(row)
+                terms.append(term)
+                counts.append(count)
+
+        terms = np.asarray(terms, dtype=np.int64)
+        order = np.argsort(terms, kind="stable")
+        df = np.bincount(terms, minlength=len(vocab))
+        n = len(self.ids)
+        self.vocab = vocab
+        self.offsets = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+        self.postings = np.asarray(rows, dtype=np.int32)[order]
+        self.tf = np.asarray(counts, dtype=np.float32)[order]
+        self.doc_len = np.asarray(lengths, dtype=np.float32)
+        self.avgdl = float(self.doc_len.mean()) if n else 0.0
+        self.idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        return self
+
+    # ------------------------
+    def save(self, path, source=None):
+        os.makedirs(path, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, "vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(self.vocab, f)
+        with open(os.path.join(path, "ids.json"), "w", encoding="utf-8") as f:
+            json.dump(self.ids, f)
+        manifest = {"k1": self.k1, "b": self.b, "avgdl": self.avgdl, "documents": len(self.ids),
+                    "terms": len(self.vocab), "postings": int(len(self.postings)), "source": source,
+                    "built_at": time.time()}
+        with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load a saved index; postings stay on disk (mmap) unless mmap=False."""
+        with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        index = cls(k1=manifest["k1"], b=manifest["b"])
+        for name in cls.ARRAYS:
+            setattr(index, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None))
+        with open(os.path.join(path, "vocab.json"), "r", encoding="utf-8") as f:
+            index.vocab = json.load(f)
+        with open(os.path.join(path, "ids.json"), "r", encoding="utf-8") as f:
+            index.ids = json.load(f)
+        index.avgdl = manifest["avgdl"]
+        return index
+
+    # ------------------------
+    def search(self, query, k=10):
+        """Return [(movie_id, bm25_score)] for the k best matching documents."""
+        term_ids = {self.vocab[t] for t in query_terms(query) if t in self.vocab}
+        if not term_ids or not len(self.ids) or k <= 0:
+            return []
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in term_ids:
+            start, end = int(self.offsets[term]), int(self.offsets[term + 1])
+            rows = self.postings[start:end]
+            tf = self.tf[start:end]
+            norm = self.k1 * (1.0 - self.b + self.b * self.doc_len[rows] / (self.avgdl or 1.0))
+            scores[rows] += self.idf[term] * tf * (self.k1 + 1.0) / (tf + norm)
+
+        hits = np.flatnonzero(scores)
+        if k < len(hits):
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(self.ids[i], float(scores[i])) for i in hits]
+
+
+def load_bm25_index(path):
+    """Load a saved BM25 index and log the load time."""
+    started = time.perf_counter()
+    index = BM25Index.load(path)
+    elapsed = time.perf_counter() - started
+    print(f"✅ BM25 index loaded: {len(index)} docs, {len(index.vocab)} terms in {elapsed:.2f}s")
+    return index
+
+
+# ------------------------
+def ensure_text_index(coll):
+    """Create the weighted text index (mongo_text backend) and the `id` index BM25 hits are fetched by."""
+    # Any existing index led by `id` (e.g. a unique one) serves the lookups; a second spec would conflict
+    if not any(info["key"][0][0] == "id" for info in coll.index_information().values()):
+        coll.create_index("id")
+    keys = [(field, "text") for field in TEXT_INDEX_WEIGHTS]
+    return coll.create_index(keys, name=TEXT_INDEX_NAME, weights=TEXT_INDEX_WEIGHTS, default_language="english")
+
+
+def text_search_pipeline(query, filters, limit, projection):
+    """$text search ranked by textScore ($text must sit in the first $match)."""
+    match = {"$text": {"$search": query}}
+    if filters:
+        match = {"$and": [match, filters]}
+    return [
+        {"$match": match},
+        {"$project": dict(projection, score={"$meta": "textScore"})},
+        {"$sort": {"score": {"$meta": "textScore"}}},
+        {"$limit": limit},
+    ]
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K, weights=None):
+    """Fuse ranked id lists: score(id) = sum_i weight_i / (k + rank_i). Returns [(id, score)] best first."""
+    fused = {}
+    for i, ranking in enumerate(rankings):
+        weight = weights[i] if weights else 1.0
+        for rank, item in enumerate(ranking):
+            fused[item] = fused.get(item, 0.0) + weight / (k + rank + 1)
+    return sorted(fused.items(), key=lambda kv: kv[1], reverse=True)
+
+
+# ------------------------
+def _mongo_collection():
+    from mongo_connection import COLLECTION_NAME, DB_NAME, get_client
+
+    return get_client()[DB_NAME][COLLECTION_NAME]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and query the lexical search indexes.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Build the BM25 index")
+    build.add_argument("--parquet", help="preprocessing.py output with a `docs` column")
+    build.add_argument("--from-mongo", action="store_true", help="Index title/description/... from MONGO_URI")
+    build.add_argument("--output", default=os.getenv("LEXICAL_INDEX_DIR", DEFAULT_INDEX_DIR))
+    sub.add_parser("text-index", help="Create the MongoDB text index (and the id index)")
+    search = sub.add_parser("search", help="Query a saved BM25 index")
+    search.add_argument("query")
+    search.add_argument("--index", default=os.getenv("LEXICAL_INDEX_DIR", DEFAULT_INDEX_DIR))
+    search.add_argument("-k", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    if args.command == "text-index":
+        print(f"✅ Text index ready: {ensure_text_index(_mongo_collection())}")
+        return 0
+    if args.command == "search":
+        for movie_id, score in load_bm25_index(args.index).search(args.query, k=args.k):
+            print(f"{score:8.3f}  {movie_id}")
+        return 0
+
+    started = time.perf_counter()
+    if args.parquet:
+        import pandas as pd
+
+        table = pd.read_parquet(args.parquet, columns=["docs"])
+        ids, texts, source = table.index.astype(str).tolist(), table["docs"].fillna("").tolist(), args.parquet
+    elif args.from_mongo:
+        coll = _mongo_collection()
+        docs = list(coll.find({}, {"_id": 0, "id": 1, **{f: 1 for f in TEXT_INDEX_WEIGHTS}}))
+        ids, texts, source = [d.get("id") for d in docs], [doc_text(d) for d in docs], coll.full_name
+    else:
+        parser.error("build needs --parquet or --from-mongo")
+    index = BM25Index().build(ids, texts)
+    manifest = index.save(args.output, source=source)
+    print(f"✅ BM25 index: {manifest['documents']} docs, {manifest['terms']} terms, "
+          f"{manifest['postings']} postings in {time.perf_counter() - started:.1f}s -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,578 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+GROQ_CHAT_URL = "https://api.groq.com/openai/v1/chat/completions"
+
+
+class LLMError(Exception):
+    """A Groq call failed (network error, non-200, or unusable body)."""
+
+
+class CircuitBreaker:
+    """Classic closed -> open -> half-open breaker.
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    callers are short-circuited for `reset_timeout` seconds; then a single
+    probe call is let through and its outcome closes or re-opens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """Give back a half-open probe slot whose call never ran or never finished (no outcome to record)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opens += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def stats(self):
+        return {"state": self.state, "consecutive_failures": self.failures, "opens": self.opens}
+
+
+class LatencyStats:
+    """Rolling window of call latencies plus outcome counters."""
+
+    def __init__(self, window=2048):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.counters = {}
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def as_dict(self):
+        with self._lock:
+            samples = list(self._samples)
+            counters = dict(self.counters)
+        latency = {"p50": None, "p95": None, "p99": None, "max": None}
+        if samples:
+            arr = np.asarray(samples) * 1000.0
+            p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+            latency = {
+                "p50": round(float(p50), 1),
+                "p95": round(float(p95), 1),
+                "p99": round(float(p99), 1),
+                "max": round(float(arr.max()), 1),
+            }
+        return {"latency_ms": latency, **counters}
+
+
+def _completion_text(res):
+    """Extract the assistant message from a requests/httpx response or raise LLMError."""
+    return _completion_body(res.status_code, res.content)
+
+
+def _completion_body(status_code, body):
+    if status_code != 200:
+        raise LLMError(f"non-200: {status_code} {body[:200].decode('utf-8', 'replace')}")
+    try:
+        data = json.loads(body)
+        text = data.get("choices", [{}])[0].get("message", {}).get("content")
+    except Exception as e:
+        raise LLMError(f"parse error: {e}") from e
+    if not text:
+        raise LLMError("empty completion")
+    return text
+
+
+def _stream_delta(line):
+    """Text delta of one SSE line; "" for keep-alives and empty deltas, None at [DONE]."""
+    if not line or not line.startswith("data:"):
+        return ""
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return None
+    try:
+        return json.loads(data)["choices"][0].get("delta", {}).get("content") or ""
+    except (ValueError, KeyError, IndexError) as e:
+        raise LLMError(f"parse error: {e}") from e
+
+
+class GroqClient:
+    """Pooled, concurrency-bounded Groq chat client with hedging and a circuit breaker.
+
+    chat() returns the assistant message text, or None when the caller should
+    use its fallback (breaker open, no free slot, all attempts failed, or the
+    overall timeout expired). It never raises for upstream problems.
+
+    Hedging: if the first attempt has not answered after `hedge_delay_ms`
+    (or fails outright), another attempt is started, up to `max_attempts`;
+    the first successful answer wins. Every attempt holds its own slot until
+    its request has finished, so upstream concurrency never exceeds
+    `max_concurrency`; a hedge that finds no free slot is skipped, and the
+    losers stop reading as soon as a winner is in. Calls slower than
+    `latency_budget_ms` still return their answer but count as a failure
+    for the breaker.
+    """
+
+    def __init__(self, api_key, url=GROQ_CHAT_URL, model="llama3-70b-8192", timeout=20.0,
+                 max_concurrency=8, acquire_timeout_ms=2000, max_attempts=1, hedge_delay_ms=3000,
+                 latency_budget_ms=8000, failure_threshold=5, reset_timeout=30.0, pool_size=16):
+        self.api_key = api_key
+        self.url = url
+        self.model = model
+        self.timeout = float(timeout)
+        self.max_attempts = max(1, int(max_attempts))
+        self.hedge_delay = max(0.0, float(hedge_delay_ms)) / 1000.0
+        self.acquire_timeout = max(0.0, float(acquire_timeout_ms)) / 1000.0
+        self.latency_budget = float(latency_budget_ms) / 1000.0 if latency_budget_ms else None
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        })
+
+        self._slots = threading.BoundedSemaphore(max(1, int(max_concurrency)))
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, int(max_concurrency)) * self.max_attempts, thread_name_prefix="groq"
+        )
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.metrics = LatencyStats()
+
+    # ------------------------
+    def _post(self, payload, cancelled=None):
+        """One attempt; stops reading (LLMError) once `cancelled` is set by a winning hedge."""
+        try:
+            with self.session.post(self.url, json=payload, timeout=self.timeout, stream=True) as res:
+                body = bytearray()
+                for chunk in res.iter_content(chunk_size=16384):
+                    if cancelled is not None and cancelled.is_set():
+                        raise LLMError("cancelled: another attempt answered")
+                    body.extend(chunk)
+                return _completion_body(res.status_code, bytes(body))
+        except requests.RequestException as e:
+            raise LLMError(f"request failed: {e}") from e
+
+    def _hedged(self, payload):
+        """Race up to max_attempts attempts; the caller's slot is handed to the first one."""
+        deadline = time.monotonic() + self.timeout
+        cancelled = threading.Event()
+        futures = []
+        pending = set()
+        last_error = None
+
+        def launch():
+            try:
+                fut = self._executor.submit(self._post, payload, cancelled)
+            except BaseException:
+                self._slots.release()
+                raise
+            # The slot is held for as long as the request runs, not just until a winner is picked
+            fut.add_done_callback(lambda _: self._slots.release())
+            futures.append(fut)
+            pending.add(fut)
+            if len(futures) > 1:
+                self.metrics.incr("hedges")
+
+        launch()
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                can_hedge = len(futures) < self.max_attempts
+                done, pending = wait(
+                    pending, timeout=min(remaining, self.hedge_delay) if can_hedge else remaining,
+                    return_when=FIRST_COMPLETED,
+                )
+                for fut in done:
+                    try:
+                        text = fut.result()
+                    except LLMError as e:
+                        last_error = e
+                        continue
+                    if fut is not futures[0]:
+                        self.metrics.incr("hedge_wins")
+                    return text
+                # Hedge delay elapsed or an attempt failed: start another if allowed and a slot is free
+                if can_hedge and self._slots.acquire(blocking=False):
+                    launch()
+                elif can_hedge:
+                    self.metrics.incr("hedges_skipped")
+                elif not pending:
+                    break
+        finally:
+            cancelled.set()
+            for fut in pending:
+                fut.cancel()
+        raise last_error or LLMError(f"timed out after {self.timeout:.1f}s")
+
+    # ------------------------
+    def chat(self, messages, temperature=0.2):
+        """Return completion text, or None if the caller should fall back."""
+        self.metrics.incr("calls")
+        if not self.breaker.allow():
+            self.metrics.incr("short_circuited")
+            return None
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            self.metrics.incr("rejected")
+            self.breaker.release_probe()
+            return None
+
+        payload = {"model": self.model, "messages": messages, "temperature": temperature}
+        started = time.perf_counter()
+        try:
+            text = self._hedged(payload)
+        except LLMError as e:
+            print(f"⚠️ GROQ request failed: {e}")
+            self.metrics.incr("failures")
+            self.breaker.record_failure()
+            return None
+        except BaseException:
+            self.breaker.release_probe()
+            raise
+        finally:
+            # The slot itself goes back when each attempt finishes (see _hedged)
+            self.metrics.observe(time.perf_counter() - started)
+
+        self._record_success(time.perf_counter() - started)
+        return text
+
+    def chat_stream(self, messages, temperature=0.2):
+        """Yield completion text deltas as Groq streams them (stream=true, SSE).
+
+        Yields nothing when the caller should fall back (breaker open, no free
+        slot, or the request failed before the first token). Not hedged: a
+        stream can't be raced once tokens have been sent on.
+
+        The upstream response is read on the executor into a queue, so the
+        slot is released as soon as Groq has finished, however slowly the
+        consumer drains it, and the latency budget applies to Groq's time to
+        first token rather than to the consumer.
+        """
+        self.metrics.incr("calls")
+        if not self.breaker.allow():
+            self.metrics.incr("short_circuited")
+            return
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            self.metrics.incr("rejected")
+            self.breaker.release_probe()
+            return
+
+        payload = {"model": self.model, "messages": messages, "temperature": temperature, "stream": True}
+        deltas = queue.Queue()
+        abandoned = threading.Event()
+        try:
+            self._executor.submit(self._read_stream, payload, deltas, abandoned)
+        except BaseException:
+            self._slots.release()
+            self.breaker.release_probe()
+            raise
+        try:
+            while True:
+                delta = deltas.get()
+                if delta is None:
+                    return
+                yield delta
+        finally:
+            # GeneratorExit when the consumer stops early (client disconnected): stop reading upstream
+            abandoned.set()
+
+    def _read_stream(self, payload, deltas, abandoned):
+        """Executor side of chat_stream: owns the slot and records the breaker outcome."""
+        started = time.perf_counter()
+        first_token_s = None
+        finished = False
+        try:
+            with self.session.post(self.url, json=payload, timeout=self.timeout, stream=True) as res:
+                if res.status_code != 200:
+                    raise LLMError(f"non-200: {res.status_code} {res.text[:200]}")
+                for line in res.iter_lines(decode_unicode=True):
+                    if abandoned.is_set():
+                        break
+                    delta = _stream_delta(line)
+                    if delta is None:
+                        finished = True
+                        break
+                    if delta:
+                        if first_token_s is None:
+                            first_token_s = time.perf_counter() - started
+                        deltas.put(delta)
+                else:
+                    finished = True
+        except (requests.RequestException, LLMError) as e:
+            print(f"⚠️ GROQ stream failed: {e}")
+            self.metrics.incr("failures")
+            self.breaker.record_failure()
+        except BaseException:
+            self.breaker.release_probe()
+            raise
+        else:
+            if finished:
+                self._record_success(time.perf_counter() - started if first_token_s is None else first_token_s)
+            else:
+                # Consumer went away mid-stream: no outcome to judge Groq by, just free a half-open probe
+                self.breaker.release_probe()
+        finally:
+            self._slots.release()
+            self.metrics.observe(time.perf_counter() - started)
+            deltas.put(None)
+
+    def _record_success(self, elapsed):
+        if self.latency_budget is not None and elapsed > self.latency_budget:
+            self.metrics.incr("over_budget")
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        self.metrics.incr("successes")
+
+    def stats(self):
+        return {
+            "model": self.model,
+            "max_attempts": self.max_attempts,
+            "hedge_delay_ms": self.hedge_delay * 1000.0,
+            "breaker": self.breaker.stats(),
+            **self.metrics.as_dict(),
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+class AsyncGroqClient(GroqClient):
+    """asyncio flavour of GroqClient for the ASGI server (httpx instead of requests).
+
+    Same hedging, breaker, budget and metrics semantics; hedged attempts are
+    asyncio tasks and the losers are cancelled once one attempt succeeds.
+    chat_stream is an async generator over httpx's streaming response.
+    """
+
+    def __init__(self, api_key, url=GROQ_CHAT_URL, model="llama3-70b-8192", timeout=20.0,
+                 max_concurrency=8, acquire_timeout_ms=2000, max_attempts=1, hedge_delay_ms=3000,
+                 latency_budget_ms=8000, failure_threshold=5, reset_timeout=30.0, pool_size=16):
+        import httpx
+
+        self.api_key = api_key
+        self.url = url
+        self.model = model
+        self.timeout = float(timeout)
+        self.max_attempts = max(1, int(max_attempts))
+        self.hedge_delay = max(0.0, float(hedge_delay_ms)) / 1000.0
+        self.acquire_timeout = max(0.0, float(acquire_timeout_ms)) / 1000.0
+        self.latency_budget = float(latency_budget_ms) / 1000.0 if latency_budget_ms else None
+        self.max_concurrency = max(1, int(max_concurrency))
+
+        self._httpx = httpx
+        self.session = httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+        self._slots = None  # created lazily inside the running event loop
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.metrics = LatencyStats()
+
+    # ------------------------
+    async def _post(self, payload):
+        try:
+            res = await self.session.post(self.url, json=payload)
+        except self._httpx.HTTPError as e:
+            raise LLMError(f"request failed: {e!r}") from e
+        return _completion_text(res)
+
+    async def _hedged(self, payload):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        tasks = []
+        pending = set()
+        last_error = None
+
+        def launch():
+            task = asyncio.ensure_future(self._post(payload))
+            tasks.append(task)
+            pending.add(task)
+            if len(tasks) > 1:
+                self.metrics.incr("hedges")
+
+        launch()
+        try:
+            while pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                can_hedge = len(tasks) < self.max_attempts
+                done, pending = await asyncio.wait(
+                    pending, timeout=min(remaining, self.hedge_delay) if can_hedge else remaining,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    try:
+                        text = task.result()
+                    except LLMError as e:
+                        last_error = e
+                        continue
+                    if task is not tasks[0]:
+                        self.metrics.incr("hedge_wins")
+                    return text
+                if can_hedge:
+                    launch()
+                elif not pending:
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+        raise last_error or LLMError(f"timed out after {self.timeout:.1f}s")
+
+    # ------------------------
+    async def _admit(self):
+        """Breaker check plus a slot; False (nothing held) when the caller should fall back."""
+        if not self.breaker.allow():
+            self.metrics.incr("short_circuited")
+            return False
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        try:
+            if self._slots.locked():
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.acquire_timeout)
+            else:
+                # A free slot is taken at once, even with acquire_timeout_ms=0 (wait_for would time out first)
+                await self._slots.acquire()
+        except asyncio.TimeoutError:
+            self.metrics.incr("rejected")
+            self.breaker.release_probe()
+            return False
+        except BaseException:
+            self.breaker.release_probe()
+            raise
+        return True
+
+    async def chat(self, messages, temperature=0.2):
+        """Return completion text, or None if the caller should fall back."""
+        self.metrics.incr("calls")
+        if not await self._admit():
+            return None
+
+        payload = {"model": self.model, "messages": messages, "temperature": temperature}
+        started = time.perf_counter()
+        try:
+            text = await self._hedged(payload)
+        except LLMError as e:
+            print(f"⚠️ GROQ request failed: {e}")
+            self.metrics.incr("failures")
+            self.breaker.record_failure()
+            return None
+        except BaseException:
+            # e.g. CancelledError when the client disconnects mid-call
+            self.breaker.release_probe()
+            raise
+        finally:
+            self._slots.release()
+            self.metrics.observe(time.perf_counter() - started)
+
+        self._record_success(time.perf_counter() - started)
+        return text
+
+    async def chat_stream(self, messages, temperature=0.2):
+        """Async generator of completion text deltas; same rules as GroqClient.chat_stream.
+
+        The upstream SSE is read by a separate task into a queue, so the slot
+        and the latency budget (time to first token) don't depend on how fast
+        the consumer iterates. Closing the generator early cancels the read.
+        """
+        self.metrics.incr("calls")
+        if not await self._admit():
+            return
+
+        payload = {"model": self.model, "messages": messages, "temperature": temperature, "stream": True}
+        deltas = asyncio.Queue()
+        reader = asyncio.ensure_future(self._read_stream(payload, deltas))
+        try:
+            while True:
+                delta = await deltas.get()
+                if delta is None:
+                    return
+                yield delta
+        finally:
+            if not reader.done():
+                reader.cancel()
+
+    async def _read_stream(self, payload, deltas):
+        """Reader task of chat_stream: owns the slot and records the breaker outcome."""
+        started = time.perf_counter()
+        first_token_s = None
+        try:
+            async with self.session.stream("POST", self.url, json=payload) as res:
+                if res.status_code != 200:
+                    body = await res.aread()
+                    raise LLMError(f"non-200: {res.status_code} {body[:200].decode('utf-8', 'replace')}")
+                async for line in res.aiter_lines():
+                    delta = _stream_delta(line)
+                    if delta is None:
+                        break
+                    if delta:
+                        if first_token_s is None:
+                            first_token_s = time.perf_counter() - started
+                        deltas.put_nowait(delta)
+        except (self._httpx.HTTPError, LLMError) as e:
+            print(f"⚠️ GROQ stream failed: {e!r}")
+            self.metrics.incr("failures")
+            self.breaker.record_failure()
+        except BaseException:
+            # CancelledError when the consumer closed the generator: no outcome to record
+            self.breaker.release_probe()
+            raise
+        else:
+            self._record_success(time.perf_counter() - started if first_token_s is None else first_token_s)
+        finally:
+            self._slots.release()
+            self.metrics.observe(time.perf_counter() - started)
+            deltas.put_nowait(None)
+
+    async def aclose(self):
+        await self.session.aclose()
+
+    def close(self):
+        pass
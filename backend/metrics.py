@@ -0,0 +1,254 @@
+import contextvars
+import cProfile
+import io
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds (Prometheus `le` bounds)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Stage timings of the request being handled on this thread / task
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def _label_str(names, values):
+    if not names:
+        return ""
+    parts = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{name}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _fmt(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(n, "") for n in self.labelnames), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_label_str(self.labelnames, key)} {_fmt(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels (Prometheus semantics)."""
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[0][i] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(s[0]), s[1], s[2])) for k, s in self._series.items())
+        names = self.labelnames + ("le",)
+        for key, (counts, total, count) in items:
+            for bound, c in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_label_str(names, key + (repr(bound),))} {c}")
+            lines.append(f"{self.name}_bucket{_label_str(names, key + ('+Inf',))} {count}")
+            lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {total!r}")
+            lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {count}")
+        return lines
+
+
+class Callback:
+    """Metric sampled at scrape time; fn() returns [(labels_dict, value), ...]."""
+
+    def __init__(self, name, help, kind, fn):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.fn = fn
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            samples = self.fn()
+        except Exception as e:
+            return [f"# {self.name} unavailable: {e}"]
+        for labels, value in samples:
+            if value is None:
+                continue
+            names = tuple(labels)
+            lines.append(f"{self.name}{_label_str(names, tuple(labels[n] for n in names))} {_fmt(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name, help, fn, kind="gauge"):
+        return self._add(Callback(name, help, kind, fn))
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# ------------------------
+# Per-request stage timings
+# ------------------------
+def begin_request():
+    """Start collecting stage timings for the current request; returns the live list."""
+    timings = []
+    _request_timings.set(timings)
+    return timings
+
+
+def end_request():
+    """Stop collecting stage timings for the current request."""
+    _request_timings.set(None)
+
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    """executor.submit() that carries the caller's context, so worker stages reach its Server-Timing.
+
+    ThreadPoolExecutor does not copy contextvars; without this, stages timed
+    on a worker thread only feed the histogram.
+    """
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def server_timing_header(timings):
+    """Format stage timings as a Server-Timing header value (durations in ms)."""
+    totals = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ", ".join(f"{stage};dur={seconds * 1000.0:.2f}" for stage, seconds in totals.items())
+
+
+class StageTimers:
+    """stage(name) context manager feeding a histogram and the request's Server-Timing."""
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.histogram.observe(elapsed, stage=name)
+            timings = _request_timings.get()
+            if timings is not None:
+                timings.append((name, elapsed))
+
+
+# ------------------------
+# Sampling profiler
+# ------------------------
+class SamplingProfiler:
+    """Profile a random fraction of requests with cProfile and aggregate the stats.
+
+    The sample rate can be changed at runtime (0 disables it). Only one
+    request is profiled at a time, since cProfile cannot nest across threads
+    on every Python version.
+    """
+
+    def __init__(self, rate=0.0):
+        self.rate = float(rate)
+        self.sampled = 0
+        self._active = threading.Lock()
+        self._stats = None
+        self._stats_lock = threading.Lock()
+
+    def set_rate(self, rate, reset=False):
+        self.rate = min(1.0, max(0.0, float(rate)))
+        if reset:
+            with self._stats_lock:
+                self._stats = None
+                self.sampled = 0
+
+    def start(self):
+        """Return a running cProfile.Profile if this request is sampled, else None."""
+        if self.rate <= 0 or random.random() >= self.rate:
+            return None
+        if not self._active.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) is already active
+            self._active.release()
+            return None
+        return profile
+
+    def stop(self, profile):
+        if profile is None:
+            return
+        profile.disable()
+        self._active.release()
+        with self._stats_lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self.sampled += 1
+
+    def report(self, limit=40, sort="cumulative"):
+        """Text report of the aggregated samples, top `limit` functions."""
+        with self._stats_lock:
+            if self._stats is None:
+                return f"No samples yet (rate={self.rate})\n"
+            out = io.StringIO()
+            self._stats.stream = out
+            self._stats.sort_stats(sort).print_stats(limit)
+        return f"Sampled requests: {self.sampled} (rate={self.rate})\n" + out.getvalue()
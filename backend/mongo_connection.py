@@ -0,0 +1,200 @@
+"""
+Shared MongoDB client for the Flask app, MongoNativePipeline and the CLIs.
+
+MongoClient is thread-safe but not fork-safe, so a client created in a
+pre-fork gunicorn master (--preload, WARM_ON_START) must not be used by the
+workers. get_client() builds one pooled client per URI per *process*,
+lazily on first use: the owning pid is checked on every call and an
+os.register_at_fork hook drops inherited clients in the child.
+
+A background thread per process pings the server every
+MONGO_HEALTH_INTERVAL_S and records the outcome; after MONGO_HEALTH_FAILURES
+failed pings in a row the manager reports itself unhealthy (/health answers
+503). The client itself is kept: pymongo's monitor reconnects its pool on
+its own once the server is back, so replacing the client would only leak
+its sockets and monitor threads and break callers that cached it (e.g.
+MongoNativePipeline.coll during a long ingest).
+
+Pool size, timeouts and read preference come from the MONGO_* settings in
+.env.example; DB_NAME / COLLECTION_NAME are the one place the database and
+collection names are resolved. asgi_server.py builds its Motor client from
+the same client_options().
+"""
+
+import os
+import threading
+import time
+
+import certifi
+import pymongo
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+# Support both DB_NAME/COLLECTION_NAME and MONGO_DB_NAME/MONGO_COLLECTION (the server and every CLI read these)
+DB_NAME = os.getenv("DB_NAME") or os.getenv("MONGO_DB_NAME", "cinebot")
+COLLECTION_NAME = os.getenv("COLLECTION_NAME") or os.getenv("MONGO_COLLECTION", "movies_notebook")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))  # connections per process
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_MS = int(os.getenv("MONGO_MAX_IDLE_MS", "60000"))  # close pooled connections idle this long
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "0")) or None  # 0 = no timeout
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "0")) or None  # wait for a free connection
+MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primary")
+MONGO_HEALTH_INTERVAL_S = float(os.getenv("MONGO_HEALTH_INTERVAL_S", "30"))  # 0 disables the health thread
+MONGO_HEALTH_FAILURES = int(os.getenv("MONGO_HEALTH_FAILURES", "2"))
+
+
+def tls_required(uri):
+    """TLS only for Atlas (mongodb+srv) or when MONGO_TLS=true."""
+    return uri.startswith("mongodb+srv://") or os.getenv("MONGO_TLS", "").lower() == "true"
+
+
+def client_options(uri=None):
+    """Keyword arguments for MongoClient (and asgi_server.py's AsyncIOMotorClient) from the MONGO_* settings."""
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "readPreference": MONGO_READ_PREFERENCE,
+        "appname": "cinebot",
+    }
+    if tls_required(uri or MONGO_URI):
+        options.update(tls=True, tlsCAFile=certifi.where())
+    return options
+
+
+class ConnectionManager:
+    """One lazily created, health-checked MongoClient for a URI in the current process."""
+
+    def __init__(self, uri=None):
+        self.uri = uri or MONGO_URI
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._health_thread = None
+        self.connects = 0
+        self.failed_pings = 0
+        self.unhealthy_periods = 0
+        self.last_ping_ms = None
+        self.healthy = None
+
+    def client(self):
+        """This process's client, created on first use (and again after a fork)."""
+        client = self._client
+        if client is not None and self._pid == os.getpid():
+            return client
+        with self._lock:
+            if self._client is None or self._pid != os.getpid():
+                self._client = pymongo.MongoClient(self.uri, **client_options(self.uri))
+                self._pid = os.getpid()
+                self.connects += 1
+                self._start_health_thread()
+            return self._client
+
+    def collection(self, db_name, collection_name):
+        return self.client()[db_name][collection_name]
+
+    # ------------------------
+    def ping(self):
+        """Ping the server; returns True if it answered."""
+        started = time.perf_counter()
+        try:
+            self.client().admin.command("ping")
+        except Exception as e:
+            self.failed_pings += 1
+            print(f"⚠️ Mongo ping failed ({self.failed_pings} in a row): {e}")
+            return False
+        self.last_ping_ms = round((time.perf_counter() - started) * 1000, 2)
+        self.failed_pings = 0
+        return True
+
+    def health_check(self):
+        """Ping and record health: unhealthy after MONGO_HEALTH_FAILURES failed pings in a row.
+
+        Only the health state changes; the pooled client is kept and reconnects by itself.
+        """
+        healthy = self.ping() or self.failed_pings < MONGO_HEALTH_FAILURES
+        if self.healthy is not False and not healthy:
+            self.unhealthy_periods += 1
+            print(f"❌ Mongo unhealthy after {self.failed_pings} failed pings; waiting for the driver to reconnect")
+        elif self.healthy is False and healthy:
+            print("✅ Mongo reachable again")
+        self.healthy = healthy
+        return healthy
+
+    def _start_health_thread(self):
+        if MONGO_HEALTH_INTERVAL_S <= 0:
+            return
+        if self._health_thread is not None and self._health_thread.is_alive():
+            return
+
+        def loop():
+            while True:
+                time.sleep(MONGO_HEALTH_INTERVAL_S)
+                if self._pid == os.getpid() and self._client is not None:
+                    self.health_check()
+
+        self._health_thread = threading.Thread(target=loop, name="mongo-health", daemon=True)
+        self._health_thread.start()
+
+    def _forget(self):
+        """Drop the inherited client in a forked child without closing the parent's sockets."""
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._health_thread = None
+        self.connects = self.failed_pings = self.unhealthy_periods = 0
+        self.healthy = None
+
+    def close(self):
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+
+    def stats(self):
+        return {
+            "pid": self._pid,
+            "connected": self._client is not None and self._pid == os.getpid(),
+            "connects": self.connects,
+            "healthy": self.healthy,
+            "consecutive_failed_pings": self.failed_pings,
+            "unhealthy_periods": self.unhealthy_periods,
+            "last_ping_ms": self.last_ping_ms,
+            "max_pool_size": MONGO_MAX_POOL_SIZE,
+            "read_preference": MONGO_READ_PREFERENCE,
+        }
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_manager(uri=None):
+    """The process-wide ConnectionManager for a URI."""
+    uri = uri or MONGO_URI
+    manager = _managers.get(uri)
+    if manager is None:
+        with _managers_lock:
+            manager = _managers.setdefault(uri, ConnectionManager(uri))
+    return manager
+
+
+def get_client(uri=None):
+    """Shared pooled MongoClient for a URI in this process."""
+    return get_manager(uri).client()
+
+
+def _after_fork_in_child():
+    global _managers_lock
+    _managers_lock = threading.Lock()
+    for manager in _managers.values():
+        manager._forget()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -1,24 +1,100 @@
-import os
+import ast
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from pymongo import MongoClient
-from sentence_transformers import SentenceTransformer
-import certifi
+from pymongo import ReplaceOne, UpdateOne
+
+from attribute_index import FILTER_FIELDS, filters_from_row_checker
+from compact_embeddings import CompactVectorIndex, attach_float_embedding, compact_fields
+from embedding_providers import make_provider, model_tag
+from lexical_index import TEXT_INDEX_NAME, ensure_text_index
+from mongo_connection import get_client
+from neighbors import NeighborTable, compute_neighbors
+from parallel_encoder import ParallelEncoder
+from snapshot import METADATA_COLUMNS, SnapshotWriter, iter_snapshot, load_snapshot
+from vector_index import LocalVectorIndex, rerank_results
+
+
+def parse_list(cell):
+    """Parse a list-like CSV cell ("['a', 'b']" or "a, b") into a Python list."""
+    if cell is None or cell == "":
+        return []
+    if isinstance(cell, list):
+        return cell
+    if isinstance(cell, float) and np.isnan(cell):
+        return []
+    if isinstance(cell, (int, float)):
+        return [str(cell)]
+    if isinstance(cell, str):
+        try:
+            value = ast.literal_eval(cell)
+            return list(value) if isinstance(value, (list, tuple)) else [str(value)]
+        except (ValueError, SyntaxError):
+            return cell.split(", ")
+    return [str(cell)]
+
+
+def content_hash(text):
+    """Stable hash of the text that gets embedded (used for incremental re-embeds)."""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def _clean_value(value):
+    """Convert NaN/NumPy scalars from pandas rows into BSON-friendly values."""
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
 
 class MongoNativePipeline:
     def __init__(self, mongo_uri=None, db_name='cinebot', collection_name='movies_notebook'):
-        self.client = MongoClient(mongo_uri or os.getenv("MONGO_URI", "mongodb://localhost:27017"),
-                                  tls=True, tlsCAFile=certifi.where())
+        # Shared per-process pool (the Flask app reuses the same client); TLS only where the URI needs it
+        self.client = get_client(mongo_uri)
         self.db = self.client[db_name]
         self.coll = self.db[collection_name]
         self.model = None
+        self.model_name = None
+        self.provider = None
+        self.model_version = None
+        self.encoder = None  # ParallelEncoder once enable_parallel_encode() is called
+        self.compact = None  # None, "int8", "binary" or "both": extra BSON vector fields per document
+        self.store_float = True  # False drops the float `embedding` list (local compact index only)
+        # Filters go in $vectorSearch.filter (create_vector_index declares the fields); an older index without
+        # filter fields is detected on the first rejected query and post-filtering is used from then on
+        self.prefilter = True
         self.index_name = "movie_vector_index"  # match notebook
 
     # ------------------------
-    def load_embedding_model(self, model_name="sentence-transformers/all-MiniLM-L6-v2"):
-        print(f"🔄 Loading embedding model: {model_name}")
-        self.model = SentenceTransformer(model_name)
+    def load_embedding_model(self, model_name="sentence-transformers/all-MiniLM-L6-v2", version=None,
+                             provider="local"):
+        """Load the encoder; model_version (name[@version][+int8]) is stamped on every document.
+
+        `provider` selects the backend from embedding_providers (local, torch-int8,
+        onnx, onnx-int8, huggingface); use the same one the server queries with.
+        """
+        print(f"🔄 Loading embedding model: {model_name} ({provider})")
+        self.model = make_provider(provider, model_name)
+        self.model_name = model_name
+        self.provider = provider
+        self.model_version = model_tag(model_name, version, provider)
         print("✅ Model loaded successfully")
 
+    def enable_parallel_encode(self, workers=None, threads_per_worker=None):
+        """Route embed_batch / embed_stream through a process pool with one model copy per worker."""
+        if not self.model:
+            raise RuntimeError("❌ Model not loaded. Run load_embedding_model() first.")
+        self.close_parallel_encode()
+        self.encoder = ParallelEncoder(self.provider, self.model_name, workers, threads_per_worker).start()
+        return self.encoder
+
+    def close_parallel_encode(self):
+        if self.encoder is not None:
+            self.encoder.close()
+            self.encoder = None
+
     # ------------------------
     def embed(self, text: str):
         if not text.strip():
@@ -27,12 +103,296 @@ class MongoNativePipeline:
         return vec.tolist() if hasattr(vec, "tolist") else vec
 
     # ------------------------
-    def search_similar(self, query_text, top_k=10, filters=None, top_k_raw=200):
-        """Run MongoDB-native $vectorSearch with optional filters."""
+    def embed_batch(self, texts, batch_size=64):
+        """Encode a list of texts in batches; returns a float32 (n, dim) array."""
+        if not self.model:
+            raise RuntimeError("❌ Model not loaded. Run load_embedding_model() first.")
+        if self.encoder is not None:
+            return self.encoder.encode(texts, batch_size=batch_size)
+        vecs = self.model.encode(list(texts), batch_size=batch_size, show_progress_bar=False)
+        return np.asarray(vecs, dtype=np.float32)
+
+    def embed_stream(self, items, batch_size=64):
+        """Yield (key, float32 vectors) for (key, texts) items in order.
+
+        With parallel encode on, later batches are encoded while earlier
+        results are being written.
+        """
+        if self.encoder is not None:
+            yield from self.encoder.map_ordered(items, batch_size=batch_size)
+            return
+        for key, texts in items:
+            yield key, self.embed_batch(texts, batch_size=batch_size) if texts else np.zeros((0, 0), np.float32)
+
+    # ------------------------
+    def build_doc(self, row, embedding, text_col="description", id_col="id"):
+        """Build the Mongo document for one cleaned-CSV row (dict-like).
+
+        With `compact` set, int8 / sign-bit BSON vectors are added; with
+        store_float off, the float `embedding` list is omitted.
+        """
+        movie_id = str(row[id_col])
+        text = str(_clean_value(row.get(text_col)) or "")
+        doc = {
+            "_id": movie_id,
+            "id": movie_id,
+            "title": _clean_value(row.get("title")),
+            "year": _clean_value(row.get("year")),
+            "rating": _clean_value(row.get("rating")),
+            "duration": _clean_value(row.get("duration")),
+            "description": text,
+            "embedding": embedding,
+            "embedding_hash": content_hash(text),
+            "embedding_model": self.model_version,
+            "genres": parse_list(row.get("genres")),
+            "languages": parse_list(row.get("languages")),
+            "directors": parse_list(row.get("directors")),
+            "stars": parse_list(row.get("stars")),
+        }
+        if self.compact and embedding is not None:
+            doc.update(compact_fields(embedding, self.compact))
+            if not self.store_float:
+                del doc["embedding"]
+        return doc
+
+    def bulk_upsert(self, docs, coll=None):
+        """ReplaceOne-upsert a batch of documents keyed on _id."""
+        if not docs:
+            return 0
+        coll = coll if coll is not None else self.coll
+        ops = [ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in docs]
+        result = coll.bulk_write(ops, ordered=False)
+        return result.upserted_count + result.modified_count
+
+    # ------------------------
+    def select_changed(self, records, text_col="description", id_col="id"):
+        """Return the subset of records whose text or model differs from what is stored.
+
+        Uses one projected $in query per call instead of a lookup per row.
+        """
+        if not records:
+            return []
+        ids = [str(r[id_col]) for r in records]
+        stored = {
+            d["_id"]: (d.get("embedding_hash"), d.get("embedding_model"))
+            for d in self.coll.find({"_id": {"$in": ids}}, {"embedding_hash": 1, "embedding_model": 1})
+        }
+        changed = []
+        for movie_id, r in zip(ids, records):
+            text = str(_clean_value(r.get(text_col)) or "")
+            if stored.get(movie_id) != (content_hash(text), self.model_version):
+                changed.append(r)
+        return changed
+
+    def needs_model_migration(self):
+        """True if any stored document was embedded with a different model version."""
+        return self.coll.find_one(
+            {
+                "$or": [{f: {"$exists": True}} for f in ("embedding", "embedding_int8", "embedding_bits")],
+                "embedding_model": {"$ne": self.model_version},
+            },
+            {"_id": 1},
+        ) is not None
+
+    def shadow_collection(self):
+        """Collection used to stage a full re-embed before cutover."""
+        return self.db[f"{self.coll.name}__reembed"]
+
+    def cutover_shadow(self, dim=None, index_timeout=600):
+        """Replace the live collection with the fully indexed shadow one.
+
+        Indexes belong to a collection and renameCollection with dropTarget
+        drops the live one's, so the shadow first gets the live regular and
+        $text indexes plus the vector index, and the rename waits until that
+        index is queryable. The rename itself is a single server-side
+        operation: readers see either the old or the new embeddings.
+        """
+        shadow = self.shadow_collection()
+        if shadow.estimated_document_count() == 0:
+            raise RuntimeError("❌ Shadow collection is empty; refusing to cut over")
+        self.copy_indexes(self.coll, shadow)
+        if dim:
+            self.create_vector_index(dim=dim, coll=shadow)
+            if self.wait_for_vector_index(shadow, timeout=index_timeout) is False:
+                raise RuntimeError(f"❌ Vector index on {shadow.full_name} not queryable after {index_timeout}s; "
+                                   f"{self.coll.full_name} left untouched")
+        shadow.rename(self.coll.name, dropTarget=True)
+        self.coll = self.db[self.coll.name]
+        print(f"✅ Cut over {self.coll.full_name} to {self.model_version}")
+
+    @staticmethod
+    def copy_indexes(source, target):
+        """Recreate source's regular indexes (and its $text index) on target."""
+        for name, info in source.index_information().items():
+            if name == "_id_":
+                continue
+            if name == TEXT_INDEX_NAME or any(kind == "text" for _, kind in info["key"]):
+                ensure_text_index(target)
+                continue
+            options = {k: v for k, v in info.items() if k not in ("key", "v", "ns")}
+            target.create_index(list(info["key"]), name=name, **options)
+
+    # ------------------------
+    def build_neighbors(self, k=20, output=None, store_on_docs=False, block_rows=1024, workers=None,
+                        snapshot=None):
+        """Compute every movie's top-k neighbours from the stored embeddings (see neighbors.py).
+
+        Saves a memory-mapped NeighborTable to `output` and/or $sets
+        `neighbors` / `neighbor_scores` on each document. With a snapshot
+        directory the vectors are read from it instead of the collection.
+        """
+        if snapshot:
+            _, vectors, docs = load_snapshot(snapshot, columns=("id",))
+            ids = [d["id"] for d in docs]
+        else:
+            index = LocalVectorIndex.from_collection(self.coll)
+            if not len(index):
+                # Float vectors dropped at ingest (--drop-float): use the int8 codes
+                index = CompactVectorIndex.from_collection(self.coll, mode="int8")
+            vectors, ids = index.row_vectors(np.arange(len(index))), index.ids
+        started = time.perf_counter()
+        rows, sims = compute_neighbors(vectors, k=k, block_rows=block_rows, workers=workers)
+        table = NeighborTable(ids, rows, sims)
+        print(f"✅ Neighbors: {len(table)} movies x {table.k} in {time.perf_counter() - started:.1f}s")
+        if output:
+            table.save(output, source=self.coll.full_name)
+            print(f"✅ Neighbor table saved to {output}")
+        if store_on_docs:
+            print(f"✅ Neighbors stored on {self.store_neighbors(table)} documents")
+        return table
+
+    def store_neighbors(self, table, batch_size=1000):
+        """$set neighbors / neighbor_scores on each document from a NeighborTable."""
+        updated, ops = 0, []
+        for movie_id in table.ids:
+            hits = table.lookup(movie_id)
+            ops.append(UpdateOne({"id": movie_id}, {"$set": {
+                "neighbors": [n for n, _ in hits],
+                "neighbor_scores": [round(score, 4) for _, score in hits],
+            }}))
+            if len(ops) >= batch_size:
+                updated += self.coll.bulk_write(ops, ordered=False).modified_count
+                ops = []
+        if ops:
+            updated += self.coll.bulk_write(ops, ordered=False).modified_count
+        return updated
+
+    # ------------------------
+    def export_snapshot(self, path, version=None, batch_size=2000):
+        """Write the collection as a snapshot directory (see snapshot.py); returns the manifest."""
+        query = {"$or": [{"embedding": {"$exists": True}}, {"embedding_int8": {"$exists": True}}]}
+        projection = {"_id": 0, "embedding": 1, "embedding_int8": 1, **{c: 1 for c in METADATA_COLUMNS}}
+        started = time.perf_counter()
+        writer = SnapshotWriter(path, self.coll.count_documents(query))
+        docs, vectors = [], []
+        for doc in self.coll.find(query, projection, batch_size=batch_size):
+            vec = attach_float_embedding(doc).pop("embedding", None)
+            if not vec:
+                continue
+            docs.append(doc)
+            vectors.append(vec)
+            if len(docs) >= batch_size:
+                writer.add(docs, vectors)
+                docs, vectors = [], []
+        writer.add(docs, vectors)
+        manifest = writer.close(version=version, source=self.coll.full_name)
+        print(f"✅ Snapshot {manifest['version']}: {manifest['count']} movies, dim={manifest['dim']} "
+              f"in {time.perf_counter() - started:.1f}s -> {path}")
+        return manifest
+
+    def import_snapshot(self, path, coll=None, drop=False, batch_size=1000):
+        """Bulk-restore a snapshot into `coll` (default: this pipeline's collection); returns the count."""
+        coll = coll if coll is not None else self.coll
+        if drop:
+            coll.drop()
+        started = time.perf_counter()
+        written = 0
+        for docs, vectors in iter_snapshot(path, batch_size=batch_size):
+            batch = []
+            for doc, vec in zip(docs, vectors):
+                doc = {k: v for k, v in doc.items() if v is not None}
+                doc.update(_id=doc["id"], embedding=vec.tolist())
+                if self.compact:
+                    doc.update(compact_fields(doc["embedding"], self.compact))
+                    if not self.store_float:
+                        del doc["embedding"]
+                batch.append(doc)
+            written += self.bulk_upsert(batch, coll=coll)
+        print(f"✅ Restored {written} movies into {coll.full_name} in {time.perf_counter() - started:.1f}s")
+        return written
+
+    # ------------------------
+    def create_vector_index(self, dim=384, coll=None):
+        """Create the Atlas Vector Search index on coll (default: the live one); no-op if it exists.
+
+        FILTER_FIELDS are declared as filter fields so search_similar and
+        /search can pre-filter inside $vectorSearch.
+        """
+        from pymongo.errors import OperationFailure
+
+        coll = coll if coll is not None else self.coll
+        index_definition = {
+            "name": self.index_name,
+            "type": "vectorSearch",
+            "definition": {
+                "fields": [
+                    {"type": "vector", "path": "embedding", "numDimensions": dim, "similarity": "cosine"}
+                ] + [{"type": "filter", "path": f} for f in FILTER_FIELDS]
+            },
+        }
+        try:
+            result = coll.database.command("createSearchIndexes", coll.name, indexes=[index_definition])
+            print("✅ Vector search index created successfully:", result)
+        except OperationFailure as e:
+            if "already exists" in str(e):
+                print("ℹ️ Vector index already exists — skipping.")
+            else:
+                print(f"⚠️ Could not create vector index: {e}")
+
+    def wait_for_vector_index(self, coll=None, timeout=600, poll_s=5):
+        """Block until the vector index reports queryable.
+
+        True when ready, False on timeout, None when the server has no search
+        indexes at all (local mongod: nothing to wait for).
+        """
+        from pymongo.errors import OperationFailure
+
+        coll = coll if coll is not None else self.coll
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                indexes = list(coll.list_search_indexes(self.index_name))
+            except OperationFailure as e:
+                print(f"ℹ️ Search indexes not supported here, not waiting: {e}")
+                return None
+            if indexes and indexes[0].get("queryable"):
+                print(f"✅ Vector index on {coll.full_name} is queryable")
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(poll_s)
+
+    # ------------------------
+    def search_similar(self, query_text, top_k=10, filters=None, top_k_raw=200,
+                       negative_query=None, negative_weight=0.5):
+        """Run MongoDB-native $vectorSearch with optional row_checker-style filters.
+
+        If negative_query is given, the candidates are re-ranked by
+        pos_sim - negative_weight * neg_sim before top_k is applied.
+        """
         if not self.model:
             raise RuntimeError("❌ Model not loaded. Run load_embedding_model() first.")
 
-        query_vector = self.embed(query_text)
+        negative_vector = None
+        if negative_query and negative_query.strip():
+            # Encode both queries in a single forward pass
+            vecs = self.model.encode([query_text, negative_query])
+            query_vector, negative_vector = vecs[0].tolist(), vecs[1].tolist()
+        else:
+            query_vector = self.embed(query_text)
+        return self._vector_search(query_vector, negative_vector, top_k, filters, top_k_raw, negative_weight)
+
+    def _search_pipeline(self, query_vector, filters, top_k_raw):
         pipeline = [
             {
                 "$vectorSearch": {
@@ -46,43 +406,12 @@ class MongoNativePipeline:
         ]
 
         # ---------- FILTER STAGE ----------
-        if filters:
-            match_conditions = []
-
-            if "min_year" in filters or "max_year" in filters:
-                cond = {}
-                if filters.get("min_year") is not None:
-                    cond["$gte"] = filters["min_year"]
-                if filters.get("max_year") is not None:
-                    cond["$lte"] = filters["max_year"]
-                match_conditions.append({"year": cond})
-
-            if "min_rating" in filters or "max_rating" in filters:
-                cond = {}
-                if filters.get("min_rating") is not None:
-                    cond["$gte"] = filters["min_rating"]
-                if filters.get("max_rating") is not None:
-                    cond["$lte"] = filters["max_rating"]
-                match_conditions.append({"rating": cond})
-
-            if filters.get("required_genres"):
-                match_conditions.append({"genres": {"$in": filters["required_genres"]}})
-            if filters.get("excluded_genres"):
-                match_conditions.append({"genres": {"$nin": filters["excluded_genres"]}})
-            if filters.get("required_languages"):
-                match_conditions.append({"languages": {"$in": filters["required_languages"]}})
-            if filters.get("excluded_languages"):
-                match_conditions.append({"languages": {"$nin": filters["excluded_languages"]}})
-            if "min_duration" in filters or "max_duration" in filters:
-                cond = {}
-                if filters.get("min_duration") is not None:
-                    cond["$gte"] = filters["min_duration"]
-                if filters.get("max_duration") is not None:
-                    cond["$lte"] = filters["max_duration"]
-                match_conditions.append({"duration": cond})
-
-            if match_conditions:
-                pipeline.append({"$match": {"$and": match_conditions}})
+        # Indexed clauses filter inside $vectorSearch so selective filters still fill top_k
+        match = filters_from_row_checker(filters)
+        if match and self.prefilter:
+            pipeline[0]["$vectorSearch"]["filter"] = match
+        elif match:
+            pipeline.append({"$match": match})
 
         # ---------- PROJECTION ----------
         pipeline.append({
@@ -96,9 +425,67 @@ class MongoNativePipeline:
                 "duration": 1,
                 "description": 1,
                 "score": {"$meta": "vectorSearchScore"},
-                "embedding": 1
+                # The int8 BSON vector is ~12x smaller on the wire than the float list
+                **({"embedding_int8": 1} if self.compact in ("int8", "both") else {"embedding": 1}),
             }
         })
+        return pipeline
 
-        results = list(self.coll.aggregate(pipeline))
+    def _vector_search(self, query_vector, negative_vector, top_k, filters, top_k_raw, negative_weight):
+        from pymongo.errors import OperationFailure
+
+        try:
+            results = list(self.coll.aggregate(self._search_pipeline(query_vector, filters, top_k_raw)))
+        except OperationFailure as e:
+            # The notebook's movie_vector_index has only the vector field: Atlas says a path "needs to be indexed"
+            if not (self.prefilter and "needs to be indexed" in str(e)):
+                raise
+            print(f"⚠️ {self.index_name} has no filter fields, using post-filtering: {e}")
+            self.prefilter = False
+            results = list(self.coll.aggregate(self._search_pipeline(query_vector, filters, top_k_raw)))
+        if self.compact in ("int8", "both"):
+            results = [attach_float_embedding(r) for r in results]
+        if negative_vector is not None:
+            return rerank_results(results, query_vector, negative_vector, negative_weight,
+                                  limit=top_k, keep_embedding=True)
         return results[:top_k]
+
+    # ------------------------
+    def search_many(self, queries, top_k_raw=200, negative_weight=0.5, index=None, max_workers=8):
+        """Run several searches with one encode call; returns [{"results", "took_ms"}] in query order.
+
+        Each query is a string or a dict with query_text, negative_query,
+        filters (row_checker) and top_k. With a LocalVectorIndex as `index`
+        the queries are scored against it in one matrix product; otherwise
+        the $vectorSearch aggregates run concurrently on a thread pool.
+        """
+        if not self.model:
+            raise RuntimeError("❌ Model not loaded. Run load_embedding_model() first.")
+        queries = [{"query_text": q} if isinstance(q, str) else q for q in queries]
+        if not queries:
+            return []
+
+        # Positive and negative texts of every query in a single forward pass
+        texts = [q.get("query_text", "") for q in queries]
+        negatives = [i for i, q in enumerate(queries) if (q.get("negative_query") or "").strip()]
+        vecs = self.embed_batch(texts + [queries[i]["negative_query"] for i in negatives])
+        query_vectors = [v.tolist() for v in vecs[:len(queries)]]
+        negative_vectors = [None] * len(queries)
+        for i, vec in zip(negatives, vecs[len(queries):]):
+            negative_vectors[i] = vec.tolist()
+        limits = [int(q.get("top_k", 10)) for q in queries]
+
+        if index is not None:
+            batched = index.search_many(query_vectors, limits, top_k_raw,
+                                        [filters_from_row_checker(q.get("filters")) for q in queries],
+                                        negative_vectors, negative_weight)
+            return [{"results": results, "took_ms": round(ms, 2)} for results, ms in batched]
+
+        def run(i):
+            started = time.perf_counter()
+            results = self._vector_search(query_vectors[i], negative_vectors[i], limits[i],
+                                          queries[i].get("filters"), top_k_raw, negative_weight)
+            return {"results": results, "took_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(queries)))) as pool:
+            return list(pool.map(run, range(len(queries))))
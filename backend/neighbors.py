@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Precomputed "more like this" neighbours for /similar/<id>.
+
+compute_neighbors() finds every movie's top-K cosine neighbours from the
+stored embeddings with blocked matrix products: each worker thread takes a
+block of rows and walks the catalogue in column blocks, merging a running
+top-K, so memory stays at block_rows x col_block floats per worker however
+large the catalogue is (NumPy's matmul releases the GIL).
+
+NeighborTable keeps the result as an (n, K) int32 row table plus float16
+scores, saved as .npy and memory-mapped on load, so a lookup is a dict hit
+and one row read with no model inference. MongoNativePipeline.build_neighbors
+runs the job and can also write the lists onto the documents
+(`neighbors`, `neighbor_scores`).
+
+Usage:
+    python backend/neighbors.py build --k 20
+    python backend/neighbors.py build --k 20 --store-on-docs
+    python backend/neighbors.py build --k 20 --snapshot snapshots/movies-v1
+    python backend/neighbors.py show tt0111161
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+DEFAULT_NEIGHBORS_DIR = "models/neighbors"
+
+
+def _block_neighbors(matrix, start, stop, k, col_block):
+    """Top-k (rows, cosines) for matrix[start:stop] against the whole matrix, excluding self."""
+    block = matrix[start:stop]
+    best_rows = np.full((len(block), k), -1, dtype=np.int64)
+    best_sims = np.full((len(block), k), -np.inf, dtype=np.float32)
+    for col in range(0, len(matrix), col_block):
+        sims = block @ matrix[col:col + col_block].T
+        # A movie is not its own neighbour
+        own = np.arange(max(start, col), min(stop, col + sims.shape[1]))
+        sims[own - start, own - col] = -np.inf
+
+        cand_sims = np.concatenate([best_sims, sims], axis=1)
+        cand_rows = np.concatenate([best_rows, np.broadcast_to(np.arange(col, col + sims.shape[1]), sims.shape)],
+                                   axis=1)
+        part = np.argpartition(-cand_sims, k - 1, axis=1)[:, :k]
+        best_sims = np.take_along_axis(cand_sims, part, axis=1)
+        best_rows = np.take_along_axis(cand_rows, part, axis=1)
+
+    order = np.argsort(-best_sims, axis=1, kind="stable")
+    return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_sims, order, axis=1)
+
+
+def compute_neighbors(vectors, k=20, block_rows=1024, col_block=16384, workers=None):
+    """(rows int32 (n, k), cosines float32 (n, k)) of every vector's k nearest others, best first."""
+    matrix = np.array(vectors, dtype=np.float32)
+    n = len(matrix)
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.zeros((n, 0), dtype=np.int32), np.zeros((n, 0), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+
+    rows = np.empty((n, k), dtype=np.int32)
+    sims = np.empty((n, k), dtype=np.float32)
+
+    def run(start):
+        stop = min(start + block_rows, n)
+        rows[start:stop], sims[start:stop] = _block_neighbors(matrix, start, stop, k, col_block)
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        list(pool.map(run, range(0, n, block_rows)))
+    return rows, sims
+
+
+# ------------------------
+class NeighborTable:
+    """Movie id -> its precomputed neighbours (ids and vectorSearchScore-scale scores)."""
+
+    def __init__(self, ids, rows, sims):
+        self.ids = [str(i) for i in ids]
+        self.rows = rows
+        self.sims = sims
+        self._row_of = {movie_id: row for row, movie_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def k(self):
+        return self.rows.shape[1] if self.rows.ndim == 2 else 0
+
+    def save(self, path, source=None):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "rows.npy"), np.asarray(self.rows, dtype=np.int32))
+        np.save(os.path.join(path, "sims.npy"), np.asarray(self.sims, dtype=np.float16))
+        with open(os.path.join(path, "ids.json"), "w", encoding="utf-8") as f:
+            json.dump(self.ids, f)
+        manifest = {"movies": len(self.ids), "k": self.k, "source": source, "built_at": time.time()}
+        with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load a saved table; the (n, k) arrays stay on disk (mmap) unless mmap=False."""
+        mode = "r" if mmap else None
+        with open(os.path.join(path, "ids.json"), "r", encoding="utf-8") as f:
+            ids = json.load(f)
+        return cls(ids, np.load(os.path.join(path, "rows.npy"), mmap_mode=mode),
+                   np.load(os.path.join(path, "sims.npy"), mmap_mode=mode))
+
+    def lookup(self, movie_id, limit=None):
+        """[(neighbour_id, score)] best first, or None for an unknown id.
+
+        Scores use the (1 + cos) / 2 scale of vectorSearchScore.
+        """
+        row = self._row_of.get(str(movie_id))
+        if row is None:
+            return None
+        limit = self.k if limit is None else min(limit, self.k)
+        return [(self.ids[r], (1.0 + float(s)) / 2.0)
+                for r, s in zip(self.rows[row, :limit], self.sims[row, :limit]) if r >= 0]
+
+
+def load_neighbor_table(path):
+    """Load a saved NeighborTable and log the load time."""
+    started = time.perf_counter()
+    table = NeighborTable.load(path)
+    elapsed = time.perf_counter() - started
+    print(f"✅ Neighbor table loaded: {len(table)} movies x {table.k} in {elapsed:.2f}s")
+    return table
+
+
+# ------------------------
+def main(argv=None):
+    from mongo_connection import COLLECTION_NAME, DB_NAME
+
+    parser = argparse.ArgumentParser(description="Build and query the precomputed neighbour table.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Compute top-K neighbours from the stored embeddings")
+    build.add_argument("--k", type=int, default=20)
+    build.add_argument("--output", default=os.getenv("NEIGHBORS_DIR", DEFAULT_NEIGHBORS_DIR))
+    build.add_argument("--store-on-docs", action="store_true", help="Also $set neighbors on each document")
+    build.add_argument("--block-rows", type=int, default=1024, help="Rows per matrix-product block")
+    build.add_argument("--workers", type=int, default=None, help="Threads (default: all cores)")
+    build.add_argument("--snapshot", default=None, help="Read vectors from a snapshot (backend/snapshot.py)")
+    build.add_argument("--mongo-uri", default=None)
+    build.add_argument("--db", default=DB_NAME)
+    build.add_argument("--collection", default=COLLECTION_NAME)
+    show = sub.add_parser("show", help="Print a movie's neighbours from a saved table")
+    show.add_argument("movie_id")
+    show.add_argument("--index", default=os.getenv("NEIGHBORS_DIR", DEFAULT_NEIGHBORS_DIR))
+    show.add_argument("-k", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    if args.command == "show":
+        hits = load_neighbor_table(args.index).lookup(args.movie_id, args.k)
+        if hits is None:
+            print(f"❌ {args.movie_id} is not in the table")
+            return 1
+        for movie_id, score in hits:
+            print(f"{score:.4f}  {movie_id}")
+        return 0
+
+    from mongo_pipeline import MongoNativePipeline
+
+    pipeline = MongoNativePipeline(args.mongo_uri, db_name=args.db, collection_name=args.collection)
+    pipeline.build_neighbors(k=args.k, output=args.output, store_on_docs=args.store_on_docs,
+                             block_rows=args.block_rows, workers=args.workers, snapshot=args.snapshot)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
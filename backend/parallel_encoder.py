@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Multi-process embedding for large catalogue builds.
+
+ParallelEncoder starts a spawn-context process pool. Each worker pins
+OMP/MKL/torch threads to threads_per_worker before loading its own copy of
+the provider (a SentenceTransformer for "local"), so workers x threads
+stays at the core count instead of every process grabbing every core.
+
+Each batch of texts is sorted by length and cut into contiguous shards, so
+every worker pads to a similar sequence length, and the vectors are
+scattered back into input order. map_ordered() keeps a few batches in
+flight and yields them in submission order, which is what ingest.py's
+BulkWriter (and its checkpoint) expects.
+
+MongoNativePipeline.enable_parallel_encode() / ingest.py --workers use it.
+
+Scaling report (rows/s as workers are added):
+    python backend/parallel_encoder.py --workers 1,2,4,8 --rows 20000
+    python backend/parallel_encoder.py --csv cleaned_database/cleaned_final_dataset3.csv --workers 1,2,4
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from embedding_providers import DEFAULT_MODEL, PROVIDERS, is_remote, make_provider
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+_worker_model = None
+
+
+def _init_worker(provider, model_name, threads, ready, failed):
+    """Pool initializer: pin thread counts, then load this worker's model."""
+    global _worker_model
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+    # The pool already gives us the parallelism; HF tokenizers' own threads would oversubscribe
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    try:
+        _worker_model = make_provider(provider, model_name, threads=threads)
+    except Exception:
+        # Pool would respawn the worker forever; let start() see the failure and give up
+        with failed.get_lock():
+            failed.value += 1
+        raise
+    with ready.get_lock():
+        ready.value += 1
+
+
+def _encode_shard(texts, batch_size):
+    vecs = _worker_model.encode(texts, batch_size=batch_size, show_progress_bar=False)
+    return np.asarray(vecs, dtype=np.float32)
+
+
+class _Job:
+    """Pending shards of one submitted batch; result() reassembles them in input order."""
+
+    def __init__(self, n, shards):
+        self.n = n
+        self.shards = shards  # [(input positions, AsyncResult)]
+
+    def result(self):
+        out = None
+        for idx, pending in self.shards:
+            vecs = pending.get()
+            if out is None:
+                out = np.empty((self.n, vecs.shape[1]), dtype=np.float32)
+            out[idx] = vecs
+        return out if out is not None else np.zeros((0, 0), dtype=np.float32)
+
+
+class ParallelEncoder:
+    """Process pool of encoders, one model copy per worker."""
+
+    def __init__(self, provider="local", model_name=DEFAULT_MODEL, workers=None, threads_per_worker=None,
+                 prefetch=4):
+        if is_remote(provider):
+            raise ValueError(f"Parallel encoding needs a local provider, not {provider}")
+        cores = os.cpu_count() or 1
+        self.provider = provider
+        self.model_name = model_name
+        self.workers = max(1, int(workers or cores))
+        self.threads = max(1, int(threads_per_worker or cores // self.workers))
+        self.prefetch = max(1, int(prefetch))
+        self.load_s = None
+        self._pool = None
+
+    def start(self, timeout=600):
+        """Start the workers and wait until every one has loaded its model."""
+        if self._pool is not None:
+            return self
+        started = time.perf_counter()
+        # spawn, not fork: torch and tokenizers are not fork-safe once initialised in the parent
+        ctx = multiprocessing.get_context("spawn")
+        ready, failed = ctx.Value("i", 0), ctx.Value("i", 0)
+        self._pool = ctx.Pool(self.workers, initializer=_init_worker,
+                              initargs=(self.provider, self.model_name, self.threads, ready, failed))
+        while ready.value < self.workers:
+            if failed.value or time.perf_counter() - started > timeout:
+                self._pool.terminate()
+                self._pool = None
+                reason = "failed to load the model" if failed.value else f"not ready after {timeout}s"
+                raise RuntimeError(f"❌ Encoder workers {reason} ({self.provider}, {self.model_name})")
+            time.sleep(0.05)
+        self.load_s = time.perf_counter() - started
+        print(f"✅ {self.workers} encoder workers x {self.threads} threads ready in {self.load_s:.1f}s")
+        return self
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------
+    def submit(self, texts, batch_size=64):
+        """Queue one batch; returns a job whose result() is the float32 (n, dim) array."""
+        self.start()
+        texts = list(texts)
+        if not texts:
+            return _Job(0, [])
+        # Longest first, so the slowest shards start earliest; neighbours have similar lengths
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        shard = max(batch_size, math.ceil(len(texts) / self.workers))
+        shard = math.ceil(shard / batch_size) * batch_size
+        shards = []
+        for start in range(0, len(texts), shard):
+            idx = order[start:start + shard]
+            shards.append((idx, self._pool.apply_async(_encode_shard, ([texts[i] for i in idx], batch_size))))
+        return _Job(len(texts), shards)
+
+    def encode(self, texts, batch_size=64):
+        return self.submit(texts, batch_size).result()
+
+    def map_ordered(self, items, batch_size=64):
+        """Yield (key, vectors) for (key, texts) items in order, with up to `prefetch` batches in flight."""
+        pending = deque()
+        for key, texts in items:
+            pending.append((key, self.submit(texts, batch_size)))
+            if len(pending) > self.prefetch:
+                done_key, job = pending.popleft()
+                yield done_key, job.result()
+        while pending:
+            done_key, job = pending.popleft()
+            yield done_key, job.result()
+
+
+# ------------------------
+def load_texts(csv_path, text_col, rows):
+    if not csv_path:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+        from corpus import make_movies
+
+        return [m["description"] for m in make_movies(rows)]
+    from ingest import iter_record_chunks
+
+    texts = []
+    for records in iter_record_chunks(csv_path, min(rows, 4096)):
+        texts.extend(str(r.get(text_col)) if isinstance(r.get(text_col), str) else "" for r in records)
+        if len(texts) >= rows:
+            break
+    return texts[:rows]
+
+
+def scaling_report(texts, worker_counts, provider="local", model_name=DEFAULT_MODEL, threads_per_worker=None,
+                   batch_size=64, chunk=500):
+    """Encode `texts` once per worker count; rows/s, speedup and efficiency vs the first count."""
+    runs = []
+    chunks = [(i, texts[i:i + chunk]) for i in range(0, len(texts), chunk)]
+    for workers in worker_counts:
+        with ParallelEncoder(provider, model_name, workers, threads_per_worker) as encoder:
+            # One untimed batch so lazy allocations in every worker are out of the way
+            encoder.encode(texts[:batch_size * encoder.workers], batch_size)
+            started = time.perf_counter()
+            rows = sum(len(v) for _, v in encoder.map_ordered(chunks, batch_size))
+            elapsed = time.perf_counter() - started
+            runs.append({"workers": encoder.workers, "threads_per_worker": encoder.threads, "rows": rows,
+                         "seconds": round(elapsed, 2), "rows_per_s": round(rows / elapsed, 1) if elapsed else None,
+                         "load_s": round(encoder.load_s, 1)})
+        print(f"📦 {workers} workers: {runs[-1]['rows_per_s']} rows/s")
+
+    base = runs[0]
+    for run in runs:
+        run["speedup"] = round(run["rows_per_s"] / base["rows_per_s"], 2)
+        run["efficiency"] = round(run["speedup"] * base["workers"] / run["workers"], 2)
+    return runs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure embedding rows/s as encoder workers are added.")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts to try")
+    parser.add_argument("--threads-per-worker", type=int, default=None, help="Default: cores // workers")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--csv", default=None, help="Encode this CSV/Parquet text column (default: synthetic corpus)")
+    parser.add_argument("--text-col", default="description")
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", DEFAULT_MODEL))
+    parser.add_argument("--provider", default="local", choices=[p for p in PROVIDERS if not is_remote(p)])
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--output", default=None, help="Also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    texts = load_texts(args.csv, args.text_col, args.rows)
+    counts = [int(w) for w in args.workers.split(",") if w.strip()]
+    runs = scaling_report(texts, counts, args.provider, args.model, args.threads_per_worker, args.batch_size)
+
+    print(f"\n{'workers':>8} {'threads':>8} {'rows/s':>10} {'speedup':>8} {'efficiency':>10}")
+    for run in runs:
+        print(f"{run['workers']:>8} {run['threads_per_worker']:>8} {run['rows_per_s']:>10} "
+              f"{run['speedup']:>8} {run['efficiency']:>10}")
+    best = max(runs, key=lambda r: r["rows_per_s"])
+    print(f"✅ Best on this machine ({os.cpu_count()} cores): --workers {best['workers']} "
+          f"--threads-per-worker {best['threads_per_worker']}")
+
+    if args.output:
+        report = {"meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "cores": os.cpu_count(),
+                           "provider": args.provider, "model": args.model, "rows": len(texts),
+                           "batch_size": args.batch_size}, "runs": runs}
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results saved to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+import copy
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+_SCALARS = (str, bytes, int, float, bool, type(None))
+
+
+def normalize_query(text):
+    """Canonical form used as cache key: lowercased, trimmed, single-spaced."""
+    if not isinstance(text, str):
+        text = json.dumps(text, sort_keys=True, default=str)
+    return re.sub(r"\s+", " ", text.strip().lower())
+
+
+def make_key(*parts):
+    """Stable string key for arbitrary JSON-serializable parts."""
+    return json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+
+
+def _copy(value):
+    """Private copy of a cached value, so callers mutating what they got cannot corrupt the cache."""
+    if isinstance(value, _SCALARS):
+        return value
+    # Embedding vectors: a shallow copy is enough and far cheaper than deepcopy
+    if isinstance(value, list) and all(isinstance(v, _SCALARS) for v in value):
+        return list(value)
+    return copy.deepcopy(value)
+
+
+class _CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def as_dict(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round(self.hits / total, 4) if total else None,
+        }
+
+
+class LRUCache(_CacheStats):
+    """Thread-safe in-process LRU with optional per-entry TTL (seconds).
+
+    Values are copied on set and get, like the JSON round trip of SQLiteCache.
+    """
+
+    backend = "memory"
+
+    def __init__(self, name, maxsize=1024, ttl=None):
+        super().__init__()
+        self.name = name
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+        return _copy(value)
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl if self.ttl else None
+        value = _copy(value)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        out = self.as_dict()
+        out.update({"backend": self.backend, "size": len(self), "maxsize": self.maxsize, "ttl": self.ttl})
+        return out
+
+
+class SQLiteCache(_CacheStats):
+    """LRU+TTL cache stored in a local SQLite file so gunicorn workers share hits.
+
+    Values must be JSON-serializable. Hit/miss counters are per process;
+    recency and eviction are shared through the `accessed_at` column.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, name, path, maxsize=1024, ttl=None):
+        super().__init__()
+        self.name = name
+        self.path = path
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " expires_at REAL, accessed_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_lru ON cache (namespace, accessed_at)")
+        conn.commit()
+
+    def _conn(self):
+        # sqlite3 connections are not shareable across threads or fork()ed workers
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _hash(key):
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def get(self, key, default=None):
+        h = self._hash(key)
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?", (self.name, h)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.name, h))
+                self.expirations += 1
+                self.misses += 1
+                return default
+            conn.execute(
+                "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?", (now, self.name, h)
+            )
+            self.hits += 1
+            return json.loads(value)
+        except sqlite3.Error as e:
+            print(f"⚠️ Cache read failed ({self.name}): {e}")
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (self.name, self._hash(key), json.dumps(value, default=str), expires_at, now),
+            )
+            self._writes += 1
+            # Trim occasionally rather than on every write
+            if self._writes % 64 == 0:
+                self._trim(conn)
+        except sqlite3.Error as e:
+            print(f"⚠️ Cache write failed ({self.name}): {e}")
+
+    def _trim(self, conn):
+        conn.execute("DELETE FROM cache WHERE namespace = ? AND expires_at <= ?", (self.name, time.time()))
+        (count,) = conn.execute("SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.name,)).fetchone()
+        overflow = count - self.maxsize
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM cache WHERE rowid IN ("
+                " SELECT rowid FROM cache WHERE namespace = ? ORDER BY accessed_at ASC LIMIT ?)",
+                (self.name, overflow),
+            )
+            self.evictions += overflow
+
+    def clear(self):
+        self._conn().execute("DELETE FROM cache WHERE namespace = ?", (self.name,))
+
+    def __len__(self):
+        (count,) = self._conn().execute("SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.name,)).fetchone()
+        return count
+
+    def stats(self):
+        out = self.as_dict()
+        out.update({"backend": self.backend, "size": len(self), "maxsize": self.maxsize, "ttl": self.ttl})
+        return out
+
+
+def make_cache(name, maxsize, ttl=None, backend="memory", sqlite_path=None):
+    """Build an LRUCache or SQLiteCache depending on the configured backend."""
+    if backend == "sqlite":
+        return SQLiteCache(name, sqlite_path or "cache/cinebot_cache.sqlite3", maxsize=maxsize, ttl=ttl)
+    return LRUCache(name, maxsize=maxsize, ttl=ttl)
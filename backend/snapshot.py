@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Versioned, memory-mappable snapshots of the movie collection.
+
+A snapshot is a directory:
+
+    embeddings.npy    float32 (n, dim) unit vectors; row i belongs to metadata row i
+    norms.npy         float32 (n,) original vector norms (import restores the stored vectors)
+    metadata.parquet  id, title, year, genres, languages, rating, duration, description,
+                      directors, stars, embedding_hash, embedding_model
+    manifest.json     format, version, source, count, dim, embedding models, created_at
+
+load_snapshot() memory-maps embeddings.npy, so startup does not read the
+vectors and every worker process shares the same page-cache pages.
+LocalVectorIndex.from_snapshot() uses the mapped matrix as is (it is
+already normalized), instead of pulling every BSON document through
+pymongo. MongoNativePipeline.export_snapshot / import_snapshot write a
+snapshot from a collection and bulk-restore one into a collection.
+
+Usage:
+    python backend/snapshot.py export --output snapshots/movies-v1
+    python backend/snapshot.py import snapshots/movies-v1 --collection movies_restored
+    python backend/snapshot.py info snapshots/movies-v1
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+FORMAT_VERSION = 1
+METADATA_COLUMNS = ("id", "title", "year", "genres", "languages", "rating", "duration", "description",
+                    "directors", "stars", "embedding_hash", "embedding_model")
+LIST_COLUMNS = ("genres", "languages", "directors", "stars")
+
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    types = {"year": pa.int64(), "rating": pa.float64(), "duration": pa.float64()}
+    return pa.schema([
+        pa.field(c, pa.list_(pa.string()) if c in LIST_COLUMNS else types.get(c, pa.string()))
+        for c in METADATA_COLUMNS
+    ])
+
+
+def _cell(column, value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return [] if column in LIST_COLUMNS else None
+    if column in LIST_COLUMNS:
+        return [str(v) for v in (value if isinstance(value, list) else [value])]
+    if column in ("year", "rating", "duration"):
+        try:
+            return int(value) if column == "year" else float(value)
+        except (TypeError, ValueError):
+            return None
+    return str(value)
+
+
+class SnapshotWriter:
+    """Stream (doc, vector) batches into a snapshot directory; close() publishes it."""
+
+    def __init__(self, path, rows):
+        self.path = path
+        self.rows = rows
+        self.tmp = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(self.tmp, ignore_errors=True)
+        os.makedirs(self.tmp)
+        self.written = 0
+        self.models = set()
+        self._vectors = None
+        self._norms = None
+        self._parquet = None
+
+    def add(self, docs, vectors):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not docs:
+            return
+        m = np.asarray(vectors, dtype=np.float32).reshape(len(docs), -1)
+        if self._vectors is None:
+            self._vectors = np.lib.format.open_memmap(os.path.join(self.tmp, "embeddings.npy"), mode="w+",
+                                                      dtype=np.float32, shape=(self.rows, m.shape[1]))
+            self._norms = np.zeros(self.rows, dtype=np.float32)
+            self._parquet = pq.ParquetWriter(os.path.join(self.tmp, "metadata.parquet"), _arrow_schema())
+        if self.written + len(docs) > self.rows:
+            raise ValueError(f"Snapshot sized for {self.rows} rows got more")
+
+        norms = np.linalg.norm(m, axis=1)
+        end = self.written + len(docs)
+        self._vectors[self.written:end] = m / np.where(norms == 0, 1.0, norms)[:, None]
+        self._norms[self.written:end] = norms
+        columns = {c: [_cell(c, d.get(c)) for d in docs] for c in METADATA_COLUMNS}
+        self._parquet.write_table(pa.table(columns, schema=_arrow_schema()))
+        self.models.update(d.get("embedding_model") for d in docs if d.get("embedding_model"))
+        self.written = end
+
+    def close(self, version=None, source=None):
+        """Write the manifest and move the snapshot into place; returns the manifest."""
+        if self._vectors is None:
+            raise ValueError("Snapshot is empty")
+        dim = self._vectors.shape[1]
+        self._parquet.close()
+        self._vectors.flush()
+        if self.written < self.rows:
+            # Some documents had no usable vector: trim the preallocated matrix
+            trimmed = np.array(self._vectors[:self.written])
+            del self._vectors
+            np.save(os.path.join(self.tmp, "embeddings.npy"), trimmed)
+        else:
+            del self._vectors
+        np.save(os.path.join(self.tmp, "norms.npy"), self._norms[:self.written])
+
+        manifest = {
+            "format": FORMAT_VERSION,
+            "version": version or time.strftime("%Y%m%d-%H%M%S"),
+            "source": source,
+            "count": self.written,
+            "dim": int(dim),
+            "embedding_models": sorted(self.models),
+            "created_at": time.time(),
+        }
+        with open(os.path.join(self.tmp, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self.tmp, self.path)
+        return manifest
+
+
+def read_manifest(path):
+    with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format {manifest.get('format')} in {path}")
+    return manifest
+
+
+def load_snapshot(path, mmap=True, columns=None):
+    """(manifest, unit vectors (n, dim) memory-mapped read-only, metadata docs as dicts)."""
+    import pyarrow.parquet as pq
+
+    started = time.perf_counter()
+    manifest = read_manifest(path)
+    vectors = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r" if mmap else None)
+    docs = pq.read_table(os.path.join(path, "metadata.parquet"), columns=list(columns) if columns else None,
+                         memory_map=True).to_pylist()
+    if len(docs) != len(vectors):
+        raise ValueError(f"Snapshot {path} has {len(vectors)} vectors but {len(docs)} metadata rows")
+    elapsed = time.perf_counter() - started
+    print(f"✅ Snapshot {manifest['version']} loaded: {len(docs)} movies, dim={manifest['dim']} in {elapsed:.2f}s")
+    return manifest, vectors, docs
+
+
+def iter_snapshot(path, batch_size=1000):
+    """Yield (metadata docs, original float vectors) batches for restoring a collection."""
+    import pyarrow.parquet as pq
+
+    read_manifest(path)
+    vectors = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+    norms = np.load(os.path.join(path, "norms.npy"), mmap_mode="r")
+    start = 0
+    for batch in pq.ParquetFile(os.path.join(path, "metadata.parquet")).iter_batches(batch_size=batch_size):
+        docs = batch.to_pylist()
+        end = start + len(docs)
+        yield docs, np.asarray(vectors[start:end]) * np.asarray(norms[start:end])[:, None]
+        start = end
+
+
+# ------------------------
+def main(argv=None):
+    from mongo_connection import COLLECTION_NAME, DB_NAME
+
+    parser = argparse.ArgumentParser(description="Export, import and inspect corpus snapshots.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Write a snapshot of the collection")
+    export.add_argument("--output", required=True)
+    export.add_argument("--version", default=None, help="Snapshot version (default: timestamp)")
+    restore = sub.add_parser("import", help="Bulk-restore a snapshot into a collection")
+    restore.add_argument("path")
+    restore.add_argument("--drop", action="store_true", help="Drop the target collection first")
+    for p in (export, restore):
+        p.add_argument("--mongo-uri", default=None)
+        p.add_argument("--db", default=DB_NAME)
+        p.add_argument("--collection", default=COLLECTION_NAME)
+    info = sub.add_parser("info", help="Print a snapshot's manifest")
+    info.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        print(json.dumps(read_manifest(args.path), indent=2))
+        return 0
+
+    from mongo_pipeline import MongoNativePipeline
+
+    pipeline = MongoNativePipeline(args.mongo_uri, db_name=args.db, collection_name=args.collection)
+    if args.command == "export":
+        pipeline.export_snapshot(args.output, version=args.version)
+    else:
+        pipeline.import_snapshot(args.path, drop=args.drop)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, AsyncSingleFlight, Overloaded, SingleFlight
+
+
+def run_leader_and_followers(flight, fn, followers=4):
+    """Start a leader blocked inside fn, then followers on the same key; returns (results, errors)."""
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.do("k", fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(followers + 1)]
+    threads[0].start()
+    while flight.leaders == 0:
+        time.sleep(0.001)
+    for t in threads[1:]:
+        t.start()
+    while flight.followers < followers:
+        time.sleep(0.001)
+    return threads, results, errors
+
+
+def test_single_flight_shares_one_call():
+    release, calls = threading.Event(), []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return "value"
+
+    flight = SingleFlight("test")
+    threads, results, errors = run_leader_and_followers(flight, fn)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert calls == [1]
+    assert results == ["value"] * 5 and not errors
+    assert flight.stats()["coalescing_ratio"] == 0.8
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_single_flight_propagates_errors_to_every_caller():
+    release = threading.Event()
+
+    def fn():
+        release.wait(5)
+        raise ValueError("upstream failed")
+
+    flight = SingleFlight("test")
+    threads, results, errors = run_leader_and_followers(flight, fn, followers=3)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert not results
+    assert len(errors) == 4 and all(isinstance(e, ValueError) for e in errors)
+    # A failed call is not remembered: the next caller runs fn again
+    assert flight.do("k", lambda: "retried") == "retried"
+
+
+def test_single_flight_disabled_runs_every_call():
+    flight = SingleFlight("test", enabled=False)
+    calls = []
+    assert [flight.do("k", lambda: calls.append(1) or len(calls)) for _ in range(3)] == [1, 2, 3]
+    assert flight.leaders == flight.followers == 0
+
+
+def test_async_single_flight_shares_result_and_error():
+    async def scenario():
+        flight = AsyncSingleFlight("test")
+        calls = []
+
+        async def ok():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "value"
+
+        async def boom():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream failed")
+
+        shared = await asyncio.gather(*(flight.do("a", ok) for _ in range(5)))
+        failed = await asyncio.gather(*(flight.do("b", boom) for _ in range(3)), return_exceptions=True)
+        return calls, shared, failed, flight
+
+    calls, shared, failed, flight = asyncio.run(scenario())
+    assert calls == [1] and shared == ["value"] * 5
+    assert all(isinstance(e, ValueError) for e in failed)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_admission_sheds_when_queue_is_full():
+    adm = AdmissionController("test", max_active=1, max_queue=0, retry_after=2.5)
+    assert adm.acquire()
+    with pytest.raises(Overloaded) as exc:
+        with adm.slot():
+            pass
+    assert exc.value.retry_after == 3
+    stats = adm.stats()
+    assert stats["admitted"] == 1 and stats["shed"] == 1 and stats["queue_timeouts"] == 0
+    adm.release()
+    assert adm.stats()["active"] == 0
+
+
+def test_admission_queue_timeout_counts_as_shed_and_timeout():
+    adm = AdmissionController("test", max_active=1, max_queue=1, queue_timeout_ms=50)
+    assert adm.acquire()
+    started = time.perf_counter()
+    assert adm.acquire() is False
+    assert time.perf_counter() - started >= 0.045
+    stats = adm.stats()
+    assert stats["shed"] == 1 and stats["queue_timeouts"] == 1
+    assert stats["queue_depth"] == 0 and stats["peak_queue_depth"] == 1
+    assert stats["active"] == 1 and stats["admitted"] == 1
+
+
+def test_admission_queued_caller_gets_released_slot():
+    adm = AdmissionController("test", max_active=1, max_queue=1, queue_timeout_ms=2000)
+    assert adm.acquire()
+    admitted = []
+    waiter = threading.Thread(target=lambda: admitted.append(adm.acquire()))
+    waiter.start()
+    while adm.waiting == 0:
+        time.sleep(0.001)
+    adm.release()
+    waiter.join(5)
+    assert admitted == [True]
+    stats = adm.stats()
+    assert stats["admitted"] == 2 and stats["shed"] == 0 and stats["active"] == 1
+    assert stats["mean_wait_ms"] is not None
+
+
+def test_admission_async_slot_times_out_without_blocking_the_loop():
+    async def scenario():
+        adm = AdmissionController("test", max_active=1, max_queue=1, queue_timeout_ms=50)
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(1)
+                await asyncio.sleep(0.005)
+
+        async with adm.aslot():
+            async def second():
+                async with adm.aslot():
+                    pass
+            results = await asyncio.gather(second(), ticker(), return_exceptions=True)
+        return adm, results, ticks
+
+    adm, results, ticks = asyncio.run(scenario())
+    assert isinstance(results[0], Overloaded)
+    assert len(ticks) == 5
+    stats = adm.stats()
+    assert stats["shed"] == 1 and stats["queue_timeouts"] == 1
+    assert stats["active"] == 0 and stats["queue_depth"] == 0
@@ -0,0 +1,99 @@
+import random
+
+import numpy as np
+import pytest
+
+from attribute_index import AttributeIndex, filters_from_row_checker, split_prefilter
+from vector_index import matches_filter
+
+GENRES = ["Drama", "Comedy", "Action", "Horror", "Romance"]
+LANGUAGES = ["English", "French", "Hindi"]
+
+
+def make_docs(n=300, seed=7):
+    rng = random.Random(seed)
+    docs = []
+    for i in range(n):
+        doc = {"id": f"tt{i:07d}", "title": f"Movie {i}"}
+        if rng.random() > 0.05:
+            doc["year"] = rng.randint(1950, 2024)
+        if rng.random() > 0.1:
+            doc["rating"] = round(rng.uniform(1, 10), 1)
+        if rng.random() > 0.1:
+            doc["duration"] = rng.randint(60, 200)
+        if rng.random() > 0.05:
+            doc["genres"] = rng.sample(GENRES, rng.randint(1, 3))
+        if rng.random() > 0.05:
+            doc["languages"] = rng.sample(LANGUAGES, rng.randint(1, 2))
+        docs.append(doc)
+    return docs
+
+
+FILTERS = [
+    {"year": 1999},
+    {"year": {"$gte": 1990, "$lt": 2000}},
+    {"rating": {"$gt": 7.5}},
+    {"duration": {"$lte": 90}},
+    {"year": {"$ne": 2000}},
+    {"genres": "Drama"},
+    {"genres": {"$in": ["Horror", "Romance"]}},
+    {"genres": {"$nin": ["Comedy"]}},
+    {"languages": {"$ne": "English"}},
+    {"$or": [{"genres": "Action"}, {"rating": {"$gte": 9}}]},
+    {"$and": [{"year": {"$gte": 2000}}, {"genres": {"$in": ["Drama"]}}, {"languages": {"$nin": ["Hindi"]}}]},
+    filters_from_row_checker({"min_year": 1980, "max_rating": 6, "required_genres": ["Comedy"],
+                              "excluded_languages": ["French"]}),
+]
+
+
+@pytest.mark.parametrize("flt", FILTERS)
+def test_mask_matches_post_filter(flt):
+    docs = make_docs()
+    index = AttributeIndex(docs)
+    expected = np.array([matches_filter(d, flt) for d in docs])
+    mask = index.mask(flt)
+    assert mask is not None
+    assert mask.dtype == bool and len(mask) == len(docs)
+    np.testing.assert_array_equal(mask, expected)
+
+
+@pytest.mark.parametrize("flt", [
+    {"title": "Movie 1"},
+    {"year": {"$exists": True}},
+    {"genres": {"$gt": "Drama"}},
+    {"$and": [{"year": 1999}, {"title": {"$regex": "^M"}}]},
+])
+def test_mask_is_none_for_filters_it_cannot_evaluate(flt):
+    assert AttributeIndex(make_docs(20)).mask(flt) is None
+
+
+def test_mask_size_not_multiple_of_eight():
+    docs = make_docs(13)
+    mask = AttributeIndex(docs).mask({"genres": {"$nin": ["Drama"]}})
+    assert len(mask) == 13
+    np.testing.assert_array_equal(mask, [matches_filter(d, {"genres": {"$nin": ["Drama"]}}) for d in docs])
+
+
+def test_split_prefilter_keeps_indexable_filters_whole():
+    flt = FILTERS[-1]
+    assert split_prefilter(flt) == (flt, None)
+    assert split_prefilter({}) == (None, None)
+
+
+def test_split_prefilter_moves_other_clauses_to_postfilter():
+    title = {"title": {"$ne": "Movie 3"}}
+    flt = {"$and": [{"year": {"$gte": 1990}}, title, {"genres": "Drama"}]}
+    pre, post = split_prefilter(flt)
+    assert pre == {"$and": [{"year": {"$gte": 1990}}, {"genres": "Drama"}]}
+    assert post == {"$and": [title]}
+    assert split_prefilter(title) == (None, title)
+
+
+@pytest.mark.parametrize("flt", FILTERS + [
+    {"$and": [{"rating": {"$gte": 5}}, {"title": {"$nin": ["Movie 1", "Movie 2"]}}]},
+    {"$or": [{"genres": "Drama"}, {"title": "Movie 4"}]},
+])
+def test_split_prefilter_is_equivalent_to_the_full_filter(flt):
+    pre, post = split_prefilter(flt)
+    for doc in make_docs():
+        assert (matches_filter(doc, pre) and matches_filter(doc, post)) == matches_filter(doc, flt)
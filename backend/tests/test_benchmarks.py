@@ -0,0 +1,85 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from corpus import HashEncoder, make_movies, make_queries  # noqa: E402
+from loadgen import StageTimer, run_load, summarize  # noqa: E402
+from run import compare  # noqa: E402
+
+
+def test_summarize_reports_milliseconds():
+    summary = summarize([0.001, 0.002, 0.003, 0.004])
+    assert summary["count"] == 4
+    assert summary["mean"] == 2.5 and summary["max"] == 4.0
+    assert summary["p50"] == 2.5
+    assert summarize([])["p95"] is None
+
+
+def test_run_load_makes_every_request_and_counts_errors():
+    calls = []
+
+    def fn(payload):
+        calls.append(payload)
+        if payload == "bad":
+            raise ValueError("boom")
+
+    result = run_load(fn, ["ok", "bad", "ok", "ok"], requests=20, concurrency=4, warmup=1)
+    assert len(calls) == 21
+    assert result["errors"] == 5
+    assert "boom" in result["first_error"]
+    assert result["latency_ms"]["count"] == 20
+
+
+def test_stage_timer_collects_per_stage_samples():
+    timer = StageTimer()
+    for _ in range(3):
+        with timer.stage("embed"):
+            pass
+    timer.add("aggregate", 0.01)
+    stages = timer.as_dict()
+    assert stages["embed"]["count"] == 3
+    assert stages["aggregate"]["p95"] == 10.0
+
+
+def test_compare_flags_p95_regressions_over_the_threshold():
+    baseline = {"meta": {"git_revision": "abc"},
+                "scenarios": {"search": {"embed": {"count": 5, "p95": 10.0}, "lexical": {"count": 5, "p95": 4.0}}}}
+    current = {"scenarios": {"search": {"embed": {"count": 5, "p95": 13.0}, "lexical": {"count": 5, "p95": 4.1}}}}
+    assert compare(current, baseline, threshold=0.2) == ["search.embed"]
+
+
+def test_synthetic_corpus_is_deterministic():
+    encoder = HashEncoder(dim=32)
+    a, b = make_movies(20, seed=3, encoder=encoder), make_movies(20, seed=3, encoder=encoder)
+    assert a == b
+    assert len(a[0]["embedding"]) == 32
+    assert encoder.encode("a storm") == pytest.approx(encoder.encode("storm a"))
+    assert make_queries(8) == make_queries(8)
+
+
+def test_emulated_vector_search_answers_like_atlas():
+    mongomock = pytest.importorskip("mongomock")
+    from atlas_emulator import EmulatedVectorSearch
+
+    encoder = HashEncoder(dim=32)
+    coll = mongomock.MongoClient()["bench"]["movies"]
+    docs = make_movies(60, encoder=encoder)
+    coll.insert_many([dict(d) for d in docs])
+    emulated = EmulatedVectorSearch(coll)
+
+    query = docs[5]["embedding"]
+    pipeline = [
+        {"$vectorSearch": {"index": "movie_vector_index", "path": "embedding", "queryVector": query,
+                           "numCandidates": 20, "limit": 5, "filter": {"year": {"$gte": 1990}}}},
+        {"$project": {"_id": 0, "title": 1, "year": 1, "score": {"$meta": "vectorSearchScore"}}},
+    ]
+    results = emulated.aggregate(pipeline)
+    assert 0 < len(results) <= 5
+    assert all(r["year"] >= 1990 and set(r) == {"title", "year", "score"} for r in results)
+    assert [r["score"] for r in results] == sorted((r["score"] for r in results), reverse=True)
+    # Other pipelines and methods go to the real collection
+    assert emulated.count_documents({}) == 60
+    assert len(list(emulated.aggregate([{"$match": {"id": docs[0]["id"]}}]))) == 1
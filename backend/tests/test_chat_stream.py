@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+os.environ.setdefault("LAZY_STARTUP", "true")
+
+import flask_server as fs  # noqa: E402
+
+
+class FakeGroq:
+    def __init__(self, params_text, delay=0.05):
+        self.params_text = params_text
+        self.delay = delay
+        self.calls = 0
+
+    def chat(self, messages, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        return self.params_text
+
+    def chat_stream(self, messages, **kwargs):
+        yield "Try "
+        yield "Movie 1."
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    searches = []
+    lock = threading.Lock()
+
+    def search_results(query, negative_query, negative_weight, filters, limit, mode):
+        with lock:
+            searches.append(query)
+        return [{"id": f"tt{len(query)}", "title": f"Movie for {query}"}]
+
+    def setup(params_text, groq_key="test-key"):
+        monkeypatch.setattr(fs, "GROQ_API_KEY", groq_key)
+        monkeypatch.setattr(fs, "groq_client", FakeGroq(params_text))
+        monkeypatch.setattr(fs, "search_results", search_results)
+        fs.groq_cache.clear()
+        return fs.app.test_client(), searches
+
+    return setup
+
+
+def sse_events(body):
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def ask(client, path, message):
+    return client.post(path, json={"messages": [{"role": "user", "content": message}]})
+
+
+def test_stream_reuses_the_preview_when_params_are_the_raw_message(chat):
+    client, searches = chat(json.dumps({"positive_query": "space heist", "negative_query": "", "row_checker": {}}))
+    events = sse_events(ask(client, "/chat/stream", "space heist").get_data(as_text=True))
+    assert [e for e, _ in events] == ["preview", "params", "results", "delta", "delta", "done"]
+    assert events[0][1]["results"] == events[2][1]["results"]
+    assert events[-1][1]["content"] == "Try Movie 1."
+    assert searches == ["space heist"]
+
+
+def test_stream_searches_the_extracted_query_when_it_differs(chat):
+    client, searches = chat(json.dumps({"positive_query": "heist in space", "negative_query": "", "row_checker": {}}))
+    events = sse_events(ask(client, "/chat/stream", "something like a space heist").get_data(as_text=True))
+    assert [e for e, _ in events] == ["preview", "params", "results", "delta", "delta", "done"]
+    assert events[2][1]["results"] == [{"id": "tt14", "title": "Movie for heist in space"}]
+    assert sorted(searches) == ["heist in space", "something like a space heist"]
+
+
+def test_chat_without_retrieval_runs_no_search(chat):
+    client, searches = chat("Hi! Ask me for a movie and I'll find one.")
+    body = ask(client, "/chat", "hello there").get_json()
+    assert body["response"] == "Hi! Ask me for a movie and I'll find one."
+    assert body["results"] == []
+    assert searches == []
+
+
+def test_stream_without_groq_has_no_preview(chat):
+    client, searches = chat(None, groq_key=None)
+    events = sse_events(ask(client, "/chat/stream", "korean thriller").get_data(as_text=True))
+    assert [e for e, _ in events] == ["params", "results", "done"]
+    assert searches == ["korean thriller"]
+
+
+def test_stream_preview_can_be_disabled(chat, monkeypatch):
+    client, searches = chat(json.dumps({"positive_query": "space heist", "negative_query": "", "row_checker": {}}))
+    monkeypatch.setattr(fs, "CHAT_PREVIEW", False)
+    events = sse_events(ask(client, "/chat/stream", "space heist").get_data(as_text=True))
+    assert [e for e, _ in events] == ["params", "results", "delta", "delta", "done"]
+    assert searches == ["space heist"]
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from compact_embeddings import (
+    CompactVectorIndex,
+    _synthetic_vectors,
+    decode_bits,
+    decode_int8,
+    encode_bits,
+    encode_int8,
+    quantize_int8,
+    recall_report,
+)
+from vector_index import matches_filter
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    return _synthetic_vectors(3000, 128, seed=3)
+
+
+def test_int8_and_bits_round_trip():
+    v = np.array([0.5, -1.0, 0.0, 0.25, 0.1, -0.2, 0.9, -0.05, 0.3], dtype=np.float32)
+    codes = decode_int8(encode_int8(v))
+    np.testing.assert_array_equal(codes, quantize_int8(v))
+    assert codes.min() == -127
+    packed, dim = decode_bits(encode_bits(v))
+    assert dim == len(v)
+    np.testing.assert_array_equal(np.unpackbits(packed, count=dim).astype(bool), v > 0)
+    with pytest.raises(ValueError):
+        decode_bits(encode_int8(v))
+
+
+def test_recall_against_exact_float_index(vectors):
+    report = recall_report(vectors, k=10, queries=100, rescore_factor=10)
+    modes = report["modes"]
+    assert modes["int8"]["recall_at_k"] >= 0.95
+    assert modes["hybrid"]["recall_at_k"] >= 0.95
+    # Sign bits alone are a coarse estimate; they only have to beat chance by a wide margin
+    assert modes["binary"]["recall_at_k"] >= 0.4
+    assert modes["int8"]["compression"] >= 3.5
+    assert modes["binary"]["compression"] >= 30
+
+
+def test_filtered_search_matches_filter(vectors):
+    docs = [{"id": str(i), "year": 1950 + i % 75, "genres": ["Drama" if i % 3 else "Comedy"]}
+            for i in range(len(vectors))]
+    flt = {"$and": [{"year": {"$gte": 2010}}, {"genres": {"$in": ["Comedy"]}}]}
+    index = CompactVectorIndex(mode="hybrid").build(vectors, docs)
+    results = index.search(vectors[0], limit=10, num_candidates=100, filters=flt)
+    assert len(results) == 10
+    assert all(matches_filter(r, flt) for r in results)
+    scores = [r["score"] for r in results]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_from_collection_prefers_stored_codes(vectors):
+    mongomock = pytest.importorskip("mongomock")
+    coll = mongomock.MongoClient().db.movies
+    coll.insert_many([
+        {"id": "float", "title": "A", "embedding": vectors[0].tolist()},
+        {"id": "codes", "title": "B", "embedding_int8": encode_int8(vectors[1]),
+         "embedding_bits": encode_bits(vectors[1])},
+        {"id": "none", "title": "C"},
+    ])
+    index = CompactVectorIndex.from_collection(coll, mode="hybrid")
+    assert index.ids == ["float", "codes"]
+    assert index.dim == 128
+    rows, _ = index.top_k(vectors[1], 1)
+    assert index.ids[rows[0]] == "codes"
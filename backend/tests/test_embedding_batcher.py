@@ -0,0 +1,101 @@
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import pytest
+
+from embedding_batcher import EmbeddingBatcher
+
+
+class GatedEncoder:
+    """encode_fn whose first call blocks until release(), so later submits pile up behind it."""
+
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.first_started = threading.Event()
+        self.gate = threading.Event()
+        self.fail_on = fail_on
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        if len(self.batches) == 1:
+            self.first_started.set()
+            self.gate.wait(5)
+        if self.fail_on and self.fail_on in texts:
+            raise RuntimeError("model exploded")
+        return [[float(len(t)), float(i)] for i, t in enumerate(texts)]
+
+
+def block_worker(batcher, encoder):
+    """Occupy the worker with one batch; returns its future."""
+    first = batcher.submit("warm")
+    assert encoder.first_started.wait(5)
+    return first
+
+
+def test_queued_texts_merge_into_batches_of_at_most_max_size():
+    encoder = GatedEncoder()
+    batcher = EmbeddingBatcher(encoder, max_batch_size=4, max_wait_ms=50)
+    first = block_worker(batcher, encoder)
+    futures = [batcher.submit("x" * n) for n in range(1, 11)]
+    encoder.gate.set()
+
+    assert first.result(5) == [4.0, 0.0]
+    assert [f.result(5)[0] for f in futures] == [float(n) for n in range(1, 11)]
+    assert [len(b) for b in encoder.batches] == [1, 4, 4, 2]
+    stats = batcher.stats()
+    assert stats["batches"] == 4 and stats["items"] == 11
+    assert stats["batch_size_histogram"] == {1: 1, 2: 1, 4: 2}
+
+
+def test_each_caller_gets_its_own_row():
+    encoder = GatedEncoder()
+    encoder.gate.set()
+    batcher = EmbeddingBatcher(encoder, max_batch_size=8, max_wait_ms=20)
+    texts = ["a", "bbb", "cc", "dddd"]
+    results = {}
+
+    def call(text):
+        results[text] = batcher.encode(text, timeout=5)
+
+    threads = [threading.Thread(target=call, args=(t,)) for t in texts]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert {t: v[0] for t, v in results.items()} == {t: float(len(t)) for t in texts}
+    assert batcher.encode_many(["zz", "y", "xxx"], timeout=5) == [[2.0, 0.0], [1.0, 1.0], [3.0, 2.0]]
+
+
+def test_encode_errors_reach_every_waiter_in_the_batch():
+    encoder = GatedEncoder(fail_on="bad")
+    batcher = EmbeddingBatcher(encoder, max_batch_size=8, max_wait_ms=50)
+    block_worker(batcher, encoder)
+    futures = [batcher.submit(t) for t in ("ok", "bad", "fine")]
+    encoder.gate.set()
+    for f in futures:
+        with pytest.raises(RuntimeError, match="model exploded"):
+            f.result(5)
+    assert batcher.stats()["errors"] == 1
+    # The worker survives and serves the next batch
+    assert batcher.encode("again", timeout=5)[0] == 5.0
+
+
+def test_wrong_vector_count_fails_the_batch_instead_of_hanging():
+    batcher = EmbeddingBatcher(lambda texts: [[0.0]], max_batch_size=8, max_wait_ms=50)
+    with pytest.raises(ValueError, match="1 vectors for 2 texts"):
+        batcher.encode_many(["a", "b"], timeout=5)
+
+
+def test_default_timeout_applies_when_the_call_passes_none():
+    encoder = GatedEncoder()
+    batcher = EmbeddingBatcher(encoder, timeout_s=0.05)
+    block_worker(batcher, encoder)
+    with pytest.raises(FutureTimeout):
+        batcher.encode("late")
+    encoder.gate.set()
+
+
+def test_non_positive_timeout_waits_forever():
+    assert EmbeddingBatcher(lambda texts: texts, timeout_s=0).timeout is None
+    assert EmbeddingBatcher(lambda texts: texts, timeout_s=None).timeout is None
+    assert EmbeddingBatcher(lambda texts: texts, timeout_s=2.5).timeout == 2.5
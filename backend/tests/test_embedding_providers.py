@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from embedding_providers import EmbeddingProvider, OnnxProvider, model_tag
+
+
+class LengthProvider(EmbeddingProvider):
+    """Embeds each text as [len(text), 1]; records the batches it was asked for."""
+
+    dimension = 2
+
+    def __init__(self):
+        self.batches = []
+
+    def _encode_batch(self, texts):
+        self.batches.append(list(texts))
+        return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+
+def test_encode_keeps_input_order_across_length_sorted_batches():
+    provider = LengthProvider()
+    texts = ["ccc", "a", "bbbbb", "dd", "eeee"]
+    out = provider.encode(texts, batch_size=2)
+    assert out[:, 0].tolist() == [3, 1, 5, 2, 4]
+    assert [len(b) for b in provider.batches] == [2, 2, 1]
+    assert provider.batches[0] == ["a", "dd"]
+
+
+def test_encode_accepts_float_batch_size():
+    provider = LengthProvider()
+    out = provider.encode(["a", "bb", "ccc"], batch_size=2.0)
+    assert out.shape == (3, 2)
+    assert [len(b) for b in provider.batches] == [2, 1]
+
+
+def test_encode_single_string_and_empty_list():
+    provider = LengthProvider()
+    assert provider.encode("abc").tolist() == [3, 1]
+    assert provider.encode([]).shape == (0, 2)
+
+
+def test_model_tag_marks_quantized_providers():
+    assert model_tag("m", "v1") == "m@v1"
+    assert model_tag("m", "v1", "onnx") == "m@v1"
+    assert model_tag("m", None, "onnx-int8") == "m+int8"
+
+
+def test_onnx_tokenizer_truncates_and_pads_from_manifest(tmp_path):
+    tokenizers = pytest.importorskip("tokenizers")
+    vocab = {"[PAD]": 0, "[UNK]": 1, "a": 2, "b": 3, "c": 4}
+    tok = tokenizers.Tokenizer(tokenizers.models.WordLevel(vocab, unk_token="[UNK]"))
+    tok.pre_tokenizer = tokenizers.pre_tokenizers.Whitespace()
+    tok.save(str(tmp_path / "tokenizer.json"))
+
+    provider = OnnxProvider.__new__(OnnxProvider)
+    provider.manifest = {"pad_token": "[PAD]"}
+    provider.max_length = 3
+    provider.input_names = ["input_ids", "attention_mask"]
+    provider._load_tokenizer(str(tmp_path))
+
+    feed = provider._tokenize(["a b c a b", "c"])
+    assert set(feed) == {"input_ids", "attention_mask"}
+    assert feed["input_ids"].tolist() == [[2, 3, 4], [4, 0, 0]]
+    assert feed["attention_mask"].tolist() == [[1, 1, 1], [1, 0, 0]]
+
+
+def test_onnx_provider_requires_tokenizer_json(tmp_path):
+    pytest.importorskip("tokenizers")
+    provider = OnnxProvider.__new__(OnnxProvider)
+    provider.manifest = {}
+    provider.max_length = 8
+    with pytest.raises(RuntimeError, match="tokenizer.json"):
+        provider._load_tokenizer(str(tmp_path))
@@ -0,0 +1,152 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from ingest import ingest, load_checkpoint  # noqa: E402
+from mongo_pipeline import MongoNativePipeline, content_hash  # noqa: E402
+
+
+class CountingModel:
+    """Deterministic 4-d encoder that records every text it embeds."""
+
+    def __init__(self):
+        self.texts = []
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        self.texts.extend(texts)
+        return np.array([[len(t), t.count(" "), 1.0, float(batch_size)] for t in texts], dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self):
+        return 4
+
+
+def make_pipeline(version="minilm@v1"):
+    pipeline = MongoNativePipeline.__new__(MongoNativePipeline)
+    pipeline.client = mongomock.MongoClient()
+    pipeline.db = pipeline.client["cinebot"]
+    pipeline.coll = pipeline.db["movies"]
+    pipeline.model = CountingModel()
+    pipeline.model_name = "minilm"
+    pipeline.provider = "local"
+    pipeline.model_version = version
+    pipeline.encoder = None
+    pipeline.compact = None
+    pipeline.store_float = True
+    return pipeline
+
+
+def write_csv(path, rows=10, changed=()):
+    pd.DataFrame([
+        {
+            "id": f"tt{i}",
+            "title": f"Movie {i}",
+            "year": 1990 + i,
+            "rating": 7.5,
+            "duration": 100,
+            "description": f"a story number {i}" + (" retold" if i in changed else ""),
+            "genres": "['Drama', 'Comedy']",
+            "languages": "English",
+            "directors": "['Someone']",
+            "stars": "[]",
+        }
+        for i in range(rows)
+    ]).to_csv(path, index=False)
+    return str(path)
+
+
+def test_ingest_builds_documents_and_checkpoints(tmp_path):
+    csv = write_csv(tmp_path / "movies.csv")
+    checkpoint = str(tmp_path / "ckpt.json")
+    pipeline = make_pipeline()
+    assert ingest(pipeline, csv, chunk_size=4, batch_size=3, write_batch=3, checkpoint_path=checkpoint) == 10
+
+    doc = pipeline.coll.find_one({"_id": "tt3"})
+    assert doc["id"] == "tt3" and doc["year"] == 1993
+    assert doc["genres"] == ["Drama", "Comedy"] and doc["languages"] == ["English"]
+    assert doc["embedding"] == [len("a story number 3"), 3.0, 1.0, 3.0]
+    assert doc["embedding_hash"] == content_hash("a story number 3")
+    assert doc["embedding_model"] == "minilm@v1"
+    assert load_checkpoint(checkpoint)["rows_done"] == 10
+
+
+def test_rerunning_ingest_upserts_instead_of_duplicating(tmp_path):
+    csv = write_csv(tmp_path / "movies.csv")
+    pipeline = make_pipeline()
+    ingest(pipeline, csv, write_batch=4)
+    first = list(pipeline.coll.find({}, sort=[("_id", 1)]))
+    ingest(pipeline, csv, write_batch=4)
+    assert pipeline.coll.count_documents({}) == 10
+    assert list(pipeline.coll.find({}, sort=[("_id", 1)])) == first
+
+
+def test_resume_continues_after_the_checkpoint(tmp_path):
+    csv = write_csv(tmp_path / "movies.csv")
+    checkpoint = str(tmp_path / "ckpt.json")
+    pipeline = make_pipeline()
+    assert ingest(pipeline, csv, write_batch=2, checkpoint_path=checkpoint, limit=4) == 4
+    assert load_checkpoint(checkpoint)["rows_done"] == 4
+
+    pipeline.model.texts.clear()
+    assert ingest(pipeline, csv, write_batch=2, checkpoint_path=checkpoint, resume=True) == 6
+    assert pipeline.model.texts == [f"a story number {i}" for i in range(4, 10)]
+    assert pipeline.coll.count_documents({}) == 10
+
+
+def test_resume_rejects_a_checkpoint_for_another_file(tmp_path):
+    checkpoint = tmp_path / "ckpt.json"
+    checkpoint.write_text(json.dumps({"csv": "/elsewhere.csv", "collection": "cinebot.movies", "rows_done": 3}))
+    with pytest.raises(RuntimeError, match="different CSV"):
+        ingest(make_pipeline(), write_csv(tmp_path / "movies.csv"), checkpoint_path=str(checkpoint), resume=True)
+
+
+def test_incremental_only_reembeds_changed_rows(tmp_path):
+    pipeline = make_pipeline()
+    ingest(pipeline, write_csv(tmp_path / "v1.csv"))
+    pipeline.model.texts.clear()
+
+    written = ingest(pipeline, write_csv(tmp_path / "v2.csv", rows=12, changed={2, 5}), incremental=True)
+    assert written == 4
+    assert sorted(pipeline.model.texts) == sorted(
+        ["a story number 2 retold", "a story number 5 retold", "a story number 10", "a story number 11"]
+    )
+    assert pipeline.coll.find_one({"_id": "tt2"})["embedding_hash"] == content_hash("a story number 2 retold")
+    assert pipeline.coll.count_documents({}) == 12
+
+
+def test_model_change_is_detected_and_reembeds_everything(tmp_path):
+    csv = write_csv(tmp_path / "movies.csv")
+    pipeline = make_pipeline("minilm@v1")
+    ingest(pipeline, csv)
+    assert not pipeline.needs_model_migration()
+
+    pipeline.model_version = "minilm@v2"
+    assert pipeline.needs_model_migration()
+    assert len(pipeline.select_changed([{"id": "tt1", "description": "a story number 1"}])) == 1
+
+
+def test_reembed_stages_in_the_shadow_collection_and_cuts_over(tmp_path):
+    csv = write_csv(tmp_path / "movies.csv")
+    pipeline = make_pipeline("minilm@v1")
+    ingest(pipeline, csv)
+    pipeline.coll.create_index([("year", 1)], name="year_1")
+
+    pipeline.model_version = "minilm@v2"
+    shadow = pipeline.shadow_collection()
+    assert ingest(pipeline, csv, coll=shadow) == 10
+    # Live documents are untouched until the cutover
+    assert pipeline.coll.count_documents({"embedding_model": "minilm@v1"}) == 10
+
+    pipeline.cutover_shadow()
+    assert pipeline.coll.count_documents({"embedding_model": "minilm@v2"}) == 10
+    assert "year_1" in pipeline.coll.index_information()
+    assert "movies__reembed" not in pipeline.db.list_collection_names()
+    assert not pipeline.needs_model_migration()
+
+
+def test_cutover_refuses_an_empty_shadow():
+    with pytest.raises(RuntimeError, match="Shadow collection is empty"):
+        make_pipeline().cutover_shadow()
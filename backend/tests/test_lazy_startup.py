@@ -0,0 +1,78 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+os.environ.setdefault("LAZY_STARTUP", "true")
+
+import flask_server as fs  # noqa: E402
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, sys
+import flask_server
+print(json.dumps({
+    "heavy": sorted(m for m in ("torch", "sentence_transformers", "onnxruntime") if m in sys.modules),
+    "model": flask_server.model is not None,
+    "mongo_connected": flask_server.mongo.stats()["connected"],
+    "phases": sorted(flask_server.startup_timings),
+}))
+"""
+
+
+def test_lazy_import_defers_model_and_mongo():
+    env = dict(os.environ, LAZY_STARTUP="true", WARM_ON_START="false", EMBEDDING_PROVIDER="local",
+               MONGO_HEALTH_INTERVAL_S="0")
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+                         timeout=60)
+    assert out.returncode == 0, out.stderr
+    report = json.loads(out.stdout.strip().splitlines()[-1])
+    assert report == {"heavy": [], "model": False, "mongo_connected": False, "phases": ["imports", "module_ready"]}
+
+
+def test_model_loads_once_on_first_use(monkeypatch):
+    loads = []
+
+    def make_provider(provider, model_name):
+        loads.append(provider)
+        time.sleep(0.05)
+        return object()
+
+    monkeypatch.setattr(fs, "model", None)
+    monkeypatch.setattr(fs, "embedding_batcher", None)
+    monkeypatch.setattr(fs, "EMBEDDING_PROVIDER", "local")
+    monkeypatch.setattr(fs, "EMBED_BATCHING", False)
+    monkeypatch.setattr(fs, "make_provider", make_provider)
+    monkeypatch.setitem(fs.startup_timings, "model_load", None)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fs.get_model())) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert loads == ["local"]
+    assert len({id(r) for r in results}) == 1
+    assert fs.startup_timings["model_load"] >= 50
+
+
+def test_remote_embeddings_never_load_a_local_model(monkeypatch):
+    monkeypatch.setattr(fs, "model", None)
+    monkeypatch.setattr(fs, "EMBEDDING_PROVIDER", "huggingface")
+    monkeypatch.setattr(fs, "make_provider", lambda *a: pytest.fail("local model loaded"))
+    assert fs.get_model() is None
+
+
+def test_warm_up_survives_an_unreachable_database(monkeypatch):
+    def unreachable():
+        raise ConnectionError("no route to host")
+
+    monkeypatch.setattr(fs, "get_coll", unreachable)
+    monkeypatch.setitem(fs.startup_timings, "warm_up", None)
+    fs.warm_up()
+    assert fs.startup_timings["warm_up"] is not None
@@ -0,0 +1,53 @@
+import pytest
+
+from lexical_index import RRF_K, BM25Index, reciprocal_rank_fusion
+
+
+def test_rrf_scores_are_sum_of_reciprocal_ranks():
+    fused = dict(reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]], k=60))
+    assert fused["a"] == pytest.approx(1 / 61)
+    assert fused["b"] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused["c"] == pytest.approx(1 / 63)
+    assert fused["d"] == pytest.approx(1 / 62)
+
+
+def test_rrf_rewards_agreement_between_rankings():
+    vector = ["v1", "both", "v2", "v3"]
+    lexical = ["l1", "both", "l2"]
+    ranked = [item for item, _ in reciprocal_rank_fusion([vector, lexical])]
+    assert ranked[0] == "both"
+    assert set(ranked) == set(vector) | set(lexical)
+
+
+def test_rrf_weights_and_order():
+    fused = reciprocal_rank_fusion([["a"], ["b"]], weights=[1.0, 2.0])
+    assert [item for item, _ in fused] == ["b", "a"]
+    assert fused[0][1] == pytest.approx(2 / (RRF_K + 1))
+    scores = [score for _, score in reciprocal_rank_fusion([list("abcdef"), list("fedcba")], k=1)]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_rrf_empty_inputs():
+    assert reciprocal_rank_fusion([]) == []
+    assert reciprocal_rank_fusion([[], []]) == []
+    assert reciprocal_rank_fusion([[], ["a"]]) == [("a", pytest.approx(1 / (RRF_K + 1)))]
+
+
+def test_bm25_ranks_term_matches_and_survives_save_load(tmp_path):
+    ids = ["tt1", "tt2", "tt3", "tt4"]
+    texts = [
+        "a heist crew plans one last heist in paris",
+        "a quiet drama about a family farm",
+        "space explorers find a wormhole",
+        "the heist goes wrong tomhanks",
+    ]
+    index = BM25Index().build(ids, texts)
+    hits = index.search("heist", k=10)
+    assert [movie_id for movie_id, _ in hits][:1] == ["tt1"]
+    assert {movie_id for movie_id, _ in hits} == {"tt1", "tt4"}
+    assert index.search("Tom Hanks", k=5)[0][0] == "tt4"
+    assert index.search("the of and", k=5) == []
+
+    index.save(str(tmp_path / "bm25"))
+    loaded = BM25Index.load(str(tmp_path / "bm25"))
+    assert loaded.search("heist", k=10) == pytest.approx(hits)
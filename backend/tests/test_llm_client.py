@@ -0,0 +1,323 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import llm_client
+from llm_client import AsyncGroqClient, CircuitBreaker, GroqClient, LLMError
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_client.time, "monotonic", clock)
+    return clock
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_success()
+    assert breaker.failures == 0
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == "open" and breaker.opens == 1
+    assert not breaker.allow()
+
+
+def test_breaker_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()  # probe already in flight
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30)
+    for _ in range(5):
+        breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.opens == 2
+    assert not breaker.allow()
+    clock.now += 30
+    assert breaker.allow()
+
+
+def test_released_probe_can_be_retried(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.release_probe()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+# ------------------------
+def make_client(monkeypatch, post, **kwargs):
+    client = GroqClient("test-key", url="http://groq.invalid", **kwargs)
+    monkeypatch.setattr(client, "_post", post)
+    return client
+
+
+def test_client_short_circuits_when_open(monkeypatch):
+    calls = []
+
+    def post(payload, cancelled=None):
+        calls.append(payload)
+        raise LLMError("boom")
+
+    client = make_client(monkeypatch, post, failure_threshold=2, reset_timeout=60)
+    try:
+        assert client.chat([{"role": "user", "content": "hi"}]) is None
+        assert client.chat([{"role": "user", "content": "hi"}]) is None
+        assert client.breaker.state == "open"
+        assert client.chat([{"role": "user", "content": "hi"}]) is None
+        assert len(calls) == 2
+        assert client.metrics.as_dict()["short_circuited"] == 1
+    finally:
+        client.close()
+
+
+def test_client_releases_probe_when_no_slot(monkeypatch, clock):
+    client = make_client(monkeypatch, lambda payload, cancelled=None: "ok", max_concurrency=1, acquire_timeout_ms=0,
+                         failure_threshold=1, reset_timeout=30)
+    try:
+        client.breaker.record_failure()
+        clock.now += 30
+        assert client._slots.acquire(timeout=0)
+        assert client.chat([{"role": "user", "content": "hi"}]) is None
+        assert client.metrics.as_dict()["rejected"] == 1
+        client._slots.release()
+        # The rejected call must not leave the half-open breaker waiting on a probe that never ran
+        assert client.chat([{"role": "user", "content": "hi"}]) == "ok"
+        assert client.breaker.state == "closed"
+    finally:
+        client.close()
+
+
+def test_client_hedge_wins_over_slow_attempt(monkeypatch):
+    first = threading.Event()
+
+    def post(payload, cancelled=None):
+        if not first.is_set():
+            first.set()
+            time.sleep(0.5)
+            return "slow"
+        return "fast"
+
+    client = make_client(monkeypatch, post, max_attempts=2, hedge_delay_ms=20)
+    try:
+        assert client.chat([{"role": "user", "content": "hi"}]) == "fast"
+        metrics = client.metrics.as_dict()
+        assert metrics["hedges"] == 1 and metrics["hedge_wins"] == 1
+    finally:
+        client.close()
+
+
+def test_client_over_budget_counts_as_failure(monkeypatch):
+    def post(payload, cancelled=None):
+        time.sleep(0.03)
+        return "late"
+
+    client = make_client(monkeypatch, post, latency_budget_ms=1, failure_threshold=1)
+    try:
+        assert client.chat([{"role": "user", "content": "hi"}]) == "late"
+        assert client.breaker.state == "open"
+        assert client.metrics.as_dict()["over_budget"] == 1
+    finally:
+        client.close()
+
+
+def test_hedges_never_exceed_max_concurrency(monkeypatch):
+    lock, live, peak = threading.Lock(), [0], [0]
+
+    def post(payload, cancelled=None):
+        with lock:
+            live[0] += 1
+            peak[0] = max(peak[0], live[0])
+        try:
+            time.sleep(0.05)
+            return "ok"
+        finally:
+            with lock:
+                live[0] -= 1
+
+    client = make_client(monkeypatch, post, max_concurrency=2, max_attempts=3, hedge_delay_ms=5)
+    try:
+        threads = [threading.Thread(target=client.chat, args=([{"role": "user", "content": "hi"}],))
+                   for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+        assert peak[0] <= 2
+        assert client.metrics.as_dict()["hedges_skipped"] > 0
+    finally:
+        client.close()
+
+
+# ------------------------
+class FakeResponse:
+    def __init__(self, lines=(), status_code=200, body=b"", delay=0.0):
+        self.lines = list(lines)
+        self.status_code = status_code
+        self.body = body
+        self.delay = delay
+        self.text = body.decode()
+
+    def iter_lines(self, decode_unicode=False):
+        for line in self.lines:
+            time.sleep(self.delay)
+            yield line
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.body), 4):
+            time.sleep(self.delay)
+            yield self.body[i:i + 4]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def sse(*deltas):
+    lines = [f"data: {json.dumps({'choices': [{'delta': {'content': d}}]})}" for d in deltas]
+    return lines + ["", "data: [DONE]"]
+
+
+def make_stream_client(monkeypatch, response, **kwargs):
+    client = GroqClient("test-key", url="http://groq.invalid", **kwargs)
+    monkeypatch.setattr(client.session, "post", lambda *a, **kw: response)
+    return client
+
+
+def test_stream_slot_and_budget_ignore_a_slow_consumer(monkeypatch):
+    client = make_stream_client(monkeypatch, FakeResponse(sse("Hel", "lo", "!")), max_concurrency=1,
+                                acquire_timeout_ms=0, latency_budget_ms=50, failure_threshold=1)
+    try:
+        stream = client.chat_stream([{"role": "user", "content": "hi"}])
+        assert next(stream) == "Hel"
+        time.sleep(0.2)  # a browser slower than the whole latency budget
+        # Groq is done, so the slot is free again even though the consumer hasn't finished
+        assert client._slots.acquire(timeout=1)
+        client._slots.release()
+        assert list(stream) == ["lo", "!"]
+        assert client.breaker.state == "closed"
+        assert client.metrics.as_dict().get("over_budget") is None
+    finally:
+        client.close()
+
+
+def test_stream_abandoned_mid_way_releases_probe_and_slot(monkeypatch, clock):
+    client = make_stream_client(monkeypatch, FakeResponse(sse(*"abcdefgh"), delay=0.01), max_concurrency=1,
+                                failure_threshold=1, reset_timeout=30)
+    try:
+        client.breaker.record_failure()
+        clock.now += 30
+        stream = client.chat_stream([{"role": "user", "content": "hi"}])
+        assert next(stream) == "a"
+        stream.close()
+        assert client._slots.acquire(timeout=1)
+        client._slots.release()
+        assert client.breaker.state == "half_open"
+        assert client.breaker.allow()
+    finally:
+        client.close()
+
+
+def test_stream_upstream_error_yields_nothing(monkeypatch):
+    client = make_stream_client(monkeypatch, FakeResponse(status_code=503, body=b"busy"), failure_threshold=1)
+    try:
+        assert list(client.chat_stream([{"role": "user", "content": "hi"}])) == []
+        assert client.breaker.state == "open"
+    finally:
+        client.close()
+
+
+def test_post_stops_reading_once_cancelled(monkeypatch):
+    body = json.dumps({"choices": [{"message": {"content": "done"}}]}).encode()
+    client = make_stream_client(monkeypatch, FakeResponse(body=body))
+    try:
+        assert client._post({}) == "done"
+        cancelled = threading.Event()
+        cancelled.set()
+        with pytest.raises(LLMError, match="cancelled"):
+            client._post({}, cancelled)
+    finally:
+        client.close()
+
+
+# ------------------------
+def make_async_client(handler, **kwargs):
+    import httpx
+
+    client = AsyncGroqClient("test-key", url="http://groq.invalid/chat", **kwargs)
+    client.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def sse_body(*deltas):
+    return ("\n".join(sse(*deltas)) + "\n").encode()
+
+
+def test_async_chat_stream_is_an_async_generator():
+    import httpx
+
+    async def scenario():
+        client = make_async_client(lambda request: httpx.Response(200, content=sse_body("Hel", "lo")),
+                                   max_concurrency=1, acquire_timeout_ms=0, latency_budget_ms=50,
+                                   failure_threshold=1)
+        stream = client.chat_stream([{"role": "user", "content": "hi"}])
+        first = await stream.__anext__()
+        await asyncio.sleep(0.1)  # slower than the latency budget
+        # Upstream is done, so the slot is already free for the next caller
+        assert await client._admit()
+        client._slots.release()
+        rest = [d async for d in stream]
+        await client.aclose()
+        return first, rest, client
+
+    first, rest, client = asyncio.run(scenario())
+    assert (first, rest) == ("Hel", ["lo"])
+    assert client.breaker.state == "closed"
+    assert client.metrics.as_dict().get("over_budget") is None
+
+
+def test_async_chat_stream_error_yields_nothing():
+    import httpx
+
+    async def scenario():
+        client = make_async_client(lambda request: httpx.Response(500, content=b"oops"), failure_threshold=1)
+        deltas = [d async for d in client.chat_stream([{"role": "user", "content": "hi"}])]
+        await client.aclose()
+        return deltas, client
+
+    deltas, client = asyncio.run(scenario())
+    assert deltas == []
+    assert client.breaker.state == "open"
@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from metrics import Registry, StageTimers, begin_request, end_request, server_timing_header, submit_in_context
+
+
+@pytest.fixture
+def timers():
+    registry = Registry()
+    return StageTimers(registry.histogram("stage_seconds", "Stage latency", labelnames=("stage",)))
+
+
+def timed(timers, name):
+    with timers.stage(name):
+        pass
+    return name
+
+
+def test_stages_on_worker_threads_reach_the_request_timings(timers):
+    timings = begin_request()
+    try:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            assert submit_in_context(pool, timed, timers, "vector_search").result() == "vector_search"
+            pool.submit(timed, timers, "lost").result()
+    finally:
+        end_request()
+    assert [name for name, _ in timings] == ["vector_search"]
+
+
+def test_stages_outside_a_request_only_feed_the_histogram(timers):
+    timed(timers, "embed")
+    assert "stage_seconds_count{stage=\"embed\"} 1" in timers.histogram.render()
+
+
+def test_server_timing_header_sums_repeated_stages():
+    header = server_timing_header([("embed", 0.001), ("vector_search", 0.002), ("embed", 0.003)])
+    assert header == "embed;dur=4.00, vector_search;dur=2.00"
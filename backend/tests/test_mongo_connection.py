@@ -0,0 +1,83 @@
+import pytest
+
+import mongo_connection
+
+
+class FakeClient:
+    created = []
+
+    def __init__(self, uri, **options):
+        self.uri = uri
+        self.options = options
+        self.closed = False
+        self.up = True
+        self.admin = self
+        FakeClient.created.append(self)
+
+    def command(self, name):
+        if not self.up:
+            raise ConnectionError("server down")
+        return {"ok": 1}
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    FakeClient.created = []
+    monkeypatch.setattr(mongo_connection.pymongo, "MongoClient", FakeClient)
+    monkeypatch.setattr(mongo_connection, "MONGO_HEALTH_INTERVAL_S", 0)
+    monkeypatch.setattr(mongo_connection, "MONGO_HEALTH_FAILURES", 2)
+    return mongo_connection.ConnectionManager("mongodb://localhost:27017")
+
+
+def test_client_is_created_once(manager):
+    assert manager.client() is manager.client()
+    assert len(FakeClient.created) == 1
+    assert manager.stats()["connects"] == 1
+
+
+def test_failed_pings_mark_unhealthy_without_replacing_the_client(manager):
+    client = manager.client()
+    client.up = False
+    assert manager.health_check() is True  # one failure is tolerated
+    assert manager.health_check() is False
+    assert manager.health_check() is False
+    assert manager.stats()["unhealthy_periods"] == 1
+    assert manager.client() is client
+    assert not client.closed
+    assert len(FakeClient.created) == 1
+
+    client.up = True
+    assert manager.health_check() is True
+    stats = manager.stats()
+    assert stats["healthy"] is True
+    assert stats["consecutive_failed_pings"] == 0
+    assert stats["last_ping_ms"] is not None
+
+
+def test_forked_child_builds_its_own_client(manager):
+    parent = manager.client()
+    manager._forget()
+    child = manager.client()
+    assert child is not parent
+    assert not parent.closed
+
+
+def test_close_closes_this_process_client(manager):
+    client = manager.client()
+    manager.close()
+    assert client.closed
+    assert manager.client() is not client
+
+
+def test_get_client_shares_one_client_per_uri(monkeypatch):
+    FakeClient.created = []
+    monkeypatch.setattr(mongo_connection.pymongo, "MongoClient", FakeClient)
+    monkeypatch.setattr(mongo_connection, "MONGO_HEALTH_INTERVAL_S", 0)
+    monkeypatch.setattr(mongo_connection, "_managers", {})
+    a = mongo_connection.get_client("mongodb://a")
+    assert mongo_connection.get_client("mongodb://a") is a
+    assert mongo_connection.get_client("mongodb://b") is not a
+    assert len(FakeClient.created) == 2
@@ -0,0 +1,66 @@
+import pytest
+from pymongo.errors import OperationFailure
+
+from mongo_pipeline import MongoNativePipeline
+
+FILTERS = {"min_year": 2000, "required_genres": ["Drama"]}
+
+
+class FakeCollection:
+    """aggregate() like an Atlas index built without filter fields: $vectorSearch.filter is rejected."""
+
+    def __init__(self, docs, filter_fields=False):
+        self.docs = docs
+        self.filter_fields = filter_fields
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        if "filter" in pipeline[0]["$vectorSearch"] and not self.filter_fields:
+            raise OperationFailure("PlanExecutor error :: caused by :: Path 'year' needs to be indexed as token")
+        return [dict(d, score=1.0 - i / 100) for i, d in enumerate(self.docs)]
+
+
+def make_pipeline(coll):
+    pipeline = MongoNativePipeline.__new__(MongoNativePipeline)
+    pipeline.coll = coll
+    pipeline.compact = None
+    pipeline.prefilter = True
+    pipeline.index_name = "movie_vector_index"
+    return pipeline
+
+
+def test_rejected_prefilter_falls_back_to_post_match_and_remembers():
+    coll = FakeCollection([{"title": "A", "year": 2001}, {"title": "B", "year": 2005}])
+    pipeline = make_pipeline(coll)
+
+    results = pipeline._vector_search([0.1, 0.2], None, 10, FILTERS, 200, 0.5)
+    assert [r["title"] for r in results] == ["A", "B"]
+    assert pipeline.prefilter is False
+    retried = coll.pipelines[-1]
+    assert "filter" not in retried[0]["$vectorSearch"]
+    assert retried[1]["$match"]["$and"][0] == {"year": {"$gte": 2000}}
+
+    # Later queries go straight to the post-$match pipeline
+    pipeline._vector_search([0.1, 0.2], None, 10, FILTERS, 200, 0.5)
+    assert len(coll.pipelines) == 3
+    assert "filter" not in coll.pipelines[-1][0]["$vectorSearch"]
+
+
+def test_prefilter_kept_when_the_index_declares_filter_fields():
+    coll = FakeCollection([{"title": "A"}], filter_fields=True)
+    pipeline = make_pipeline(coll)
+    pipeline._vector_search([0.1], None, 10, FILTERS, 200, 0.5)
+    assert pipeline.prefilter is True
+    assert coll.pipelines[0][0]["$vectorSearch"]["filter"]["$and"][0] == {"year": {"$gte": 2000}}
+
+
+def test_other_operation_failures_are_raised():
+    class Broken(FakeCollection):
+        def aggregate(self, pipeline):
+            raise OperationFailure("$vectorSearch is not allowed")
+
+    pipeline = make_pipeline(Broken([]))
+    with pytest.raises(OperationFailure):
+        pipeline._vector_search([0.1], None, 10, FILTERS, 200, 0.5)
+    assert pipeline.prefilter is True
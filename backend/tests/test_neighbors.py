@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+import pytest
+
+from neighbors import NeighborTable, compute_neighbors
+
+os.environ.setdefault("LAZY_STARTUP", "true")
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    return np.random.default_rng(4).standard_normal((53, 12)).astype(np.float32)
+
+
+def brute_force(vectors, k):
+    m = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    sims = m @ m.T
+    np.fill_diagonal(sims, -np.inf)
+    order = np.argsort(-sims, axis=1, kind="stable")[:, :k]
+    return order, np.take_along_axis(sims, order, axis=1)
+
+
+def test_blocked_neighbors_match_brute_force(vectors):
+    rows, sims = compute_neighbors(vectors, k=5, block_rows=7, col_block=11, workers=3)
+    expected_rows, expected_sims = brute_force(vectors, 5)
+    np.testing.assert_array_equal(rows, expected_rows)
+    np.testing.assert_allclose(sims, expected_sims, rtol=1e-5, atol=1e-6)
+    assert rows.dtype == np.int32
+    assert not (rows == np.arange(len(vectors))[:, None]).any()
+
+
+def test_k_is_capped_at_the_other_movies(vectors):
+    rows, _ = compute_neighbors(vectors[:4], k=10)
+    assert rows.shape == (4, 3)
+    rows, _ = compute_neighbors(vectors[:1], k=10)
+    assert rows.shape == (1, 0)
+
+
+def test_saved_table_is_memory_mapped_and_looks_up_by_id(tmp_path, vectors):
+    ids = [f"tt{i}" for i in range(len(vectors))]
+    rows, sims = compute_neighbors(vectors, k=4)
+    manifest = NeighborTable(ids, rows, sims).save(str(tmp_path), source="cinebot.movies")
+    assert (manifest["movies"], manifest["k"]) == (53, 4)
+
+    table = NeighborTable.load(str(tmp_path))
+    assert isinstance(table.rows, np.memmap)
+    hits = table.lookup("tt0")
+    assert [n for n, _ in hits] == [ids[r] for r in rows[0]]
+    # float16 scores on the (1 + cos) / 2 scale
+    np.testing.assert_allclose([s for _, s in hits], (1 + sims[0]) / 2, atol=1e-3)
+    assert len(table.lookup("tt0", limit=2)) == 2
+    assert table.lookup("nope") is None
+
+
+def test_similar_endpoint_serves_table_neighbors_in_order(monkeypatch, vectors):
+    mongomock = pytest.importorskip("mongomock")
+    import flask_server as fs
+
+    coll = mongomock.MongoClient()["cinebot"]["movies"]
+    coll.insert_many([{"_id": f"tt{i}", "id": f"tt{i}", "title": f"Movie {i}"} for i in range(5)])
+    coll.update_one({"id": "tt4"}, {"$set": {"neighbors": ["tt1", "tt2"], "neighbor_scores": [0.9, 0.8]}})
+    table = NeighborTable([f"tt{i}" for i in range(4)], np.array([[2, 1], [0, 3], [3, 0], [1, 2]]),
+                          np.array([[0.8, 0.6]] * 4, dtype=np.float16))
+    monkeypatch.setattr(fs, "get_coll", lambda: coll)
+    monkeypatch.setattr(fs, "get_neighbor_table", lambda: table)
+    client = fs.app.test_client()
+
+    body = client.get("/similar/tt0").get_json()
+    assert [r["id"] for r in body["results"]] == ["tt2", "tt1"]
+    # Not in the table: falls back to the document's own neighbours
+    assert [r["id"] for r in client.get("/similar/tt4?limit=1").get_json()["results"]] == ["tt1"]
+    assert client.get("/similar/tt9").status_code == 404
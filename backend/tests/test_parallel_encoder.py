@@ -0,0 +1,61 @@
+import time
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+import pytest
+
+import parallel_encoder
+from parallel_encoder import ParallelEncoder
+
+
+class SlowShortTexts:
+    """Worker model stand-in: [len(text), batch_size]; shorter texts take longer, so shards finish out of order."""
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        time.sleep(0.02 / max(1, min(len(t) for t in texts)))
+        return np.array([[len(t), batch_size] for t in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def encoder(monkeypatch):
+    monkeypatch.setattr(parallel_encoder, "_worker_model", SlowShortTexts())
+    enc = ParallelEncoder("local", workers=3, threads_per_worker=1, prefetch=2)
+    # Threads instead of spawned processes: same apply_async interface, no model loading
+    enc._pool = ThreadPool(3)
+    yield enc
+    enc.close()
+
+
+def test_encode_scatters_shards_back_into_input_order(encoder):
+    texts = ["x" * n for n in (5, 1, 9, 3, 7, 2, 8, 4, 6, 10, 1)]
+    job = encoder.submit(texts, batch_size=2)
+    assert len(job.shards) == 3
+    out = job.result()
+    assert out[:, 0].tolist() == [float(len(t)) for t in texts]
+    assert set(out[:, 1]) == {2.0}
+
+
+def test_empty_batch(encoder):
+    assert encoder.encode([]).shape == (0, 0)
+
+
+def test_map_ordered_yields_in_submission_order_with_bounded_prefetch(encoder):
+    submitted = []
+
+    def items():
+        for key in range(8):
+            submitted.append(key)
+            # Later keys have longer texts, so they finish first
+            yield key, ["y" * (key + 1)] * 4
+
+    seen = []
+    for key, vectors in encoder.map_ordered(items(), batch_size=2):
+        assert len(submitted) - key <= encoder.prefetch + 1
+        assert vectors[:, 0].tolist() == [float(key + 1)] * 4
+        seen.append(key)
+    assert seen == list(range(8))
+
+
+def test_remote_provider_is_rejected():
+    with pytest.raises(ValueError, match="local provider"):
+        ParallelEncoder("huggingface")
@@ -0,0 +1,127 @@
+import ast
+import os
+import re
+import sys
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("nltk")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python-scripts"))
+
+import preprocessing  # noqa: E402
+from nltk.tokenize import TreebankWordTokenizer  # noqa: E402
+
+STOP_WORDS = {"a", "an", "the", "of", "in", "and", "to", "is"}
+
+
+# Row-wise reference: the parsing and cleaning functions of preprocessing3.ipynb
+def ref_duration(duration):
+    if pd.isna(duration):
+        return 0
+    if isinstance(duration, int):
+        return duration
+    total = 0
+    for part in duration.split():
+        if "h" in part:
+            total += int(part[:-1]) * 60
+        elif "m" in part:
+            total += int(part[:-1])
+    return total
+
+
+def ref_parse_list(cell):
+    if pd.isnull(cell) or cell == "":
+        return []
+    try:
+        return ast.literal_eval(cell)
+    except (ValueError, SyntaxError):
+        return cell.split(", ")
+
+
+def ref_doc(row):
+    tokenizer = TreebankWordTokenizer()
+
+    def clean(text, letters_only=True):
+        text = (text or "").lower()
+        if letters_only:
+            text = re.sub(r"[^a-z\s]", "", text)
+        return " ".join(w for w in tokenizer.tokenize(text) if w not in STOP_WORDS)
+
+    def names(cell):
+        return " ".join(re.sub(r"[^a-zA-Z]", "", n).lower() for n in ref_parse_list(cell))
+
+    def joined(cell):
+        return " ".join(clean(x) for x in ref_parse_list(cell))
+
+    parts = [
+        clean(row["title"], letters_only=False), clean(row["description"]), names(row["stars"]),
+        names(row["directors"]), joined(row["genres"]), joined(row["production_companies"]),
+        joined(row["filming_locations"]), names(row["languages"]), names(row["countries_origin"]),
+    ]
+    return re.sub(r"\s+", " ", " ".join(parts)).strip()
+
+
+@pytest.fixture
+def raw():
+    return pd.DataFrame({
+        "id": ["tt1", "tt2", "tt3", "tt2"],
+        "title": ["The Matrix", "Amélie", "Up", "Amélie (dup)"],
+        "year": [1999, 2001, None, 2001],
+        "duration": ["2h 16m", "2h", "1h 36m", "45m"],
+        "mpa": ["R", "R", "PG", "R"],
+        "rating": [8.7, 8.3, 8.3, 8.3],
+        "description": ["A hacker learns the truth.", "A shy waitress, in Paris!", None, "A shy waitress in Paris."],
+        "stars": ["['Keanu Reeves', 'Carrie-Anne Moss']", "['Audrey Tautou']", "[]", "['Audrey Tautou']"],
+        "directors": ["['Lana Wachowski']", "['Jean-Pierre Jeunet']", "['Pete Docter']", "['J-P Jeunet']"],
+        "writers": ["['Lilly Wachowski']", "", "['Bob Peterson']", ""],
+        "genres": ["['Action', 'Sci-Fi']", "['Comedy', 'Romance']", "Animation, Adventure", "['Comedy']"],
+        "languages": ["['English']", "['French']", "['English']", "['French']"],
+        "countries_origin": ["['United States']", "['France', 'Germany']", "['United States']", "['France']"],
+        "filming_locations": ["['Sydney, Australia']", "[\"Café des 2 Moulins, Paris\"]", "", "[]"],
+        "production_companies": ["['Warner Bros.']", "['UGC']", "['Pixar']", "['UGC']"],
+        "awards_content": ["['Won 4 Oscars']", "", "['Won 2 Oscars']", ""],
+    })
+
+
+def test_column_parsers_match_the_row_wise_notebook(raw):
+    assert preprocessing.convert_duration(raw["duration"]).tolist() == [ref_duration(d) for d in raw["duration"]]
+    assert preprocessing.convert_duration(pd.Series([130, None])).tolist() == [130, 0]
+    for col in ("stars", "genres", "filming_locations", "writers", "countries_origin"):
+        assert preprocessing.parse_list_column(raw[col]).tolist() == [ref_parse_list(c) for c in raw[col]], col
+
+
+def test_list_items_with_quotes_and_commas():
+    cells = pd.Series(["[\"O'Brien\", 'Smith, Jr.']", None])
+    expected = [["O'Brien", "Smith, Jr."], []]
+    assert preprocessing.parse_list_column(cells).tolist() == expected == [ref_parse_list(c) for c in cells]
+
+
+def test_year_is_extracted_from_release_date_when_missing():
+    df = preprocessing.ensure_year(pd.DataFrame({"release_date": ["1999-03-31", "unknown", None]}))
+    assert df["year"].tolist() == [1999, 0, 0]
+
+
+def test_movie_table_docs_match_the_row_wise_notebook(raw, monkeypatch):
+    monkeypatch.setattr(preprocessing, "load_stop_words", lambda: STOP_WORDS)
+    table = preprocessing.build_movie_table(raw.copy(), processes=1, chunksize=2)
+
+    expected_rows = raw.drop_duplicates("id", keep="last").fillna({"description": "", "writers": ""})
+    assert table.index.tolist() == ["tt1", "tt3", "tt2"]
+    assert table["docs"].tolist() == [ref_doc(r) for _, r in expected_rows.iterrows()]
+    assert table.loc["tt2", "duration"] == 45
+    assert table.loc["tt3", "genres"] == ["Animation", "Adventure"]
+    assert table.loc["tt1", "writers"] == ["Lilly Wachowski"]
+
+
+def test_parquet_keeps_list_and_int_columns(raw, monkeypatch, tmp_path):
+    pytest.importorskip("pyarrow")
+    monkeypatch.setattr(preprocessing, "load_stop_words", lambda: STOP_WORDS)
+    table = preprocessing.build_movie_table(raw.copy(), processes=1)
+    path = str(tmp_path / "movies.parquet")
+    preprocessing.write_parquet(table, path)
+
+    back = pd.read_parquet(path)
+    assert list(back.loc["tt1", "stars"]) == ["Keanu Reeves", "Carrie-Anne Moss"]
+    assert list(back.loc["tt3", "stars"]) == []
+    assert back["year"].dtype == "int64" and back["duration"].dtype == "int64"
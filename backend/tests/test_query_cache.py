@@ -0,0 +1,103 @@
+import pytest
+
+import query_cache
+from query_cache import LRUCache, SQLiteCache, make_cache, make_key, normalize_query
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(query_cache.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache_factory(request, tmp_path):
+    def build(name="search", maxsize=8, ttl=None):
+        return make_cache(name, maxsize, ttl, request.param, str(tmp_path / "cache.sqlite3"))
+
+    return build
+
+
+def test_keys_normalize_whitespace_and_case():
+    assert normalize_query("  Space   HEIST\n") == "space heist"
+    assert make_key("search", {"b": 1, "a": 2}) == make_key("search", {"a": 2, "b": 1})
+
+
+def test_get_set_and_stats(cache_factory):
+    cache = cache_factory()
+    assert cache.get("k") is None
+    assert cache.get("k", "default") == "default"
+    cache.set("k", [{"id": "tt1", "score": 0.5}])
+    assert cache.get("k") == [{"id": "tt1", "score": 0.5}]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 2, 1)
+
+
+def test_callers_cannot_mutate_cached_values(cache_factory):
+    cache = cache_factory()
+    results = [{"id": "tt1", "genres": ["Drama"]}]
+    cache.set("k", results)
+    results[0]["genres"].append("Action")
+
+    got = cache.get("k")
+    got[0]["title"] = "changed"
+    got.append({"id": "tt2"})
+    assert cache.get("k") == [{"id": "tt1", "genres": ["Drama"]}]
+
+    cache.set("vec", [0.1, 0.2])
+    vec = cache.get("vec")
+    vec[0] = 9.0
+    assert cache.get("vec") == [0.1, 0.2]
+
+
+def test_entries_expire_after_ttl(cache_factory, clock):
+    cache = cache_factory(ttl=60)
+    cache.set("k", "v")
+    clock[0] += 59
+    assert cache.get("k") == "v"
+    clock[0] += 2
+    assert cache.get("k") is None
+    assert cache.stats()["expirations"] == 1
+    assert len(cache) == 0
+
+
+def test_memory_lru_evicts_least_recently_used():
+    cache = LRUCache("search", maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_sqlite_trims_least_recently_used_rows(tmp_path, clock):
+    cache = SQLiteCache("search", str(tmp_path / "c.sqlite3"), maxsize=10)
+    for i in range(63):
+        clock[0] += 1
+        cache.set(f"k{i}", i)
+    clock[0] += 1
+    assert cache.get("k0") == 0  # touched, so it survives the trim
+    clock[0] += 1
+    cache.set("k63", 63)  # 64th write trims to maxsize
+    assert len(cache) == 10
+    assert cache.get("k0") == 0
+    assert cache.get("k1") is None
+    assert cache.get("k63") == 63
+    assert cache.stats()["evictions"] == 54
+
+
+def test_sqlite_is_shared_between_instances_and_namespaced(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    writer = SQLiteCache("search", path)
+    reader = SQLiteCache("search", path)
+    other = SQLiteCache("groq", path)
+    writer.set("k", {"results": [1, 2]})
+    assert reader.get("k") == {"results": [1, 2]}
+    assert other.get("k") is None
+    other.set("k", "text")
+    reader.clear()
+    assert writer.get("k") is None
+    assert other.get("k") == "text"
@@ -0,0 +1,111 @@
+import hashlib
+import os
+
+import numpy as np
+import pytest
+
+from mongo_pipeline import MongoNativePipeline
+from vector_index import LocalVectorIndex
+
+os.environ.setdefault("LAZY_STARTUP", "true")
+mongomock = pytest.importorskip("mongomock")
+
+
+def fake_vector(text):
+    seed = int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
+    return np.random.default_rng(seed).standard_normal(16).astype(np.float32)
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        self.calls.append(list(texts))
+        return np.stack([fake_vector(t) for t in texts])
+
+
+@pytest.fixture(scope="module")
+def movies():
+    docs = [{"id": f"tt{i}", "title": f"Movie {i}", "year": 1960 + i % 60, "genres": ["Drama" if i % 2 else "Action"],
+             "rating": float(i % 10), "description": f"movie {i} about thing{i % 7}"} for i in range(120)]
+    vectors = np.stack([fake_vector(d["description"]) for d in docs])
+    return docs, vectors
+
+
+@pytest.fixture
+def server(monkeypatch, movies):
+    import flask_server as fs
+
+    docs, vectors = movies
+    coll = mongomock.MongoClient()["cinebot"]["movies"]
+    coll.insert_many([dict(d, _id=d["id"], embedding=v.tolist()) for d, v in zip(docs, vectors)])
+    index = LocalVectorIndex().build(vectors, docs)
+    embed_calls = []
+
+    def embed_many(texts):
+        embed_calls.append(list(texts))
+        return [fake_vector(t).tolist() for t in texts]
+
+    monkeypatch.setattr(fs, "get_coll", lambda: coll)
+    monkeypatch.setattr(fs, "get_local_index", lambda: index)
+    monkeypatch.setattr(fs, "_embed_batch_uncached", embed_many)
+    monkeypatch.setattr(fs, "_embed_uncached", lambda text: embed_many([text])[0])
+    monkeypatch.setattr(fs, "LEXICAL_BACKEND", "regex")
+    monkeypatch.setattr(fs, "SEARCH_BATCH_MAX", 4)
+    for cache in (fs.embedding_cache, fs.search_cache):
+        cache.clear()
+    return fs.app.test_client(), embed_calls, fs
+
+
+def test_batch_matches_single_searches_in_order(server):
+    client, embed_calls, fs = server
+    queries = [
+        {"query": "movie 5"},
+        {"query": "thing3", "negative_query": "war", "filters": {"genres": {"$in": ["Drama"]}}},
+        "movie 9",
+        {"query": "movie 3", "mode": "lexical"},
+    ]
+    body = client.post("/search/batch", json={"limit": 4, "queries": queries}).get_json()
+    assert len(body["responses"]) == 4
+    # Every cache miss (positives and the negative) embedded in one call
+    assert embed_calls == [["movie 5", "thing3", "movie 9", "war"]]
+
+    fs.search_cache.clear()
+    for response, q in zip(body["responses"], queries):
+        q = q if isinstance(q, dict) else {"query": q}
+        single = client.post("/search", json=dict({"limit": 4}, **q)).get_json()["results"]
+        assert [r["id"] for r in response["results"]] == [r["id"] for r in single]
+        assert response["cached"] is False
+
+
+def test_repeated_batch_is_served_from_the_search_cache(server):
+    client, embed_calls, _ = server
+    payload = {"limit": 3, "queries": ["movie 1", "movie 2"]}
+    first = client.post("/search/batch", json=payload).get_json()["responses"]
+    second = client.post("/search/batch", json=payload).get_json()["responses"]
+    assert [r["cached"] for r in second] == [True, True]
+    assert [r["results"] for r in second] == [r["results"] for r in first]
+    assert len(embed_calls) == 1
+
+
+def test_invalid_batches_are_rejected(server):
+    client, _, _ = server
+    assert client.post("/search/batch", json={"queries": "movie"}).status_code == 400
+    assert client.post("/search/batch", json={"queries": ["a"] * 5}).status_code == 400
+    assert client.post("/search/batch", json={"queries": []}).get_json()["responses"] == []
+
+
+def test_pipeline_search_many_encodes_once_and_keeps_order(movies):
+    docs, vectors = movies
+    pipeline = MongoNativePipeline.__new__(MongoNativePipeline)
+    pipeline.model = FakeModel()
+    pipeline.encoder = None
+    index = LocalVectorIndex().build(vectors, docs)
+    queries = ["movie 4", {"query_text": "thing2", "negative_query": "crime", "top_k": 3,
+                           "filters": {"required_genres": ["Drama"]}}]
+    out = pipeline.search_many(queries, top_k_raw=50, index=index)
+    assert pipeline.model.calls == [["movie 4", "thing2", "crime"]]
+    assert [r["id"] for r in out[0]["results"]] == [r["id"] for r in index.search(fake_vector("movie 4"), 10, 50)]
+    assert len(out[1]["results"]) == 3
+    assert all("Drama" in r["genres"] for r in out[1]["results"])
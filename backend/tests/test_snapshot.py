@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from mongo_pipeline import MongoNativePipeline  # noqa: E402
+from snapshot import SnapshotWriter, iter_snapshot, load_snapshot, read_manifest  # noqa: E402
+from vector_index import LocalVectorIndex  # noqa: E402
+
+
+def make_docs(n):
+    return [{"id": f"tt{i}", "title": f"Movie {i}", "year": 1990 + i, "rating": 7.0, "duration": None,
+             "genres": ["Drama", "Comedy"] if i % 2 else "Drama", "languages": None,
+             "embedding_model": "minilm@v1"} for i in range(n)]
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(2).standard_normal((25, 16)).astype(np.float32) * 3
+
+
+def write_snapshot(path, docs, vectors, rows=None, batch=10):
+    writer = SnapshotWriter(str(path), rows or len(docs))
+    for start in range(0, len(docs), batch):
+        writer.add(docs[start:start + batch], vectors[start:start + batch])
+    return writer.close(version="v1", source="cinebot.movies")
+
+
+def test_round_trip_memory_maps_unit_vectors(tmp_path, vectors):
+    path = tmp_path / "snap"
+    manifest = write_snapshot(path, make_docs(25), vectors)
+    assert (manifest["count"], manifest["dim"], manifest["embedding_models"]) == (25, 16, ["minilm@v1"])
+    assert read_manifest(str(path))["version"] == "v1"
+
+    _, mapped, docs = load_snapshot(str(path))
+    assert isinstance(mapped, np.memmap) and not mapped.flags.writeable
+    np.testing.assert_allclose(mapped, vectors / np.linalg.norm(vectors, axis=1, keepdims=True), rtol=1e-6)
+    assert docs[1]["genres"] == ["Drama", "Comedy"] and docs[0]["genres"] == ["Drama"]
+    assert docs[0]["languages"] == [] and docs[0]["duration"] is None and docs[3]["year"] == 1993
+
+    restored = np.concatenate([v for _, v in iter_snapshot(str(path), batch_size=7)])
+    np.testing.assert_allclose(restored, vectors, rtol=1e-5)
+
+
+def test_unfilled_rows_are_trimmed(tmp_path, vectors):
+    path = tmp_path / "snap"
+    manifest = write_snapshot(path, make_docs(20), vectors[:20], rows=25)
+    _, mapped, docs = load_snapshot(str(path))
+    assert manifest["count"] == len(mapped) == len(docs) == 20
+
+
+def test_index_from_snapshot_matches_index_from_vectors(tmp_path, vectors):
+    path = tmp_path / "snap"
+    docs = make_docs(25)
+    write_snapshot(path, docs, vectors)
+    from_snapshot = LocalVectorIndex.from_snapshot(str(path))
+    direct = LocalVectorIndex().build(vectors, [{"id": d["id"]} for d in docs])
+    for q in vectors[:5]:
+        assert [r["id"] for r in from_snapshot.search(q, 5)] == [r["id"] for r in direct.search(q, 5)]
+
+
+def test_collection_export_and_import(tmp_path, vectors):
+    mongomock = pytest.importorskip("mongomock")
+    pipeline = MongoNativePipeline.__new__(MongoNativePipeline)
+    pipeline.coll = mongomock.MongoClient()["cinebot"]["movies"]
+    pipeline.compact = None
+    pipeline.store_float = True
+    pipeline.coll.insert_many([dict(d, _id=d["id"], embedding=v.tolist()) for d, v in zip(make_docs(25), vectors)])
+    pipeline.coll.insert_one({"_id": "no-vector", "id": "no-vector", "title": "Missing"})
+
+    path = str(tmp_path / "snap")
+    assert pipeline.export_snapshot(path, batch_size=10)["count"] == 25
+
+    restored = mongomock.MongoClient()["cinebot"]["restored"]
+    assert pipeline.import_snapshot(path, coll=restored) == 25
+    doc = restored.find_one({"_id": "tt4"})
+    np.testing.assert_allclose(doc["embedding"], vectors[4], rtol=1e-5)
+    assert doc["title"] == "Movie 4" and "duration" not in doc
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from compact_embeddings import _synthetic_vectors
+from vector_index import LocalVectorIndex, matches_filter, rerank_results
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    vectors = _synthetic_vectors(2000, 64, seed=5)
+    docs = [{"id": f"tt{i}", "title": f"Movie {i}", "year": 1950 + i % 75,
+             "genres": ["Drama" if i % 3 else "Comedy"], "rating": float(i % 10)} for i in range(len(vectors))]
+    return vectors, docs
+
+
+def brute_force(vectors, query, k):
+    m = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    sims = m @ (query / np.linalg.norm(query))
+    return list(np.argsort(-sims, kind="stable")[:k]), sims
+
+
+def test_exact_top_k_matches_brute_force(catalog):
+    vectors, docs = catalog
+    index = LocalVectorIndex().build(vectors, docs)
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        q = rng.standard_normal(vectors.shape[1]).astype(np.float32)
+        rows, sims = index.top_k(q, 10)
+        expected, all_sims = brute_force(vectors, q, 10)
+        assert list(rows) == expected
+        np.testing.assert_allclose(sims, all_sims[expected], rtol=1e-5, atol=1e-6)
+
+
+def test_search_uses_vector_search_score_scale(catalog):
+    vectors, docs = catalog
+    index = LocalVectorIndex().build(vectors, docs)
+    results = index.search(vectors[7], limit=3, num_candidates=50)
+    assert results[0]["id"] == "tt7"
+    assert results[0]["score"] == pytest.approx(1.0, abs=1e-5)
+    assert all(0.0 <= r["score"] <= 1.0 for r in results)
+    assert [r["score"] for r in results] == sorted((r["score"] for r in results), reverse=True)
+
+
+def test_ivf_recall_against_brute_force(catalog):
+    vectors, docs = catalog
+    index = LocalVectorIndex(mode="ivf", nlist=32, nprobe=8).build(vectors, docs)
+    queries = vectors[np.random.default_rng(1).choice(len(vectors), 50, replace=False)]
+    hits = 0
+    for q in queries:
+        rows, _ = index.top_k(q, 10)
+        hits += len(set(rows) & set(brute_force(vectors, q, 10)[0]))
+    assert hits / (10 * len(queries)) >= 0.8
+
+    # Probing every list is exhaustive
+    index.nprobe = 32
+    rows, _ = index.top_k(queries[0], 10)
+    assert list(rows) == brute_force(vectors, queries[0], 10)[0]
+
+
+def test_filters_apply_before_the_candidate_cut(catalog):
+    vectors, docs = catalog
+    index = LocalVectorIndex().build(vectors, docs)
+    flt = {"$and": [{"year": {"$gte": 2020}}, {"genres": {"$in": ["Comedy"]}}]}
+    results = index.search(vectors[0], limit=10, num_candidates=10, filters=flt)
+    assert len(results) == 10
+    assert all(matches_filter(r, flt) for r in results)
+
+    allowed = np.array([matches_filter(d, flt) for d in docs])
+    _, sims = brute_force(vectors, vectors[0], len(docs))
+    expected = [docs[i]["id"] for i in np.flatnonzero(allowed)[np.argsort(-sims[allowed], kind="stable")][:10]]
+    assert [r["id"] for r in results] == expected
+
+
+def test_search_many_matches_search(catalog):
+    vectors, docs = catalog
+    index = LocalVectorIndex().build(vectors, docs)
+    queries = [vectors[3], vectors[11], vectors[42]]
+    filters = [None, {"genres": {"$in": ["Drama"]}}, {"rating": {"$gte": 8}}]
+    negatives = [None, vectors[5], None]
+    batched = index.search_many(queries, [5, 5, 3], 50, filters, negatives, 0.5)
+    for i, (results, elapsed_ms) in enumerate(batched):
+        single = index.search(queries[i], [5, 5, 3][i], 50, filters[i], negatives[i], 0.5)
+        assert [r["id"] for r in results] == [r["id"] for r in single]
+        assert elapsed_ms >= 0
+
+
+def test_rerank_results_pushes_down_the_negative_direction():
+    pos = np.array([1.0, 0.0, 0.0])
+    neg = np.array([0.0, 1.0, 0.0])
+    results = [
+        {"id": "a", "embedding": [0.9, 0.4, 0.0]},
+        {"id": "b", "embedding": [0.8, -0.2, 0.0]},
+        {"id": "c"},
+    ]
+    out = rerank_results(results, pos, neg, negative_weight=1.0, limit=3)
+    assert [r["id"] for r in out] == ["b", "a", "c"]
+    assert all("embedding" not in r for r in out)
@@ -0,0 +1,406 @@
+import time
+import numpy as np
+
+from attribute_index import AttributeIndex
+
+# Fields returned by /search (mirrors the $project stage in flask_server.py)
+PROJECTED_FIELDS = ("id", "title", "year", "genres", "languages", "rating", "duration", "description")
+# Above this fraction of allowed rows, oversample the unfiltered top-k instead of scanning the subset
+PREFILTER_OVERSAMPLE_SELECTIVITY = 0.5
+# Upper bound on floats in one (rows x queries) score block of search_many
+BATCH_SCORE_BLOCK = 1 << 25
+
+
+def _compare(value, op, operand):
+    """Evaluate a single Mongo comparison operator against a document value."""
+    values = value if isinstance(value, list) else [value]
+    if op == "$eq":
+        return operand in values or value == operand
+    if op == "$ne":
+        return not (operand in values or value == operand)
+    if op == "$in":
+        return any(v in operand for v in values)
+    if op == "$nin":
+        return not any(v in operand for v in values)
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        for v in values:
+            if v is None or isinstance(v, (list, dict)):
+                continue
+            try:
+                if op == "$gt" and v > operand:
+                    return True
+                if op == "$gte" and v >= operand:
+                    return True
+                if op == "$lt" and v < operand:
+                    return True
+                if op == "$lte" and v <= operand:
+                    return True
+            except TypeError:
+                continue
+        return False
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+def matches_filter(doc, flt):
+    """Return True if doc satisfies a Mongo-style filter.
+
+    Supports the subset produced by buildMongoFilters / search_similar:
+    $and, $or, equality and $eq/$ne/$in/$nin/$gt/$gte/$lt/$lte.
+    """
+    if not flt:
+        return True
+    for key, cond in flt.items():
+        if key == "$and":
+            if not all(matches_filter(doc, c) for c in cond):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(doc, c) for c in cond):
+                return False
+        elif isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+            value = doc.get(key)
+            if not all(_compare(value, op, operand) for op, operand in cond.items()):
+                return False
+        elif not _compare(doc.get(key), "$eq", cond):
+            return False
+    return True
+
+
+def _unit(vector):
+    v = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
+
+
+def _argtop(scores, k):
+    """Indices of the k largest scores, best first."""
+    k = min(k, len(scores))
+    if k < len(scores):
+        part = np.argpartition(-scores, k - 1)[:k]
+    else:
+        part = np.arange(len(scores))
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+def rerank_scores(candidate_matrix, positive_vector, negative_vector=None, negative_weight=0.5):
+    """Vectorized re-rank score for every candidate row.
+
+    score = pos_sim - negative_weight * neg_sim, where both similarities use the
+    vectorSearchScore scale (1 + cos) / 2. Without a negative vector this is
+    just the positive similarity.
+    """
+    m = np.asarray(candidate_matrix, dtype=np.float32)
+    if m.ndim != 2 or not len(m):
+        return np.zeros(0, dtype=np.float32)
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    m = m / norms
+    scores = (1.0 + m @ _unit(positive_vector)) / 2.0
+    if negative_vector is not None:
+        scores -= negative_weight * (1.0 + m @ _unit(negative_vector)) / 2.0
+    return scores
+
+
+def rerank_results(results, positive_vector, negative_vector=None, negative_weight=0.5, limit=None,
+                   keep_embedding=False):
+    """Re-rank docs that carry their `embedding` and return the top `limit`.
+
+    Docs without an embedding keep their original order after the scored ones.
+    """
+    scored = [r for r in results if r.get("embedding")]
+    unscored = [r for r in results if not r.get("embedding")]
+    if scored:
+        scores = rerank_scores([r["embedding"] for r in scored], positive_vector, negative_vector, negative_weight)
+        order = np.argsort(-scores, kind="stable")
+        reranked = []
+        for i in order:
+            doc = dict(scored[i])
+            doc["score"] = float(scores[i])
+            reranked.append(doc)
+        scored = reranked
+    out = scored + unscored
+    if not keep_embedding:
+        for doc in out:
+            doc.pop("embedding", None)
+    return out[:limit] if limit is not None else out
+
+
+class LocalVectorIndex:
+    """In-process cosine-similarity index over the `embedding` field.
+
+    All vectors live in one contiguous float32 matrix, L2-normalized once at
+    build time, so a query is a single matrix-vector product followed by an
+    argpartition top-k. mode="ivf" adds an inverted-file coarse quantizer
+    (spherical k-means) that only scores the `nprobe` closest clusters.
+    Filters over the AttributeIndex fields are applied before scoring.
+    """
+
+    def __init__(self, mode="exact", nlist=None, nprobe=8, kmeans_iters=10, seed=0):
+        if mode not in ("exact", "ivf"):
+            raise ValueError(f"Unknown index mode: {mode}")
+        self.mode = mode
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.kmeans_iters = kmeans_iters
+        self.seed = seed
+        self.ids = []
+        self.docs = []
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.centroids = None
+        self.list_order = None
+        self.list_offsets = None
+        self.attributes = None
+
+    def __len__(self):
+        return len(self.docs)
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1] if self.matrix.ndim == 2 else 0
+
+    # ------------------------
+    @classmethod
+    def from_collection(cls, coll, batch_size=2000, **kwargs):
+        """Load every document with an embedding from a pymongo collection."""
+        projection = {"_id": 0, "embedding": 1}
+        projection.update({f: 1 for f in PROJECTED_FIELDS})
+        cursor = coll.find({"embedding": {"$exists": True}}, projection, batch_size=batch_size)
+
+        docs, vectors = [], []
+        for doc in cursor:
+            vec = doc.pop("embedding", None)
+            if not vec:
+                continue
+            docs.append(doc)
+            vectors.append(vec)
+
+        index = cls(**kwargs)
+        index.build(vectors, docs)
+        return index
+
+    @classmethod
+    def from_snapshot(cls, path, **kwargs):
+        """Build from a snapshot directory (see snapshot.py); the vectors stay memory-mapped."""
+        from snapshot import load_snapshot
+
+        _, vectors, docs = load_snapshot(path, columns=PROJECTED_FIELDS)
+        index = cls(**kwargs)
+        index.build(vectors, docs, normalized=True)
+        return index
+
+    def build(self, vectors, docs, normalized=False):
+        """Build the index from a sequence of vectors and their metadata docs.
+
+        normalized=True takes already unit-length float32 rows as they are,
+        so a read-only memory-mapped matrix is used without a copy.
+        """
+        if len(vectors) != len(docs):
+            raise ValueError("vectors and docs must have the same length")
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2:
+            matrix = matrix.reshape(len(docs), -1)
+        if not normalized:
+            matrix = np.array(matrix, order="C")
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix /= norms
+
+        self.matrix = matrix
+        self.docs = list(docs)
+        self.ids = [d.get("id") for d in self.docs]
+        self.attributes = AttributeIndex(self.docs)
+        if self.mode == "ivf" and len(self.docs):
+            self._train_ivf()
+        return self
+
+    # ------------------------
+    def _train_ivf(self):
+        """Spherical k-means coarse quantizer + CSR-style inverted lists."""
+        n = self.matrix.shape[0]
+        nlist = self.nlist or max(1, int(np.sqrt(n)))
+        nlist = min(nlist, n)
+        rng = np.random.default_rng(self.seed)
+
+        # Train on a sample to keep startup bounded for large catalogs
+        sample_size = min(n, max(nlist * 64, 10000))
+        sample = self.matrix[rng.choice(n, size=sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, size=nlist, replace=False)].copy()
+
+        for _ in range(self.kmeans_iters):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assign == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids /= norms
+
+        # Assign the full matrix in chunks to bound memory
+        assign = np.empty(n, dtype=np.int32)
+        for start in range(0, n, 8192):
+            block = self.matrix[start:start + 8192]
+            assign[start:start + 8192] = np.argmax(block @ centroids.T, axis=1)
+
+        order = np.argsort(assign, kind="stable").astype(np.int64)
+        counts = np.bincount(assign, minlength=nlist)
+        self.centroids = np.ascontiguousarray(centroids)
+        self.list_order = order
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.nlist = nlist
+
+    def _candidate_rows(self, q):
+        if self.mode != "ivf" or self.centroids is None:
+            return None
+        nprobe = min(self.nprobe, len(self.centroids))
+        centroid_scores = self.centroids @ q
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        parts = [self.list_order[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probe]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def row_vectors(self, rows):
+        """Unit float32 vectors for the given row indices."""
+        return self.matrix[rows]
+
+    # ------------------------
+    def top_k(self, query_vector, k):
+        """Return (row_indices, cosine_similarities) of the k nearest rows, best first."""
+        if not len(self.docs) or k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        q = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(q)
+        if norm:
+            q = q / norm
+
+        rows = self._candidate_rows(q)
+        if rows is None:
+            scores = self.matrix @ q
+            rows = np.arange(len(scores))
+        else:
+            scores = self.matrix[rows] @ q
+
+        part = _argtop(scores, k)
+        return rows[part], scores[part]
+
+    def filtered_top_k(self, query_vector, k, filters=None):
+        """top_k restricted to rows matching filters; returns (rows, sims, filters_left_to_apply).
+
+        With an attribute mask the result always holds min(k, matching rows)
+        entries. Broad filters oversample the normal top_k; selective ones
+        score only the allowed rows. Filters the attribute index can't
+        evaluate are returned for post-filtering.
+        """
+        allowed = self.attributes.mask(filters) if filters and self.attributes is not None else None
+        if allowed is None:
+            rows, sims = self.top_k(query_vector, k)
+            return rows, sims, filters
+        count = int(allowed.sum())
+        if not count or k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32), None
+        k = min(k, count)
+
+        selectivity = count / len(self.docs)
+        if selectivity >= PREFILTER_OVERSAMPLE_SELECTIVITY:
+            rows, sims = self.top_k(query_vector, min(len(self.docs), int(k / selectivity) + k))
+            keep = allowed[rows]
+            if keep.sum() >= k:
+                return rows[keep][:k], sims[keep][:k], None
+
+        rows = np.flatnonzero(allowed)
+        sims = self.row_vectors(rows) @ _unit(query_vector)
+        part = _argtop(sims, k)
+        return rows[part], sims[part], None
+
+    def search(self, query_vector, limit=10, num_candidates=200, filters=None,
+               negative_vector=None, negative_weight=0.5):
+        """Mimic $vectorSearch: take num_candidates nearest, apply filters, return limit.
+
+        The returned score uses Atlas' cosine normalization, (1 + cos) / 2, so
+        callers see the same `score` scale as vectorSearchScore. With a
+        negative_vector the candidates are re-ranked by rerank_scores before
+        `limit` is applied. Unlike Atlas' post-$match, indexed filters are
+        applied before the candidate cut (like $vectorSearch.filter).
+        """
+        rows, sims, filters = self.filtered_top_k(query_vector, max(num_candidates, limit), filters)
+        return self._results(rows, sims, filters, limit, negative_vector, negative_weight)
+
+    def _results(self, rows, sims, filters, limit, negative_vector=None, negative_weight=0.5):
+        """Scored docs for candidate rows: (1 + cos) / 2, negative re-rank, post-filter, limit."""
+        scores = (1.0 + sims) / 2.0
+        if negative_vector is not None and len(rows):
+            scores = scores - negative_weight * (1.0 + self.row_vectors(rows) @ _unit(negative_vector)) / 2.0
+            order = np.argsort(-scores, kind="stable")
+            rows, scores = rows[order], scores[order]
+
+        results = []
+        for row, score in zip(rows, scores):
+            doc = self.docs[row]
+            if filters and not matches_filter(doc, filters):
+                continue
+            out = dict(doc)
+            out["score"] = float(score)
+            results.append(out)
+            if len(results) >= limit:
+                break
+        return results
+
+    def search_many(self, query_vectors, limits, num_candidates=200, filters=None, negative_vectors=None,
+                    negative_weight=0.5):
+        """search() for several queries at once; returns [(results, elapsed_ms)] in query order.
+
+        The exact index scores all queries with one (rows x queries) matrix
+        product (in blocks of BATCH_SCORE_BLOCK floats) and applies each
+        query's attribute mask to its score column, so filtered queries are
+        exact too. IVF and compact indexes run search() per query.
+        negative_weight may be one weight or one per query.
+        """
+        n = len(query_vectors)
+        filters = filters or [None] * n
+        negative_vectors = negative_vectors or [None] * n
+        weights = negative_weight if isinstance(negative_weight, (list, tuple)) else [negative_weight] * n
+        out = []
+        if self.mode != "exact" or not len(self.docs):
+            for i in range(n):
+                started = time.perf_counter()
+                results = self.search(query_vectors[i], limits[i], num_candidates, filters[i],
+                                      negative_vectors[i], weights[i])
+                out.append((results, (time.perf_counter() - started) * 1000))
+            return out
+
+        queries = np.stack([_unit(v) for v in query_vectors], axis=1)
+        block = max(1, BATCH_SCORE_BLOCK // len(self.docs))
+        for start in range(0, n, block):
+            started = time.perf_counter()
+            sims = self.matrix @ queries[:, start:start + block]
+            shared = (time.perf_counter() - started) / sims.shape[1]
+            for j in range(sims.shape[1]):
+                i = start + j
+                started = time.perf_counter()
+                scores, left = sims[:, j], filters[i]
+                k = max(num_candidates, limits[i])
+                allowed = self.attributes.mask(left) if left and self.attributes is not None else None
+                if allowed is not None:
+                    scores, left = np.where(allowed, scores, -np.inf), None
+                    k = min(k, int(allowed.sum()))
+                rows = _argtop(scores, k)
+                results = self._results(rows, sims[rows, j], left, limits[i], negative_vectors[i], weights[i])
+                out.append((results, (shared + time.perf_counter() - started) * 1000))
+        return out
+
+
+def load_local_index(coll, mode="exact", nlist=None, nprobe=8, snapshot=None):
+    """Build a LocalVectorIndex (or a CompactVectorIndex for int8/binary/hybrid) and log the load time.
+
+    With a snapshot directory the vectors come from its memory-mapped
+    matrix and `coll` is not read.
+    """
+    start = time.perf_counter()
+    if mode in ("int8", "binary", "hybrid"):
+        from compact_embeddings import CompactVectorIndex
+
+        kwargs, cls = {"mode": mode}, CompactVectorIndex
+    else:
+        kwargs, cls = {"mode": mode, "nlist": nlist, "nprobe": nprobe}, LocalVectorIndex
+    index = cls.from_snapshot(snapshot, **kwargs) if snapshot else cls.from_collection(coll, **kwargs)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Local vector index ({mode}) loaded: {len(index)} vectors, dim={index.dim} in {elapsed:.2f}s")
+    return index
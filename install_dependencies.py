@@ -64,6 +64,13 @@ def install_requirements():
                           "Backend requirements installation"):
             return False
     
+    # Benchmark (mongomock) requirements; optional
+    dev_req = Path("backend/requirements-dev.txt")
+    if dev_req.exists():
+        if not run_command("pip install -r backend/requirements-dev.txt",
+                          "Backend dev/benchmark requirements installation"):
+            print("⚠️  Dev requirements failed, but continuing...")
+
     # Supabase + ML + API requirements
     supabase_packages = [
         "psycopg2-binary",
@@ -71,7 +78,9 @@ def install_requirements():
         "sentence-transformers",
         "pandas",
         "numpy",
-        "scikit-learn"
+        "scikit-learn",
+        "pyarrow",
+        "nltk"
     ]
     
     print("\n📋 Installing Supabase and ML packages...")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Export the MiniLM sentence encoder to ONNX (and an int8 dynamically
+quantized copy) for CPU inference without torch at serving time.
+
+The exported graph returns token embeddings; mean pooling over the
+attention mask and L2 normalization (what SentenceTransformer applies for
+all-MiniLM-L6-v2) are recorded in export_manifest.json for the runtime.
+
+Usage:
+    python python-scripts/export_onnx.py --output models/all-MiniLM-L6-v2-onnx
+    python python-scripts/export_onnx.py --no-quantize --opset 17
+"""
+
+import argparse
+import json
+import os
+import sys
+
+
+def export(model_name, output_dir, opset=14, quantize=True):
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+    if not tokenizer.is_fast:
+        raise RuntimeError(f"❌ {model_name} has no fast tokenizer; the ONNX runtime needs tokenizer.json")
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+    # Truncate where SentenceTransformer does (256 for MiniLM), not at the tokenizer's 512
+    max_seq_length = int(SentenceTransformer(model_name, device="cpu").max_seq_length)
+    tokenizer.save_pretrained(output_dir)
+    # OnnxProvider only reads tokenizer.json (no transformers at serving time), so write it explicitly
+    tokenizer.backend_tokenizer.save(os.path.join(output_dir, "tokenizer.json"))
+
+    sample = tokenizer(["a short example sentence", "another one"], padding=True, return_tensors="pt")
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    dynamic_axes = {n: {0: "batch", 1: "sequence"} for n in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    onnx_path = os.path.join(output_dir, "model.onnx")
+    print(f"🔄 Exporting {model_name} to {onnx_path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[n] for n in input_names),
+            onnx_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+
+    files = {"fp32": "model.onnx"}
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = os.path.join(output_dir, "model.int8.onnx")
+        print(f"🔄 Quantizing weights to int8: {int8_path}")
+        quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+        files["int8"] = "model.int8.onnx"
+
+    manifest = {
+        "model_name": model_name,
+        "dimension": int(model.config.hidden_size),
+        "max_seq_length": max_seq_length,
+        "inputs": input_names,
+        "pad_token": tokenizer.pad_token or "[PAD]",
+        "pooling": "mean",
+        "normalize": True,
+        "opset": opset,
+        "files": files,
+    }
+    with open(os.path.join(output_dir, "export_manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    for kind, name in files.items():
+        size_mb = os.path.getsize(os.path.join(output_dir, name)) / (1024 * 1024)
+        print(f"✅ {kind}: {name} ({size_mb:.1f} MB)")
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX / int8 ONNX.")
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"))
+    parser.add_argument("--output", default="models/all-MiniLM-L6-v2-onnx")
+    parser.add_argument("--opset", type=int, default=14)
+    parser.add_argument("--no-quantize", action="store_true", help="Skip the int8 copy")
+    args = parser.parse_args(argv)
+
+    export(args.model, args.output, opset=args.opset, quantize=not args.no_quantize)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
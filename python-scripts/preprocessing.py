@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Vectorized preprocessing for the Kaggle movie dataset (importable version of
+preprocessing3.ipynb).
+
+Builds the same per-movie table as the notebook's `movie_data_dict` in a
+single pass: duration/year/list parsing use pandas string operations, and
+the NLTK tokenization + stop-word cleaning that produces `docs` runs over a
+multiprocessing pool in chunks. The result is written as Parquet so list
+columns keep their list type and ints stay ints.
+
+Usage:
+    python python-scripts/preprocessing.py --input final_dataset.csv \
+        --output cleaned_database/cleaned_final_dataset3.parquet
+    python python-scripts/preprocessing.py --kaggle   # download via kagglehub
+"""
+
+import argparse
+import os
+import sys
+from multiprocessing import Pool
+
+import pandas as pd
+
+LIST_COLUMNS = [
+    "writers", "directors", "stars", "countries_origin", "filming_locations",
+    "production_companies", "awards_content", "genres", "languages",
+]
+
+# Output column -> source column (same keys as the notebook's movie_data_dict)
+OUTPUT_COLUMNS = {
+    "title": "title",
+    "year": "year",
+    "duration": "duration",
+    "MPA": "mpa",
+    "rating": "rating",
+    "votes": "votes",
+    "meta_score": "méta_score",
+    "description": "description",
+    "Movie_Link": "movie_link",
+    "writers": "writers",
+    "directors": "directors",
+    "stars": "stars",
+    "budget": "budget",
+    "opening_weekend_gross": "opening_weekend_gross",
+    "gross_worldwide": "gross_worldwide",
+    "gross_us_canada": "gross_us_canada",
+    "release_date": "release_date",
+    "countries_origin": "countries_origin",
+    "filming_locations": "filming_locations",
+    "production_companies": "production_companies",
+    "awards_content": "awards_content",
+    "genres": "genres",
+    "languages": "languages",
+}
+
+# Quoted items inside a Python-repr list: 'a' or "O'Brien"
+_LIST_ITEM_RE = r"'((?:[^'\\]|\\.)*)'|\"((?:[^\"\\]|\\.)*)\""
+
+_tokenizer = None
+_stop_words = None
+
+
+# ------------------------
+# Vectorized column parsing
+# ------------------------
+def convert_duration(series):
+    """'2h 10m' / '45m' / '1h' / 130 -> minutes (int), missing -> 0."""
+    numeric = pd.to_numeric(series, errors="coerce")
+    text = series.astype("string")
+    parts = text.str.extract(r"(?:(\d+)\s*h)?\s*(?:(\d+)\s*m)?")
+    hours = pd.to_numeric(parts[0], errors="coerce").fillna(0)
+    minutes = pd.to_numeric(parts[1], errors="coerce").fillna(0)
+    parsed = hours * 60 + minutes
+    return numeric.fillna(parsed).fillna(0).astype("int64")
+
+
+def ensure_year(df):
+    """Add an int 'year' column, extracting it from release_date when missing."""
+    if "year" in df.columns:
+        year = pd.to_numeric(df["year"], errors="coerce")
+    else:
+        year = pd.to_numeric(
+            df.get("release_date", pd.Series("", index=df.index)).astype("string").str.extract(r"(\d{4})")[0],
+            errors="coerce",
+        )
+    df["year"] = year.fillna(0).astype("int64")
+    return df
+
+
+def parse_list_column(series):
+    """Parse "['a', 'b']" / "a, b" cells into Python lists without literal_eval."""
+    text = series.fillna("").astype(str).str.strip()
+    is_list = text.str.startswith("[")
+
+    parsed = pd.Series(index=text.index, dtype=object)
+    if is_list.any():
+        items = text[is_list].str.extractall(_LIST_ITEM_RE)
+        if len(items):
+            values = items[0].fillna(items[1])
+            parsed = values.groupby(level=0).agg(list).reindex(text.index)
+
+    plain = ~is_list & (text != "")
+    if plain.any():
+        parsed = parsed.where(~plain, text[plain].str.split(", "))
+    return parsed.apply(lambda v: v if isinstance(v, list) else [])
+
+
+def clean_names(lists):
+    """Notebook's get_cleaned_name_string: strip non-letters, lowercase, join."""
+    exploded = lists.explode()
+    cleaned = exploded.fillna("").astype(str).str.replace(r"[^a-zA-Z]", "", regex=True).str.lower()
+    joined = cleaned.groupby(level=0).agg(" ".join)
+    return joined.reindex(lists.index).fillna("")
+
+
+def join_list(lists):
+    return lists.apply(" ".join)
+
+
+# ------------------------
+# Tokenization (runs in worker processes)
+# ------------------------
+def load_stop_words():
+    """English NLTK stop words, downloading the corpus once if missing."""
+    import nltk
+    from nltk.corpus import stopwords
+
+    try:
+        return set(stopwords.words("english"))
+    except LookupError:
+        nltk.download("stopwords", quiet=True)
+        return set(stopwords.words("english"))
+
+
+def _init_worker(stop_words):
+    global _tokenizer, _stop_words
+    from nltk.tokenize import TreebankWordTokenizer
+
+    _stop_words = stop_words
+    _tokenizer = TreebankWordTokenizer()
+
+
+def _clean_chunk(texts):
+    """Tokenize and drop stop words for a chunk of already-lowercased texts."""
+    return [" ".join(w for w in _tokenizer.tokenize(t) if w not in _stop_words) for t in texts]
+
+
+def tokenize_clean(texts, processes=None, chunksize=2000):
+    """Apply _clean_chunk to a list of texts, in parallel when processes != 1."""
+    texts = list(texts)
+    chunks = [texts[i:i + chunksize] for i in range(0, len(texts), chunksize)]
+    # Resolve stop words in the parent so workers never hit the downloader
+    stop_words = load_stop_words()
+    if processes == 1 or len(chunks) <= 1:
+        _init_worker(stop_words)
+        results = [_clean_chunk(c) for c in chunks]
+    else:
+        with Pool(processes=processes, initializer=_init_worker, initargs=(stop_words,)) as pool:
+            results = pool.map(_clean_chunk, chunks)
+    return [t for chunk in results for t in chunk]
+
+
+# ------------------------
+def fill_missing(df):
+    """Numeric NaN -> 0, everything else -> '' (as in the notebook)."""
+    for col in df.columns:
+        if col in LIST_COLUMNS:
+            continue
+        if pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].fillna(0)
+        else:
+            df[col] = df[col].fillna("")
+    return df
+
+
+def build_movie_table(df, processes=None, chunksize=2000):
+    """Return the cleaned per-movie table (index 'id') including the `docs` column."""
+    df = df.drop_duplicates("id", keep="last").copy()
+    df["duration"] = convert_duration(df["duration"]) if "duration" in df.columns else 0
+    df = ensure_year(fill_missing(df))
+
+    for col in LIST_COLUMNS:
+        df[col] = parse_list_column(df[col]) if col in df.columns else [[] for _ in range(len(df))]
+
+    # Text fed to the tokenizer: titles keep punctuation (name_cleaning),
+    # everything else is reduced to letters first (desc_cleaning).
+    lower = lambda s: s.fillna("").astype(str).str.lower()
+    letters_only = lambda s: lower(s).str.replace(r"[^a-z\s]", "", regex=True)
+
+    n = len(df)
+    title_texts = lower(df["title"]).tolist()
+    desc_sources = [
+        df["description"],
+        join_list(df["genres"]),
+        join_list(df["production_companies"]),
+        join_list(df["filming_locations"]),
+    ]
+    desc_texts = [t for s in desc_sources for t in letters_only(s).tolist()]
+    cleaned = tokenize_clean(title_texts + desc_texts, processes=processes, chunksize=chunksize)
+    title_clean = cleaned[:n]
+    desc_clean, genres_clean, production_clean, locations_clean = (
+        cleaned[n * (i + 1):n * (i + 2)] for i in range(4)
+    )
+
+    parts = pd.DataFrame({
+        "name": title_clean,
+        "desc": desc_clean,
+        "stars": clean_names(df["stars"]).tolist(),
+        "directors": clean_names(df["directors"]).tolist(),
+        "genres": genres_clean,
+        "production": production_clean,
+        "locations": locations_clean,
+        "languages": clean_names(df["languages"]).tolist(),
+        "countries": clean_names(df["countries_origin"]).tolist(),
+    })
+    docs = parts.agg(" ".join, axis=1).str.replace(r"\s+", " ", regex=True).str.strip()
+
+    out = pd.DataFrame({"docs": docs.values}, index=pd.Index(df["id"].astype(str).values, name="id"))
+    for target, source in OUTPUT_COLUMNS.items():
+        out[target] = df[source].values if source in df.columns else ""
+    return out
+
+
+def write_parquet(table, path):
+    """Write the table with list<string> list columns (even when a column is all-empty)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    arrow = pa.Table.from_pandas(table, preserve_index=True)
+    fields = [pa.field(f.name, pa.list_(pa.string())) if f.name in LIST_COLUMNS else f for f in arrow.schema]
+    arrow = arrow.cast(pa.schema(fields, metadata=arrow.schema.metadata))
+    pq.write_table(arrow, path)
+    print(f"✅ Saved {len(table)} movies to {path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clean the movie dataset into a Parquet table.")
+    parser.add_argument("--input", help="Path to final_dataset.csv")
+    parser.add_argument("--kaggle", action="store_true", help="Download the dataset with kagglehub")
+    parser.add_argument("--output", default="cleaned_database/cleaned_final_dataset3.parquet")
+    parser.add_argument("--processes", type=int, default=None, help="Tokenizer worker processes")
+    parser.add_argument("--chunksize", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    if args.kaggle:
+        import kagglehub
+
+        dataset_path = kagglehub.dataset_download("raedaddala/top-500-600-movies-of-each-year-from-1960-to-2024")
+        csv_path = os.path.join(dataset_path, "final_dataset.csv")
+    elif args.input:
+        csv_path = args.input
+    else:
+        parser.error("either --input or --kaggle is required")
+
+    df = pd.read_csv(csv_path)
+    print(f"🔄 Loaded {len(df)} rows from {csv_path}")
+    table = build_movie_table(df, processes=args.processes, chunksize=args.chunksize)
+    write_parquet(table, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
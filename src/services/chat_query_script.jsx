@@ -0,0 +1,70 @@
+const BACKEND_BASE_URL =
+  import.meta.env?.VITE_BACKEND_URL || 'http://localhost:5000';
+
+// Parse "event: x\ndata: {...}\n\n" frames out of a text buffer.
+// Returns the unconsumed remainder.
+function drainFrames(buffer, onEvent) {
+  const frames = buffer.split('\n\n');
+  const rest = frames.pop();
+  for (const frame of frames) {
+    let event = 'message';
+    let data = '';
+    for (const line of frame.split('\n')) {
+      if (line.startsWith('event:')) event = line.slice(6).trim();
+      else if (line.startsWith('data:')) data += line.slice(5).trim();
+    }
+    if (!data) continue;
+    let parsed;
+    try {
+      parsed = JSON.parse(data);
+    } catch (err) {
+      console.warn('Bad chat event:', err);
+      continue;
+    }
+    onEvent(event, parsed);
+  }
+  return rest;
+}
+
+/**
+ * One chat turn through the backend's /chat/stream endpoint.
+ *
+ * onEvent(event, data) is called for: preview ({results}), params,
+ * results ({results}), delta ({content}), done ({content}), error.
+ * Resolves with the final answer text; rejects if the server sends an
+ * error event. Without a streamable body the response is read as text
+ * once it completes (same events, no second request).
+ */
+export default async function streamChat({ messages = [], limit = 10, onEvent = () => {} } = {}) {
+  const res = await fetch(`${BACKEND_BASE_URL}/chat/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+    body: JSON.stringify({ messages, limit }),
+  });
+  if (!res.ok) throw new Error(`Chat failed: ${res.status}`);
+
+  let answer = '';
+  let streamError = null;
+  const handle = (event, data) => {
+    if (event === 'done') answer = data.content || '';
+    if (event === 'error') streamError = new Error(data.error || 'Chat stream failed');
+    onEvent(event, data);
+  };
+
+  if (!res.body?.getReader) {
+    drainFrames((await res.text()) + '\n\n', handle);
+  } else {
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer = drainFrames(buffer + decoder.decode(value, { stream: true }), handle);
+    }
+    drainFrames(buffer + '\n\n', handle);
+  }
+
+  if (streamError) throw streamError;
+  return answer;
+}
@@ -1,22 +1,24 @@
 const BACKEND_BASE_URL =
   import.meta.env?.VITE_BACKEND_URL || 'http://localhost:5000';
 
-function buildMongoFilters(rowChecker = {}) {
-  const andClauses = [];
-
-  if (rowChecker.min_year || rowChecker.max_year) {
-    const cond = {};
-    if (rowChecker.min_year) cond.$gte = rowChecker.min_year;
-    if (rowChecker.max_year) cond.$lte = rowChecker.max_year;
-    andClauses.push({ year: cond });
-  }
+// Only year/rating/duration/genres/languages clauses: the backend pushes them
+// into $vectorSearch.filter (or its bitmap attribute index) before scoring.
+const isSet = (value) => value !== undefined && value !== null && value !== '';
+
+function rangeClause(field, min, max) {
+  if (!isSet(min) && !isSet(max)) return null;
+  const cond = {};
+  if (isSet(min)) cond.$gte = min;
+  if (isSet(max)) cond.$lte = max;
+  return { [field]: cond };
+}
 
-  if (rowChecker.min_rating || rowChecker.max_rating) {
-    const cond = {};
-    if (rowChecker.min_rating) cond.$gte = rowChecker.min_rating;
-    if (rowChecker.max_rating) cond.$lte = rowChecker.max_rating;
-    andClauses.push({ rating: cond });
-  }
+function buildMongoFilters(rowChecker = {}) {
+  const andClauses = [
+    rangeClause('year', rowChecker.min_year, rowChecker.max_year),
+    rangeClause('rating', rowChecker.min_rating, rowChecker.max_rating),
+    rangeClause('duration', rowChecker.min_duration, rowChecker.max_duration),
+  ].filter(Boolean);
 
   if (rowChecker.required_genres?.length)
     andClauses.push({ genres: { $in: rowChecker.required_genres } });
@@ -32,6 +34,7 @@ function buildMongoFilters(rowChecker = {}) {
 
 export default async function mongoVectorSearch({
   query_text = '',
+  negative_query = '',
   limit = 10,
   row_checker = {},
 } = {}) {
@@ -39,7 +42,7 @@ export default async function mongoVectorSearch({
 
   const filters = buildMongoFilters(row_checker);
 
-  const payload = { query: query_text, filters, limit };
+  const payload = { query: query_text, negative_query, filters, limit };
 
   try {
     const res = await fetch(`${BACKEND_BASE_URL}/search`, {